@@ -1,22 +1,57 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-import sqlite3
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, abort, Response, stream_with_context, make_response, current_app
+from flask.cli import with_appcontext
+from jinja2 import FileSystemBytecodeCache
+import click
 import os
-import bcrypt
-import json
+import tempfile
 import uuid
-from datetime import datetime
-from io import StringIO
-from contextlib import redirect_stdout
-import traceback
-
-app = Flask(__name__)
-app.secret_key = os.urandom(24)
+from datetime import datetime, date, timedelta
+import grading
+import db
+import migrations
+import avatars
+import rankings
+import rollups
+import quiz_cache
+import history
+import auth
+import metrics
+import summaries
+import question_bank
+import item_analysis
+import assets
+import sessions
+import awards
+import archive
 
 # --- Constants ---
 XP_PER_CORRECT_ANSWER = 10
 XP_TO_LEVEL_UP = 100
 PASSING_THRESHOLD = 60 # Score of 60% or higher is a pass
 
+# --- Route Queries ---
+# Lookups the routes below issue directly; `flask check-query-plans` checks them with migrations.HOT_QUERIES
+LOGIN_QUERY = 'SELECT id, username, password, first_name, is_admin FROM users WHERE username = ?'
+USERNAME_TAKEN_QUERY = 'SELECT 1 FROM users WHERE username = ?'
+SET_COUNT_QUERY = 'SELECT COUNT(*) FROM question_sets'
+SET_LIST_QUERY = 'SELECT * FROM question_sets'
+SET_TITLES_QUERY = 'SELECT id, title FROM question_sets ORDER BY title'
+SET_EXISTS_QUERY = 'SELECT 1 FROM question_sets WHERE id = ?'
+KNOWN_TOPICS_QUERY = 'SELECT topic FROM student_topic_mastery WHERE user_id = ?'
+LEVEL_QUERY = 'SELECT level, xp FROM users WHERE id = ?'
+
+# Every question set is listed on purpose; there is one row per set
+ROUTE_QUERIES = {
+    'login: user lookup': migrations.HotQuery(LOGIN_QUERY, ('',)),
+    'register: username taken': migrations.HotQuery(USERNAME_TAKEN_QUERY, ('',)),
+    'dashboard: set count': migrations.HotQuery(SET_COUNT_QUERY, (), ('SCAN question_sets',)),
+    'dashboard: set list': migrations.HotQuery(SET_LIST_QUERY, (), ('SCAN question_sets',)),
+    'question bank: set titles': migrations.HotQuery(SET_TITLES_QUERY, (), ('SCAN question_sets',) + migrations.SMALL_TABLE_SORT),
+    'question bank: set exists': migrations.HotQuery(SET_EXISTS_QUERY, (1,)),
+    'submit_quiz: known topics': migrations.HotQuery(KNOWN_TOPICS_QUERY, (1,)),
+    'submit_quiz: level': migrations.HotQuery(LEVEL_QUERY, (1,)),
+}
+
 # --- W3Schools Topic URL Mapping ---
 W3SCHOOLS_LINKS = {
     "Operators": "https://www.w3schools.com/python/python_operators.asp",
@@ -28,26 +63,222 @@ W3SCHOOLS_LINKS = {
     "Loops": "https://www.w3schools.com/python/python_for_loops.asp"
 }
 
+# --- Application Factory ---
+# Routes and CLI commands are collected at import time and attached to every app that
+# create_app() builds, keeping endpoint names unqualified (url_for('login')). Config is
+# layered: defaults, then instance/config.py, then PYPATH_* environment variables (for
+# example PYPATH_DATABASE or PYPATH_SECRET_KEY; values are parsed as JSON where possible),
+# then the `config` argument. wsgi.py is the production entry point.
+_routes = []
+_commands = []
+
+def route(rule, **options):
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+def command(name):
+    def decorator(fn):
+        cli_command = click.command(name)(with_appcontext(fn))
+        _commands.append(cli_command)
+        return cli_command
+    return decorator
+
+def create_app(config=None):
+    app = Flask(__name__, instance_relative_config=True)
+    app.config.from_pyfile('config.py', silent=True)
+    app.config.from_prefixed_env('PYPATH')
+    if config:
+        app.config.update(config)
+
+    # Compiled templates are kept on disk, so restarts and new workers skip Jinja's parser and compiler
+    app.config.setdefault('JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])}
+
+    db.init_app(app)
+    sessions.init_app(app)
+    metrics.init_app(app)
+    assets.init_app(app)
+    awards.init_app(app)
+    archive.init_app(app)
+    grading.init_app(app)
+    metrics.register_gauge('pypath_auth_queue_depth', 'Password hashes queued or running on the auth pool.', auth.get_queue_depth)
+    metrics.register_gauge('pypath_quiz_cache_entries', 'Question sets held in the in-process quiz cache.', quiz_cache.size)
+    metrics.register_gauge('pypath_grading_refused_submissions', 'Quiz submissions refused because the grading sandbox was not isolated.',
+                           grading.refused_count)
+    metrics.register_gauge('pypath_achievement_queue_depth', 'Quiz-submitted events waiting for achievement evaluation.',
+                           lambda: awards.get_queue_depth(app.config['DATABASE']))
+    metrics.register_gauge('pypath_db_idle_connections', 'Idle connections in the database pool.', lambda: db.get_pool(app.config['DATABASE']).idle_count())
+
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    for cli_command in _commands:
+        app.cli.add_command(cli_command)
+    return app
+
+def preload(app):
+    """Checks the grading sandbox, prepares the database and warms every cache once, in the pre-fork master (see wsgi.py).
+
+    Forked workers share what this loads copy-on-write instead of each paying for it on
+    their first requests: compiled templates, the asset manifest and the question set
+    cache (display payload, answer key and rendered question list). The leaderboard is a
+    table rather than a process cache, so reading it pulls its pages into the OS page
+    cache that every worker reads through.
+    """
+    # Refuse to serve coding questions that could only ever be refused or run unisolated
+    isolation_error = grading.check_isolation()
+    if isolation_error is not None:
+        if not app.config['GRADING_ALLOW_UNISOLATED']:
+            raise RuntimeError(f'The grading sandbox cannot be isolated on this host: {isolation_error} '
+                               '(set PYPATH_GRADING_ALLOW_UNISOLATED=true for development only)')
+        app.logger.warning('Grading submissions without sandbox isolation: %s', isolation_error)
+    prepare_database(app)
+    with app.app_context():
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        assets.get_manifest(app)
+        conn = get_db_connection()
+        for row in conn.execute('SELECT id FROM question_sets ORDER BY id LIMIT ?', (quiz_cache.QUIZ_CACHE_SIZE,)).fetchall():
+            quiz_cache.get_quiz_fragment(conn, row['id'])
+        rankings.get_page(conn, 1)
+        rankings.get_student_count(conn)
+    # SQLite connections must never cross fork(); workers open their own
+    db.get_pool(app.config['DATABASE']).close_all()
+
 # --- Database Setup ---
 def get_db_connection():
-    conn = sqlite3.connect('pypath.db', check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Request-scoped connection from the pool; returned automatically on app context teardown.
+    # During a request it is wrapped so every statement is counted for /metrics.
+    return metrics.instrument(db.get_db())
 
-def init_db():
+def init_db(app):
+    # Incremental auto-vacuum for a new file; `flask archive-results` converts older ones once
+    db.create_file(app.config['DATABASE'])
     with app.app_context():
         conn = get_db_connection()
         with app.open_resource('schema.sql', mode='r') as f:
             conn.cursor().executescript(f.read())
+        conn.execute('PRAGMA user_version = 0')
+        migrations.migrate(conn)
+        # The rebuilt sets start again at version 1, which cached entries for the old ones also carry
+        quiz_cache.clear(app.config['DATABASE'])
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE username = ?', ('admin',))
         if not cursor.fetchone():
-            hashed_password = bcrypt.hashpw('rockieOga'.encode('utf-8'), bcrypt.gensalt())
+            hashed_password = auth.hash_password('rockieOga')
             student_code = str(uuid.uuid4())
             cursor.execute('INSERT INTO users (username, password, student_code, first_name, last_name, is_admin) VALUES (?, ?, ?, ?, ?, ?)', 
                            ('admin', hashed_password, student_code, 'Admin', 'User', 1))
         conn.commit()
-        conn.close()
+
+def prepare_database(app):
+    """Creates the database on first start, otherwise applies pending migrations."""
+    if not os.path.exists(app.config['DATABASE']):
+        init_db(app)
+    else:
+        with app.app_context():
+            migrations.migrate(get_db_connection())
+
+@command('migrate')
+def migrate_command():
+    """Apply pending schema migrations without touching existing data."""
+    applied = migrations.migrate(get_db_connection())
+    for version, name in applied:
+        click.echo(f'Applied migration {version}: {name}')
+    click.echo(f'Schema is at version {migrations.get_schema_version(get_db_connection())}.')
+
+@command('rebuild-leaderboard')
+def rebuild_leaderboard_command():
+    """Recompute every leaderboard rank from the users table."""
+    conn = get_db_connection()
+    with db.transaction(conn):
+        rankings.rebuild_leaderboard(conn, XP_TO_LEVEL_UP)
+    click.echo(f'Ranked {rankings.get_student_count(conn)} students.')
+
+@command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the admin analytics rollups from results and answers."""
+    conn = get_db_connection()
+    with archive.including_archived(conn, current_app.config['ARCHIVE_DIRECTORY']), db.transaction(conn):
+        rollups.rebuild_rollups(conn, PASSING_THRESHOLD)
+    click.echo(f"Rebuilt rollups for {rollups.get_totals(conn)['scored_students']} students with results.")
+
+@command('rebuild-summaries')
+def rebuild_summaries_command():
+    """Recompute per-result topic breakdowns and per-student summaries."""
+    conn = get_db_connection()
+    with archive.including_archived(conn, current_app.config['ARCHIVE_DIRECTORY']), db.transaction(conn):
+        summaries.rebuild_summaries(conn, XP_TO_LEVEL_UP)
+    click.echo(f"Rebuilt summaries for {conn.execute('SELECT COUNT(*) FROM student_summary').fetchone()[0]} users.")
+
+@command('rebuild-item-analysis')
+def rebuild_item_analysis_command():
+    """Recompute question difficulty, discrimination and topic reliability statistics."""
+    conn = get_db_connection()
+    with archive.including_archived(conn, current_app.config['ARCHIVE_DIRECTORY']), db.transaction(conn):
+        item_analysis.rebuild_item_analysis(conn)
+    click.echo(f"Rebuilt item statistics for {conn.execute('SELECT COUNT(*) FROM item_stats').fetchone()[0]} questions.")
+
+@command('backfill-achievements')
+def backfill_achievements_command():
+    """Award achievements retroactively by replaying every existing result against the rules."""
+    conn = get_db_connection()
+    with archive.including_archived(conn, current_app.config['ARCHIVE_DIRECTORY']), db.transaction(conn):
+        awarded = awards.backfill(conn, PASSING_THRESHOLD)
+    click.echo(f'Awarded {awarded} achievements across {len(awards.RULES)} rules.')
+
+@command('archive-results')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive results dated before this day (default: ARCHIVE_AFTER_DAYS ago).')
+def archive_results_command(before):
+    """Move old results and answers into per-term archive files, then vacuum and optimize the live database."""
+    conn = get_db_connection()
+    cutoff = before.date() if before else date.today() - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+    moved = archive.archive_results(conn, current_app.config['ARCHIVE_DIRECTORY'], cutoff)
+    for path, count in moved.items():
+        click.echo(f'Archived {count} results into {path}')
+    click.echo(f'Archived {sum(moved.values())} results dated before {cutoff.isoformat()}.')
+    report = archive.maintain(conn)
+    if report['converted']:
+        click.echo('Switched the database to incremental auto-vacuum (one full VACUUM).')
+    click.echo(f"Freed {report['freed_pages'] * report['page_size'] // 1024} KiB; "
+               f"the live database is {report['page_count'] * report['page_size'] // 1024} KiB.")
+
+@command('build-assets')
+def build_assets_command():
+    """Vendor, fingerprint and precompress the third-party scripts, styles and fonts."""
+    manifest, failures = assets.build(current_app)
+    click.echo(f'Built {len(manifest)} assets into {assets.ASSET_DIR}' + ('' if assets.get_brotli() else ' (install brotli for .br variants)'))
+    for name, error in failures.items():
+        click.echo(f'  {name}: {error} (templates keep using {assets.SOURCES[name]})', err=True)
+
+@command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any hot route query falls back to a full table scan or a temp B-tree sort."""
+    queries = {**migrations.HOT_QUERIES, **ROUTE_QUERIES}
+    offenders = migrations.find_full_scans(get_db_connection(), queries)
+    for name, detail in offenders:
+        click.echo(f'{name}: {detail}', err=True)
+    if offenders:
+        raise click.ClickException(f'{len(offenders)} hot queries use a full table scan or a temp B-tree sort.')
+    click.echo(f'All {len(queries)} hot queries use an index.')
+
+@command('startup-timing')
+def startup_timing_command():
+    """Measure cold start and first-request latency in fresh processes, with and without preloading."""
+    import startup
+    config = {'DATABASE': os.path.abspath(current_app.config['DATABASE'])}
+    with tempfile.TemporaryDirectory(prefix='pypath-jinja-') as empty_cache:
+        runs = {'cold': startup.run({**config, 'JINJA_CACHE_DIR': empty_cache}, preload=False),
+                'preloaded': startup.run(config, preload=True)}
+    for label, timings in runs.items():
+        click.echo(f"{label}: import {timings['import_ms']} ms, create_app {timings['create_app_ms']} ms"
+                   + (f", preload {timings['preload_ms']} ms" if 'preload_ms' in timings else '')
+                   + f"; lazy modules loaded: {', '.join(timings['lazy_modules_loaded']) or 'none'}")
+        for path, row in timings['requests'].items():
+            click.echo(f"  {path:<24}{row['status']:>5}  first {row['first_ms']:>8} ms  second {row['second_ms']:>8} ms")
 
 # --- Helper Functions ---
 def get_user_id():
@@ -56,35 +287,13 @@ def get_user_id():
 def is_admin():
     return session.get('is_admin', False)
 
-def format_duration(start_time, end_time):
-    if not isinstance(start_time, datetime) or not isinstance(end_time, datetime):
-        return "N/A"
-    duration = end_time - start_time
-    total_seconds = int(duration.total_seconds())
-    hours, remainder = divmod(total_seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    if hours > 0: return f"{hours}h {minutes}m {seconds}s"
-    if minutes > 0: return f"{minutes}m {seconds}s"
-    return f"{seconds}s"
-
-def calculate_proficiency(user_id, conn, result_id=None):
-    if result_id is None:
-        last_result_row = conn.execute('SELECT id FROM results WHERE user_id = ? ORDER BY timestamp DESC LIMIT 1', (user_id,)).fetchone()
-        if not last_result_row: return []
-        result_id = last_result_row['id']
-        
-    answers = conn.execute('SELECT q.topic, sa.is_correct FROM student_answers sa JOIN questions q ON sa.question_id = q.id WHERE sa.result_id = ?', (result_id,)).fetchall()
-    topic_scores = {}
-    for answer in answers:
-        topic = answer['topic']
-        if topic not in topic_scores: topic_scores[topic] = {'correct': 0, 'total': 0}
-        topic_scores[topic]['total'] += 1
-        if answer['is_correct']: topic_scores[topic]['correct'] += 1
+def calculate_proficiency(topic_breakdown):
+    """Turns a stored per-result topic breakdown into the proficiency rows shown to students."""
     proficiency_analysis = []
-    for topic, scores in topic_scores.items():
-        percentage = (scores['correct'] / scores['total']) * 100 if scores['total'] > 0 else 0
+    for scores in topic_breakdown:
+        percentage = (scores['correct'] / scores['answered']) * 100 if scores['answered'] > 0 else 0
         level, color_text, color_bg = get_proficiency_level(percentage)
-        proficiency_analysis.append({'topic': topic, 'percentage': round(percentage), 'level': level, 'study_link': W3SCHOOLS_LINKS.get(topic, '#'), 'color_text': color_text})
+        proficiency_analysis.append({'topic': scores['topic'], 'percentage': round(percentage), 'level': level, 'study_link': W3SCHOOLS_LINKS.get(scores['topic'], '#'), 'color_text': color_text})
     return proficiency_analysis
     
 def get_proficiency_level(percentage):
@@ -93,27 +302,41 @@ def get_proficiency_level(percentage):
     else: return "Beginner", "text-red-500", "bg-red-500"
 
 # --- Main Routes ---
-@app.route('/')
+@route('/')
 def index():
     if get_user_id(): return redirect(url_for('dashboard'))
     return render_template('index.html')
 
 # --- Authentication & Profile Routes ---
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username, password = request.form['username'], request.form['password']
+        if not auth.allow_attempt(request.remote_addr, username):
+            flash('Too many login attempts. Please wait a moment and try again.', 'danger')
+            return render_template('login.html'), 429
         conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
-        if user and bcrypt.checkpw(password.encode('utf-8'), user['password']):
+        user = conn.execute(LOGIN_QUERY, (username,)).fetchone()
+        try:
+            valid = user is not None and auth.check_password(password, user['password'])
+        except auth.AuthBusy:
+            flash('The server is busy. Please try again in a moment.', 'danger')
+            return render_template('login.html'), 503
+        if valid:
+            auth.username_limiter.reset(username.lower())
+            if auth.needs_rehash(user['password']):
+                try:
+                    conn.execute('UPDATE users SET password = ? WHERE id = ?', (auth.hash_password(password), user['id']))
+                    conn.commit()
+                except auth.AuthBusy:
+                    pass # Upgrade on a later login
             session['user_id'], session['username'], session['is_admin'] = user['id'], user['username'], bool(user['is_admin'])
             session['first_name'] = user['first_name']
             return redirect(url_for('dashboard'))
         else: flash('Invalid credentials. Please try again.', 'danger')
     return render_template('login.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form['username']
@@ -122,26 +345,34 @@ def register():
         last_name = request.form['last_name']
         middle_name = request.form.get('middle_name')
 
+        if not auth.allow_attempt(request.remote_addr):
+            flash('Too many attempts. Please wait a moment and try again.', 'danger')
+            return render_template('register.html'), 429
         conn = get_db_connection()
-        if conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone():
+        if conn.execute(USERNAME_TAKEN_QUERY, (username,)).fetchone():
             flash('Username already exists.', 'danger')
         else:
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+            try:
+                hashed_password = auth.hash_password(password)
+            except auth.AuthBusy:
+                flash('The server is busy. Please try again in a moment.', 'danger')
+                return render_template('register.html'), 503
             student_code = str(uuid.uuid4())
-            conn.execute('INSERT INTO users (username, password, student_code, first_name, last_name, middle_name) VALUES (?, ?, ?, ?, ?, ?)',
-                         (username, hashed_password, student_code, first_name, last_name, middle_name))
-            conn.commit()
+            with db.transaction(conn):
+                user_id = conn.execute('INSERT INTO users (username, password, student_code, first_name, last_name, middle_name) VALUES (?, ?, ?, ?, ?, ?)',
+                                       (username, hashed_password, student_code, first_name, last_name, middle_name)).lastrowid
+                rankings.update_rank(conn, user_id, 1, 0, XP_TO_LEVEL_UP)
+                rollups.record_student(conn)
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('login'))
-        conn.close()
     return render_template('register.html')
 
-@app.route('/logout')
+@route('/logout')
 def logout():
     session.clear()
     return redirect(url_for('index'))
 
-@app.route('/profile', methods=['GET', 'POST'])
+@route('/profile', methods=['GET', 'POST'])
 def profile():
     if not get_user_id(): return redirect(url_for('login'))
     conn = get_db_connection()
@@ -151,28 +382,16 @@ def profile():
         conn.commit()
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('profile'))
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (get_user_id(),)).fetchone()
-    
-    proficiency_raw = conn.execute('SELECT * FROM student_topic_mastery WHERE user_id = ?', (get_user_id(),)).fetchall()
-    total_xp = sum(topic['xp'] for topic in proficiency_raw)
-    total_possible_xp = len(proficiency_raw) * XP_TO_LEVEL_UP if proficiency_raw else 0
-    overall_percentage = (total_xp / total_possible_xp) * 100 if total_possible_xp > 0 else 0
-    proficiency_level, proficiency_color_text, proficiency_color_bg = get_proficiency_level(overall_percentage)
-    
-    achievements = conn.execute('''
-        SELECT a.name, a.icon FROM achievements a
-        JOIN student_achievements sa ON a.id = sa.achievement_id
-        WHERE sa.user_id = ?
-    ''', (get_user_id(),)).fetchall()
+    user = summaries.get_student(conn, get_user_id())
+    proficiency_level, proficiency_color_text, proficiency_color_bg = get_proficiency_level(user['mastery_percentage'])
     
-    conn.close()
     return render_template('profile.html', 
                            user=user,
                            proficiency_level=proficiency_level,
                            proficiency_color_bg=proficiency_color_bg,
-                           achievements=achievements)
+                           achievements=user['achievements'])
 
-@app.route('/update_profile_image', methods=['POST'])
+@route('/update_profile_image', methods=['POST'])
 def update_profile_image():
     if not get_user_id():
         return jsonify({'success': False, 'error': 'Not logged in'}), 401
@@ -183,49 +402,53 @@ def update_profile_image():
     if not image_data:
         return jsonify({'success': False, 'error': 'No image data provided'}), 400
 
+    try:
+        avatar_hash = avatars.store_avatar(image_data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
     conn = get_db_connection()
-    conn.execute('UPDATE users SET profile_image = ? WHERE id = ?', (image_data, get_user_id()))
+    conn.execute('UPDATE users SET profile_image_hash = ? WHERE id = ?', (avatar_hash, get_user_id()))
     conn.commit()
-    conn.close()
 
-    return jsonify({'success': True})
+    return jsonify({'success': True, 'url': url_for('avatar', avatar_hash=avatar_hash)})
+
+@route('/avatar/<avatar_hash>')
+def avatar(avatar_hash):
+    found = avatars.find_avatar(avatar_hash) if len(avatar_hash) == 64 and avatar_hash.isalnum() else None
+    if not found: abort(404)
+    path, mimetype = found
+    # Content-addressed, so the bytes behind a URL never change
+    response = send_file(path, mimetype=mimetype, etag=avatar_hash, max_age=avatars.AVATAR_CACHE_SECONDS, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@route('/assets/<filename>')
+def asset(filename):
+    return assets.send_asset(filename)
 
 # --- Core Dashboard ---
-@app.route('/dashboard')
+@route('/dashboard')
 def dashboard():
     if not get_user_id(): return redirect(url_for('login'))
     conn = get_db_connection()
     if is_admin():
-        student_count = conn.execute('SELECT COUNT(*) FROM users WHERE is_admin = 0').fetchone()[0]
-        quiz_count = conn.execute('SELECT COUNT(*) FROM question_sets').fetchone()[0]
-        
-        latest_scores = conn.execute('''
-            SELECT u.first_name || ' ' || u.last_name as student_name, MAX(r.score * 100.0 / r.total_questions) as latest_score
-            FROM results r
-            JOIN users u ON r.user_id = u.id
-            WHERE u.is_admin = 0
-            GROUP BY u.id
-            ORDER BY latest_score DESC
-        ''').fetchall()
-
-        passed_count = sum(1 for row in latest_scores if row['latest_score'] >= PASSING_THRESHOLD)
-        failed_count = len(latest_scores) - passed_count
-        
-        total_students_with_scores = len(latest_scores)
-        pass_rate = (passed_count / total_students_with_scores) * 100 if total_students_with_scores > 0 else 0
-        avg_score = sum(row['latest_score'] for row in latest_scores) / total_students_with_scores if total_students_with_scores > 0 else 0
-
-        topic_popularity = conn.execute('''
-            SELECT topic, COUNT(DISTINCT user_id) as student_count
-            FROM student_topic_mastery
-            GROUP BY topic
-            ORDER BY student_count DESC
-        ''').fetchall()
+        totals = rollups.get_totals(conn)
+        quiz_count = conn.execute(SET_COUNT_QUERY).fetchone()[0]
+
+        student_count = totals['student_count']
+        passed_count = totals['passed_students']
+        failed_count = totals['scored_students'] - passed_count
+        pass_rate = (passed_count / totals['scored_students']) * 100 if totals['scored_students'] > 0 else 0
+        avg_score = totals['best_score_sum'] / totals['scored_students'] if totals['scored_students'] > 0 else 0
+
+        topic_popularity = rollups.get_topic_popularity(conn)
+        set_summaries = rollups.get_set_summaries(conn)
         
         topic_chart_labels = [row['topic'] for row in topic_popularity]
         topic_chart_values = [row['student_count'] for row in topic_popularity]
         
-        conn.close()
         return render_template('admin/dashboard.html', 
                                student_count=student_count, 
                                quiz_count=quiz_count, 
@@ -234,32 +457,23 @@ def dashboard():
                                failed_count=failed_count,
                                pass_rate=pass_rate,
                                topic_chart_labels=topic_chart_labels,
-                               topic_chart_values=topic_chart_values)
+                               topic_chart_values=topic_chart_values,
+                               set_summaries=set_summaries)
     else:
-        user = conn.execute('SELECT * FROM users WHERE id = ?', (get_user_id(),)).fetchone()
-        sets = conn.execute('SELECT * FROM question_sets').fetchall()
-        
-        latest_result = conn.execute('SELECT * FROM results WHERE user_id = ? ORDER BY timestamp DESC LIMIT 1', (get_user_id(),)).fetchone()
+        user_data = summaries.get_student(conn, get_user_id())
+        sets = conn.execute(SET_LIST_QUERY).fetchall()
         
-        proficiency_breakdown = []
-        if latest_result:
-            proficiency_breakdown = calculate_proficiency(get_user_id(), conn, latest_result['id'])
-
-        user_data = dict(user)
+        latest_result = None
+        if user_data['latest_result_id']:
+            latest_result = {'id': user_data['latest_result_id'], 'score': user_data['latest_score'], 'total_questions': user_data['latest_total']}
+        proficiency_breakdown = calculate_proficiency(user_data['latest_breakdown'])
         user_data['next_level_xp'] = XP_TO_LEVEL_UP
         
-        history_data = conn.execute('''
-            SELECT score, total_questions
-            FROM results
-            WHERE user_id = ?
-            ORDER BY timestamp ASC
-            LIMIT 5
-        ''', (get_user_id(),)).fetchall()
-        
-        history_labels = [f"Attempt {i+1}" for i in range(len(history_data))]
-        history_scores = [(row['score'] / row['total_questions']) * 100 for row in history_data]
+        # The summary keeps the most recent scores, oldest first
+        history_scores = user_data['recent_scores']
+        first_attempt = user_data['result_count'] - len(history_scores)
+        history_labels = [f"Attempt {first_attempt + i + 1}" for i in range(len(history_scores))]
 
-        conn.close()
         return render_template('student/dashboard.html', 
                                user=user_data, 
                                sets=sets,
@@ -269,234 +483,314 @@ def dashboard():
                                history_scores=history_scores)
 
 # --- Admin Routes ---
-@app.route('/admin/questions')
+@route('/admin/questions')
 def admin_questions():
     if not is_admin(): return redirect(url_for('login'))
     conn = get_db_connection()
-    questions = conn.execute('SELECT * FROM questions').fetchall()
-    conn.close()
-    return render_template('admin/questions.html', questions=questions)
+    after_id = request.args.get('after', 0, type=int)
+    questions, next_after = question_bank.get_page(conn, after_id)
+    sets = conn.execute(SET_TITLES_QUERY).fetchall()
+    item_stats = item_analysis.get_item_stats(conn, [q['id'] for q in questions])
+    topic_reliability = item_analysis.get_topic_reliability(conn)
+    return render_template('admin/questions.html', questions=questions, next_after=next_after, after_id=after_id, sets=sets,
+                           item_stats=item_stats, topic_reliability=topic_reliability)
+
+@route('/admin/questions/import', methods=['POST'])
+def import_questions():
+    if not is_admin(): return redirect(url_for('login'))
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Choose a CSV or JSONL file to import.', 'danger')
+        return redirect(url_for('admin_questions'))
+    if upload.filename.lower().endswith(('.jsonl', '.ndjson')):
+        rows = question_bank.iter_jsonl(upload)
+    elif upload.filename.lower().endswith('.csv'):
+        rows = question_bank.iter_csv(upload)
+    else:
+        flash('Question imports must be .csv or .jsonl files.', 'danger')
+        return redirect(url_for('admin_questions'))
+
+    conn = get_db_connection()
+    set_id = request.form.get('set_id', type=int)
+    new_set_title = request.form.get('new_set_title', '').strip()
+    try:
+        with db.transaction(conn):
+            if new_set_title:
+                set_id = conn.execute('INSERT INTO question_sets (title, description) VALUES (?, ?)',
+                                      (new_set_title, request.form.get('new_set_description', '').strip())).lastrowid
+            elif set_id and not conn.execute(SET_EXISTS_QUERY, (set_id,)).fetchone():
+                set_id = None
+            report = question_bank.import_questions(conn, rows, set_id or None)
+            if set_id:
+                quiz_cache.bump_versions(conn, [set_id])
+    except UnicodeDecodeError:
+        flash('The file is not UTF-8 text; nothing was imported.', 'danger')
+        return redirect(url_for('admin_questions'))
+
+    flash(f"Imported {report['inserted']} new questions from {report['read']} rows "
+          f"({report['duplicates']} duplicates, {report['invalid']} invalid"
+          + (f", {report['attached']} added to the set" if set_id else '') + ').', 'success')
+    for error in report['errors']:
+        flash(error, 'danger')
+    if report['invalid'] > len(report['errors']):
+        flash(f"...and {report['invalid'] - len(report['errors'])} more invalid rows.", 'danger')
+    return redirect(url_for('admin_questions'))
+
+@route('/admin/questions/export.<any(csv, jsonl):export_format>')
+def export_questions(export_format):
+    if not is_admin(): return redirect(url_for('login'))
+    set_id = request.args.get('set_id', type=int)
+    def rows():
+        yield from question_bank.iter_questions(get_db_connection(), set_id)
+    if export_format == 'csv':
+        body, mimetype = question_bank.stream_csv(rows()), 'text/csv'
+    else:
+        body, mimetype = question_bank.stream_jsonl(rows()), 'application/x-ndjson'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=questions.{export_format}'})
 
-@app.route('/admin/questions/add', methods=['GET', 'POST'])
+@route('/admin/questions/add', methods=['GET', 'POST'])
 def add_question():
     if not is_admin(): return redirect(url_for('login'))
     if request.method == 'POST':
         conn = get_db_connection()
+        question = {column: request.form.get(column) for column in question_bank.COLUMNS}
         conn.execute('''
-            INSERT INTO questions (question_text, question_type, topic, option_a, option_b, option_c, option_d, correct_answer, correct_code_output)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO questions (question_text, question_type, topic, option_a, option_b, option_c, option_d, correct_answer, correct_code_output, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             request.form['question_text'], request.form['question_type'], request.form['topic'],
             request.form.get('option_a'), request.form.get('option_b'), request.form.get('option_c'), request.form.get('option_d'),
-            request.form.get('correct_answer'), request.form.get('correct_code_output')
+            request.form.get('correct_answer'), request.form.get('correct_code_output'), question_bank.content_hash(question)
         ))
         conn.commit()
-        conn.close()
         flash('Question added successfully!', 'success')
         return redirect(url_for('admin_questions'))
     return render_template('admin/add_question.html')
 
-@app.route('/admin/questions/edit/<int:id>', methods=['GET', 'POST'])
+@route('/admin/questions/edit/<int:id>', methods=['GET', 'POST'])
 def edit_question(id):
     if not is_admin(): return redirect(url_for('login'))
     conn = get_db_connection()
     if request.method == 'POST':
         text, topic = request.form['question_text'], request.form['topic']
-        conn.execute('UPDATE questions SET question_text = ?, topic = ? WHERE id = ?', (text, topic, id))
-        conn.commit()
+        with db.transaction(conn):
+            conn.execute('UPDATE questions SET question_text = ?, topic = ? WHERE id = ?', (text, topic, id))
+            question_bank.refresh_hash(conn, id)
+            quiz_cache.bump_versions(conn, quiz_cache.sets_containing(conn, id))
         flash('Question updated successfully!', 'success')
         return redirect(url_for('admin_questions'))
     question = conn.execute('SELECT * FROM questions WHERE id = ?', (id,)).fetchone()
-    conn.close()
     return render_template('admin/edit_question.html', question=question)
 
-@app.route('/admin/history')
+@route('/admin/history')
 def student_history():
     if not is_admin(): return redirect(url_for('login'))
     conn = get_db_connection()
     
     search_query = request.args.get('search', '')
-    base_query = '''
-        SELECT 
-            u.username, u.student_code, u.first_name, u.last_name, 
-            qs.title, r.score, r.total_questions, r.time_start, r.timestamp as time_end,
-            r.id as result_id,
-            ROW_NUMBER() OVER(PARTITION BY r.user_id, r.set_id ORDER BY r.timestamp) as attempt_number
-        FROM results r
-        JOIN users u ON u.id = r.user_id
-        JOIN question_sets qs ON qs.id = r.set_id
-        WHERE u.is_admin = 0
-    '''
-    params = []
-    if search_query:
-        base_query += ' AND (u.username LIKE ? OR u.first_name LIKE ? OR u.last_name LIKE ?)'
-        params.extend([f'%{search_query}%', f'%{search_query}%', f'%{search_query}%'])
-    base_query += ' ORDER BY r.timestamp DESC'
-    history_raw = conn.execute(base_query, params).fetchall()
-    history = []
-    for row in history_raw:
-        row_dict = dict(row)
-        start_time = datetime.fromisoformat(row['time_start']) if isinstance(row['time_start'], str) else row['time_start']
-        end_time = datetime.fromisoformat(row['time_end']) if isinstance(row['time_end'], str) else row['time_end']
-        row_dict['duration'] = format_duration(start_time, end_time)
-        row_dict['time_start_formatted'] = start_time.strftime('%I:%M:%S %p') if start_time else "N/A"
-        row_dict['time_end_formatted'] = end_time.strftime('%I:%M:%S %p') if end_time else "N/A"
-        row_dict['date_formatted'] = end_time.strftime('%Y-%m-%d') if end_time else "N/A"
-        history.append(row_dict)
-    conn.close()
-    return render_template('admin/history.html', history=history, search_query=search_query)
+    before_ts, before_id = request.args.get('before_ts'), request.args.get('before_id', type=int)
+    row_offset = request.args.get('offset', 0, type=int)
+    before = (before_ts, before_id) if before_ts and before_id else None
+    archived = request.args.get('archived') == '1'
+    if archived:
+        history_rows, next_cursor = archive.get_admin_page(conn, current_app.config['ARCHIVE_DIRECTORY'], search_query, before)
+    else:
+        history_rows, next_cursor = history.get_admin_page(conn, search_query, before)
+    return render_template('admin/history.html', history=history_rows, search_query=search_query,
+                           next_cursor=next_cursor, row_offset=row_offset, archived=archived,
+                           has_archive=bool(archive.list_archives(current_app.config['ARCHIVE_DIRECTORY'])))
+
+@route('/admin/history/export.<any(csv, jsonl):export_format>')
+def export_student_history(export_format):
+    if not is_admin(): return redirect(url_for('login'))
+    search_query = request.args.get('search', '')
+    archived = request.args.get('archived') == '1'
+    def rows():
+        # Opened inside the stream: the view's own connection goes back to the pool as soon as it returns
+        if archived:
+            yield from archive.iter_admin_history(get_db_connection(), current_app.config['ARCHIVE_DIRECTORY'], search_query)
+        else:
+            yield from history.iter_admin_history(get_db_connection(), search_query)
+    if export_format == 'csv':
+        body, mimetype = history.stream_csv(rows()), 'text/csv'
+    else:
+        body, mimetype = history.stream_jsonl(rows()), 'application/x-ndjson'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=student_history.{export_format}'})
+
+@route('/metrics')
+def metrics_endpoint():
+    if not is_admin() and not metrics.token_matches(current_app): return redirect(url_for('login'))
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 # --- Student Routes ---
-@app.route('/history')
+@route('/history')
 def student_result_history():
     if not get_user_id() or is_admin():
         return redirect(url_for('login'))
     conn = get_db_connection()
-    history_raw = conn.execute('''
-        SELECT qs.title, r.score, r.total_questions, r.time_start, r.timestamp as time_end, r.id as result_id,
-               ROW_NUMBER() OVER(PARTITION BY r.user_id, r.set_id ORDER BY r.timestamp) as attempt_number
-        FROM results r JOIN question_sets qs ON r.set_id = qs.id
-        WHERE r.user_id = ? ORDER BY r.timestamp DESC
-    ''', (get_user_id(),)).fetchall()
-    history = []
-    for row in history_raw:
-        row_dict = dict(row)
-        start_time = datetime.fromisoformat(row['time_start']) if isinstance(row['time_start'], str) else row['time_start']
-        end_time = datetime.fromisoformat(row['time_end']) if isinstance(row['time_end'], str) else row['time_end']
-        row_dict['duration'] = format_duration(start_time, end_time)
-        row_dict['time_start_formatted'] = start_time.strftime('%I:%M:%S %p') if start_time else "N/A"
-        row_dict['time_end_formatted'] = end_time.strftime('%I:%M:%S %p') if end_time else "N/A"
-        history.append(row_dict)
-    conn.close()
-    return render_template('student/history.html', history=history)
+    # Archived terms are only attached when the student asks for older attempts
+    archived = request.args.get('archived') == '1'
+    if archived:
+        history_rows = archive.get_student_history(conn, current_app.config['ARCHIVE_DIRECTORY'], get_user_id())
+    else:
+        history_rows = history.get_student_history(conn, get_user_id())
+    return render_template('student/history.html', history=history_rows, archived=archived,
+                           has_archive=bool(archive.list_archives(current_app.config['ARCHIVE_DIRECTORY'])))
     
-@app.route('/id_card/<student_code>')
+@route('/id_card/<student_code>')
 def id_card(student_code):
     conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE student_code = ?', (student_code,)).fetchone()
+    user = summaries.get_student_by_code(conn, student_code)
     
     if not user:
         return "User not found", 404
 
-    proficiency_raw = conn.execute('SELECT * FROM student_topic_mastery WHERE user_id = ?', (user['id'],)).fetchall()
-    
-    total_xp = sum(topic['xp'] for topic in proficiency_raw)
-    total_possible_xp = len(proficiency_raw) * XP_TO_LEVEL_UP if proficiency_raw else 0
-    overall_percentage = (total_xp / total_possible_xp) * 100 if total_possible_xp > 0 else 0
-    
-    proficiency_level, proficiency_color_text, proficiency_color_bg = get_proficiency_level(overall_percentage)
-    
-    achievements = conn.execute('''
-        SELECT a.name, a.icon FROM achievements a
-        JOIN student_achievements sa ON a.id = sa.achievement_id
-        WHERE sa.user_id = ?
-    ''', (user['id'],)).fetchall()
-
-    conn.close()
-    return render_template('student/id_card.html', 
-                           user=user, 
-                           proficiency_level=proficiency_level,
-                           proficiency_color_bg=proficiency_color_bg,
-                           achievements=achievements)
-
-@app.route('/achievements')
+    # Only changes when the student's data, the template or the asset build does
+    etag = assets.page_etag('student/id_card.html', user)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        proficiency_level, proficiency_color_text, proficiency_color_bg = get_proficiency_level(user['mastery_percentage'])
+        response = make_response(render_template('student/id_card.html', 
+                                                 user=user, 
+                                                 proficiency_level=proficiency_level,
+                                                 proficiency_color_bg=proficiency_color_bg,
+                                                 achievements=user['achievements']))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@route('/achievements')
 def achievements():
     if not get_user_id() or is_admin():
         return redirect(url_for('login'))
-    return render_template('student/achievements.html')
+    return render_template('student/achievements.html', achievements=awards.get_catalogue(get_db_connection(), get_user_id()))
 
-@app.route('/sandbox')
+@route('/sandbox')
 def code_sandbox():
     if not get_user_id() or is_admin():
         return redirect(url_for('login'))
     return render_template('student/sandbox.html')
 
-@app.route('/leaderboard')
+@route('/leaderboard')
 def leaderboard():
     if not get_user_id() or is_admin():
         return redirect(url_for('login'))
+    page = max(request.args.get('page', 1, type=int), 1)
     conn = get_db_connection()
-    leaderboard_data = conn.execute('''
-        SELECT first_name, last_name, level, xp, profile_image, id
-        FROM users
-        WHERE is_admin = 0
-        ORDER BY level DESC, xp DESC
-    ''').fetchall()
-    conn.close()
-    return render_template('student/leaderboard.html', leaderboard=leaderboard_data)
-
-@app.route('/quiz/<int:set_id>')
+    leaderboard_data = rankings.get_page(conn, page)
+    total_pages = max(-(-rankings.get_student_count(conn) // rankings.PAGE_SIZE), 1)
+    return render_template('student/leaderboard.html', leaderboard=leaderboard_data, page=page, total_pages=total_pages)
+
+@route('/leaderboard/me')
+def leaderboard_me():
+    if not get_user_id() or is_admin():
+        return redirect(url_for('login'))
+    conn = get_db_connection()
+    my_rank, leaderboard_data = rankings.get_neighbourhood(conn, get_user_id())
+    return render_template('student/leaderboard.html', leaderboard=leaderboard_data, my_rank=my_rank)
+
+@route('/quiz/<int:set_id>')
 def quiz(set_id):
     if not get_user_id(): return redirect(url_for('login'))
     session['quiz_start_time'] = datetime.now().isoformat()
     conn = get_db_connection()
-    questions = conn.execute('SELECT q.* FROM questions q JOIN set_questions sq ON q.id = sq.question_id WHERE sq.set_id = ?', (set_id,)).fetchall()
-    set_info = conn.execute('SELECT * FROM question_sets WHERE id = ?', (set_id,)).fetchone()
-    conn.close()
-    return render_template('student/quiz.html', questions=questions, set_info=set_info)
+    set_info, questions_html = quiz_cache.get_quiz_fragment(conn, set_id)
+    if not set_info: return "Quiz not found.", 404
+    return render_template('student/quiz.html', questions_html=questions_html, set_info=set_info)
 
-@app.route('/submit_quiz/<int:set_id>', methods=['POST'])
+@route('/submit_quiz/<int:set_id>', methods=['POST'])
 def submit_quiz(set_id):
     if not get_user_id(): return redirect(url_for('login'))
     start_time_str = session.pop('quiz_start_time', datetime.now().isoformat())
     start_time = datetime.fromisoformat(start_time_str)
 
     conn = get_db_connection()
-    questions = conn.execute('SELECT q.* FROM questions q JOIN set_questions sq ON q.id = sq.question_id WHERE sq.set_id = ?', (set_id,)).fetchall()
-    
+    answer_key = quiz_cache.get_answer_key(conn, set_id)
+    if answer_key is None: return "Quiz not found.", 404
+    user_id = get_user_id()
+
+    # Grade all coding answers in parallel before touching the database
+    try:
+        coding_results = grading.grade_code_answers([
+            (q['id'], request.form.get(f'question_{q["id"]}'), q['correct_code_output'])
+            for q in answer_key if q['question_type'] == 'coding'
+        ])
+    except grading.GradingUnavailable as e:
+        current_app.logger.error('Refused a quiz submission for set %s: %s', set_id, e)
+        return "Code grading is unavailable right now, so your answers were not submitted. Please tell your teacher.", 503
+
+    # Grade in memory, aggregating mastery XP per topic
+    answers = []
+    topic_xp = {}
+    topic_answers = {}
     score = 0
-    total_xp_gained = 0
-
-    result_cursor = conn.cursor()
-    result_cursor.execute('INSERT INTO results (user_id, set_id, score, total_questions, time_start) VALUES (?, ?, 0, ?, ?)',
-                          (get_user_id(), set_id, len(questions), start_time))
-    result_id = result_cursor.lastrowid
-
-    for q in questions:
+    for q in answer_key:
         user_answer = request.form.get(f'question_{q["id"]}')
-        is_correct = 1 if (q['question_type'] == 'multiple_choice' and user_answer == q['correct_answer']) else 0
-
+        if q['question_type'] == 'coding':
+            is_correct = 1 if coding_results[q['id']]['passed'] else 0
+        else:
+            is_correct = 1 if (q['question_type'] == 'multiple_choice' and user_answer == q['correct_answer']) else 0
         if is_correct:
             score += 1
-            total_xp_gained += XP_PER_CORRECT_ANSWER
-            
-            conn.execute('''
-                INSERT INTO student_topic_mastery (user_id, topic, xp) VALUES (?, ?, ?)
-                ON CONFLICT(user_id, topic) DO UPDATE SET xp = xp + ?
-            ''', (get_user_id(), q['topic'], XP_PER_CORRECT_ANSWER, XP_PER_CORRECT_ANSWER))
-
-        conn.execute('INSERT INTO student_answers (result_id, question_id, user_answer, is_correct) VALUES (?, ?, ?, ?)', (result_id, q['id'], user_answer, is_correct))
-
-    # Award "First Steps" achievement
-    conn.execute('INSERT OR IGNORE INTO student_achievements (user_id, achievement_id) VALUES (?, 1)', (get_user_id(),))
-
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (get_user_id(),)).fetchone()
-    new_xp = user['xp'] + total_xp_gained
-    new_level = user['level']
-    while new_xp >= XP_TO_LEVEL_UP:
-        new_level += 1
-        new_xp -= XP_TO_LEVEL_UP
-    
-    conn.execute('UPDATE users SET xp = ?, level = ? WHERE id = ?', (new_xp, new_level, get_user_id()))
-    conn.execute('UPDATE results SET score = ?, timestamp = ? WHERE id = ?', (score, datetime.now(), result_id))
-    
-    conn.commit()
-    conn.close()
-    
+            topic_xp[q['topic']] = topic_xp.get(q['topic'], 0) + XP_PER_CORRECT_ANSWER
+        answered, correct = topic_answers.get(q['topic'], (0, 0))
+        topic_answers[q['topic']] = (answered + 1, correct + is_correct)
+        answers.append((q['id'], user_answer, is_correct))
+    total_xp_gained = score * XP_PER_CORRECT_ANSWER
+
+    with db.transaction(conn):
+        end_time = datetime.now()
+        result_id = conn.execute('''
+            INSERT INTO results (user_id, set_id, score, total_questions, time_start, timestamp, duration_seconds, attempt_number)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, set_id, score, len(answer_key), start_time, end_time, int((end_time - start_time).total_seconds()),
+              history.next_attempt_number(conn, user_id, set_id))).lastrowid
+        conn.executemany('INSERT INTO student_answers (result_id, question_id, user_answer, is_correct) VALUES (?, ?, ?, ?)',
+                         [(result_id, question_id, user_answer, is_correct) for question_id, user_answer, is_correct in answers])
+        known_topics = {row['topic'] for row in conn.execute(KNOWN_TOPICS_QUERY, (user_id,))}
+        conn.executemany('''
+            INSERT INTO student_topic_mastery (user_id, topic, xp) VALUES (?, ?, ?)
+            ON CONFLICT(user_id, topic) DO UPDATE SET xp = xp + excluded.xp
+        ''', [(user_id, topic, xp) for topic, xp in topic_xp.items()])
+
+        # Both expressions read the pre-update xp, so carry-over levels are applied in one statement
+        conn.execute('UPDATE users SET level = level + (xp + ?) / ?, xp = (xp + ?) % ? WHERE id = ?',
+                     (total_xp_gained, XP_TO_LEVEL_UP, total_xp_gained, XP_TO_LEVEL_UP, user_id))
+        new_topics = set(topic_xp) - known_topics
+        summaries.record_submission(conn, user_id, result_id, score, len(answer_key), topic_answers,
+                                    total_xp_gained, len(new_topics), XP_TO_LEVEL_UP)
+        if not is_admin():
+            if total_xp_gained:
+                user = conn.execute(LEVEL_QUERY, (user_id,)).fetchone()
+                rankings.update_rank(conn, user_id, user['level'], user['xp'], XP_TO_LEVEL_UP)
+            rollups.record_submission(conn, user_id, set_id, result_id, score, len(answer_key), topic_answers,
+                                      new_topics, PASSING_THRESHOLD)
+            item_analysis.record_submission(conn, score, len(answer_key), answers, topic_answers)
+            awards.publish(conn, user_id, result_id, score, len(answer_key),
+                           score * 100.0 / len(answer_key) >= PASSING_THRESHOLD if answer_key else False, end_time)
+    # Achievements are evaluated by the background worker once the result is committed
+    awards.notify()
+
     return redirect(url_for('results', result_id=result_id))
 
-@app.route('/results/<int:result_id>')
+@route('/results/<int:result_id>')
 def results(result_id):
     if not get_user_id(): return redirect(url_for('login'))
     conn = get_db_connection()
-    result = conn.execute('SELECT * FROM results WHERE id = ? AND user_id = ?', (result_id, get_user_id())).fetchone()
+    result, topic_breakdown = summaries.get_result(conn, result_id, get_user_id())
+    if not result:
+        result, topic_breakdown = archive.get_result(conn, current_app.config['ARCHIVE_DIRECTORY'], result_id, get_user_id())
     if not result: return "Result not found or you do not have permission to view it.", 404
     
-    proficiency_data = calculate_proficiency(get_user_id(), conn, result_id)
+    proficiency_data = calculate_proficiency(topic_breakdown)
     
     return render_template('student/results.html', result=result, proficiency=proficiency_data)
 
 if __name__ == '__main__':
-    if not os.path.exists('pypath.db'):
-        init_db()
-    app.run(debug=True)
+    # Development server only (debug with PYPATH_DEBUG=true); production runs wsgi.py under a pre-fork server
+    app = create_app()
+    prepare_database(app)
+    app.run()
@@ -0,0 +1,266 @@
+import json
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+import db
+import history
+import summaries
+
+# --- Hot/Cold Archival ---
+# `flask archive-results` moves results older than a cutoff, with their answers, out of
+# the live database into one SQLite file per term (instance/archive/results-2024-t1.db),
+# so the pages students and admins open every day only ever touch recent rows. Topic
+# breakdowns, summaries, rollups and item statistics stay in the live database untouched.
+# Historical views ATTACH one archive at a time (SQLite allows at most ten attached
+# databases) and only when asked to; rebuild commands see archived rows through
+# including_archived(). Afterwards the freed pages are released with incremental VACUUM.
+
+ARCHIVE_AFTER_DAYS = 365
+TERM_START_MONTHS = (1, 5, 9) # Archive files are named <year>-t<n> after the term a result falls in
+MOVE_BATCH_SIZE = 500 # Results moved per write transaction, so live writers only ever wait briefly
+VACUUM_STEP_PAGES = 2000
+ARCHIVE_ALIAS = 'archive'
+ARCHIVE_FILE_PATTERN = re.compile(r'^results-(\d{4})-t(\d+)\.db$')
+
+RESULT_COLUMNS = ('id', 'user_id', 'set_id', 'score', 'total_questions', 'time_start', 'timestamp',
+                  'duration_seconds', 'attempt_number')
+ANSWER_COLUMNS = ('id', 'result_id', 'question_id', 'user_answer', 'is_correct')
+
+ARCHIVE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        set_id INTEGER NOT NULL,
+        score INTEGER NOT NULL,
+        total_questions INTEGER NOT NULL,
+        time_start DATETIME NOT NULL,
+        timestamp DATETIME,
+        duration_seconds INTEGER,
+        attempt_number INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS student_answers (
+        id INTEGER PRIMARY KEY,
+        result_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        user_answer TEXT,
+        is_correct INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_results_user_timestamp ON results (user_id, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_results_timestamp_id ON results (timestamp, id);
+    CREATE INDEX IF NOT EXISTS idx_student_answers_result ON student_answers (result_id, question_id, is_correct);
+'''
+
+# --- Terms and Files ---
+def term_of(day):
+    number = sum(1 for month in TERM_START_MONTHS if month <= day.month)
+    return day.year, max(number, 1)
+
+def term_bounds(year, number):
+    """Returns the [start, end) dates of a term."""
+    start = date(year, TERM_START_MONTHS[number - 1], 1)
+    if number == len(TERM_START_MONTHS):
+        return start, date(year + 1, TERM_START_MONTHS[0], 1)
+    return start, date(year, TERM_START_MONTHS[number], 1)
+
+def _next_term(year, number):
+    return (year + 1, 1) if number == len(TERM_START_MONTHS) else (year, number + 1)
+
+def archive_path(directory, year, number):
+    return os.path.join(directory, f'results-{year}-t{number}.db')
+
+def list_archives(directory):
+    """Returns the archive files in `directory`, newest term first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    terms = sorted(((int(match[1]), int(match[2])) for match in map(ARCHIVE_FILE_PATTERN.match, names) if match), reverse=True)
+    return [archive_path(directory, year, number) for year, number in terms]
+
+@contextmanager
+def attached(conn, path):
+    """Attaches an archive file for the duration of the block; yields its qualified results table."""
+    if conn.in_transaction:
+        conn.commit() # ATTACH and DETACH are refused inside a transaction
+    if any(row['name'] == ARCHIVE_ALIAS for row in conn.execute('PRAGMA database_list')):
+        conn.execute(f'DETACH DATABASE {ARCHIVE_ALIAS}') # Left behind by an interrupted stream on this pooled connection
+    conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_ALIAS}', (path,))
+    try:
+        yield f'{ARCHIVE_ALIAS}.results'
+    finally:
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute(f'DETACH DATABASE {ARCHIVE_ALIAS}')
+
+# --- Archiving ---
+def _create_archive(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(ARCHIVE_SCHEMA)
+    finally:
+        conn.close()
+
+def _move_term(conn, path, start, end):
+    select = 'SELECT id FROM main.results WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp LIMIT ?'
+    if conn.execute(select, (start, end, 1)).fetchone() is None:
+        return 0
+    _create_archive(path)
+    result_columns, answer_columns = ', '.join(RESULT_COLUMNS), ', '.join(ANSWER_COLUMNS)
+    moved = 0
+    with attached(conn, path):
+        while True:
+            with db.transaction(conn):
+                ids = [row['id'] for row in conn.execute(select, (start, end, MOVE_BATCH_SIZE))]
+                if not ids:
+                    break
+                batch = (json.dumps(ids),)
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO {ARCHIVE_ALIAS}.results ({result_columns})
+                    SELECT {result_columns} FROM main.results WHERE id IN (SELECT value FROM json_each(?))
+                ''', batch)
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO {ARCHIVE_ALIAS}.student_answers ({answer_columns})
+                    SELECT {answer_columns} FROM main.student_answers WHERE result_id IN (SELECT value FROM json_each(?))
+                ''', batch)
+                conn.execute('DELETE FROM main.student_answers WHERE result_id IN (SELECT value FROM json_each(?))', batch)
+                conn.execute('DELETE FROM main.results WHERE id IN (SELECT value FROM json_each(?))', batch)
+            moved += len(ids)
+    return moved
+
+def archive_results(conn, directory, cutoff):
+    """Moves every result dated before `cutoff`, with its answers, into its term's archive file.
+
+    Returns {archive path: results moved}. The live database is in WAL mode, so each batch
+    commits atomically per file rather than across both; the archive side uses
+    INSERT OR REPLACE, so re-running after an interrupted move is always safe.
+    """
+    os.makedirs(directory, exist_ok=True)
+    oldest = conn.execute('SELECT MIN(timestamp) FROM main.results WHERE timestamp < ?', (cutoff.isoformat(),)).fetchone()[0]
+    moved = {}
+    if oldest is None:
+        return moved
+    year, number = term_of(date.fromisoformat(str(oldest)[:10]))
+    while True:
+        start, end = term_bounds(year, number)
+        if start >= cutoff:
+            break
+        path = archive_path(directory, year, number)
+        count = _move_term(conn, path, start.isoformat(), min(end, cutoff).isoformat())
+        if count:
+            moved[path] = count
+        year, number = _next_term(year, number)
+    return moved
+
+# --- Live Database Maintenance ---
+def maintain(conn, step_pages=VACUUM_STEP_PAGES):
+    """Returns freed pages to the filesystem a step at a time, then refreshes planner statistics.
+
+    A database created before incremental auto-vacuum was enabled needs one full VACUUM
+    to switch over; after that every run only moves the pages archiving freed.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    converted = False
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        converted = True
+    freed = 0
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    while free_pages:
+        conn.execute(f'PRAGMA incremental_vacuum({int(step_pages)})').fetchall() # Each step is its own short write
+        remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if remaining >= free_pages:
+            break
+        freed, free_pages = freed + free_pages - remaining, remaining
+    conn.execute('PRAGMA optimize')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    return {'converted': converted, 'freed_pages': freed,
+            'page_size': conn.execute('PRAGMA page_size').fetchone()[0],
+            'page_count': conn.execute('PRAGMA page_count').fetchone()[0]}
+
+# --- Historical Reads ---
+def get_student_history(conn, directory, user_id):
+    """The student's live results followed by their archived ones, newest first."""
+    rows = list(history.get_student_history(conn, user_id))
+    for path in list_archives(directory):
+        with attached(conn, path) as results:
+            rows += history.get_student_history(conn, user_id, results)
+    return rows
+
+def get_admin_page(conn, directory, search='', before=None, page_size=history.PAGE_SIZE):
+    """history.get_admin_page continued into the archives under the same (timestamp, id) cursor.
+
+    Terms never overlap and the live database only holds results newer than the last
+    cutoff, so the live rows and then each archive, newest first, are already in order.
+    """
+    rows, next_cursor = history.get_admin_page(conn, search, before, page_size)
+    rows = list(rows)
+    for path in list_archives(directory):
+        if next_cursor is not None:
+            break
+        if len(rows) == page_size:
+            next_cursor = (rows[-1]['time_end'], rows[-1]['result_id']) # Older rows may still be archived
+            break
+        cursor = (rows[-1]['time_end'], rows[-1]['result_id']) if rows else before
+        with attached(conn, path) as results:
+            more, next_cursor = history.get_admin_page(conn, search, cursor, page_size - len(rows), results)
+        rows += more
+    return rows, next_cursor
+
+def iter_admin_history(conn, directory, search=''):
+    yield from history.iter_admin_history(conn, search)
+    for path in list_archives(directory):
+        with attached(conn, path) as results:
+            yield from history.iter_admin_history(conn, search, results)
+
+def get_result(conn, directory, result_id, user_id):
+    """Looks up a result that is no longer in the live database; (None, None) if no archive has it."""
+    for path in list_archives(directory):
+        with attached(conn, path) as results:
+            result, breakdown = summaries.get_result(conn, result_id, user_id, results)
+        if result:
+            return result, breakdown
+    return None, None
+
+# --- Rebuilds ---
+@contextmanager
+def including_archived(conn, directory):
+    """Shadows results and student_answers with TEMP tables holding the live and archived rows.
+
+    Unqualified table names resolve to temp before main, so the rebuild functions read the
+    full history unchanged and rebuilt rollups still count archived results. temp_store
+    is switched to FILE for the duration so a long history spills to disk, not memory.
+    """
+    archives = list_archives(directory)
+    if not archives:
+        yield
+        return
+    if conn.in_transaction:
+        conn.commit()
+    result_columns, answer_columns = ', '.join(RESULT_COLUMNS), ', '.join(ANSWER_COLUMNS)
+    conn.execute('PRAGMA temp_store = FILE')
+    try:
+        conn.execute(f'CREATE TEMP TABLE results AS SELECT {result_columns} FROM main.results')
+        conn.execute(f'CREATE TEMP TABLE student_answers AS SELECT {answer_columns} FROM main.student_answers')
+        for path in archives:
+            with attached(conn, path):
+                conn.execute(f'INSERT INTO temp.results SELECT {result_columns} FROM {ARCHIVE_ALIAS}.results')
+                conn.execute(f'INSERT INTO temp.student_answers SELECT {answer_columns} FROM {ARCHIVE_ALIAS}.student_answers')
+        conn.execute('CREATE UNIQUE INDEX temp.idx_results_id ON results (id)')
+        conn.execute('CREATE INDEX temp.idx_results_user_timestamp ON results (user_id, timestamp)')
+        conn.execute('CREATE INDEX temp.idx_student_answers_result ON student_answers (result_id, question_id, is_correct)')
+        conn.commit()
+        yield
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute('DROP TABLE IF EXISTS temp.results')
+        conn.execute('DROP TABLE IF EXISTS temp.student_answers')
+        conn.execute('PRAGMA temp_store = MEMORY')
+
+def init_app(app):
+    app.config.setdefault('ARCHIVE_DIRECTORY', os.path.join(app.instance_path, 'archive'))
+    app.config.setdefault('ARCHIVE_AFTER_DAYS', ARCHIVE_AFTER_DAYS)
@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import urllib.parse
+from flask import current_app, request, send_file, abort
+
+# --- Vendored Static Assets ---
+# `flask build-assets` downloads every third-party script, stylesheet and font the
+# templates use into static/assets/, names each file after its content hash and writes
+# .gz (and .br) siblings plus a manifest. Templates call asset_url(name): it returns the
+# fingerprinted local URL once the asset is built, and the pinned CDN URL until then.
+# Fingerprinted URLs never change meaning, so they are served as immutable for a year.
+
+ASSET_DIR = os.path.join('static', 'assets')
+MANIFEST_NAME = 'manifest.json'
+ASSET_CACHE_SECONDS = 365 * 24 * 3600
+COMPRESSIBLE = ('.js', '.css', '.svg', '.json', '.txt')
+FONT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+CODEMIRROR = 'https://cdnjs.cloudflare.com/ajax/libs/codemirror/5.65.10'
+BRYTHON = 'https://cdn.jsdelivr.net/npm/brython@3.11.0'
+
+SOURCES = {
+    'tailwind.js': 'https://cdn.tailwindcss.com/3.4.3',
+    'chart.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js',
+    'lucide.js': 'https://unpkg.com/lucide@0.378.0/dist/umd/lucide.min.js',
+    'lucide-react.js': 'https://cdn.jsdelivr.net/npm/lucide-react@0.378.0/dist/lucide-react.js',
+    'login-background.jpg': 'https://images.unsplash.com/photo-1507525428034-b723a9ce6890?q=80&w=2070&auto=format&fit=crop',
+    'qrcode.js': 'https://cdn.jsdelivr.net/npm/qrcode-generator@1.4.4/qrcode.js',
+    'inter.css': 'https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap',
+    'brython.js': f'{BRYTHON}/brython.min.js',
+    'brython_stdlib.js': f'{BRYTHON}/brython_stdlib.js',
+    'codemirror.css': f'{CODEMIRROR}/codemirror.min.css',
+    'codemirror-dracula.css': f'{CODEMIRROR}/theme/dracula.min.css',
+    'codemirror.js': f'{CODEMIRROR}/codemirror.min.js',
+    'codemirror-python.js': f'{CODEMIRROR}/mode/python/python.min.js',
+    'codemirror-show-hint.css': f'{CODEMIRROR}/addon/hint/show-hint.min.css',
+    'codemirror-show-hint.js': f'{CODEMIRROR}/addon/hint/show-hint.min.js',
+    'codemirror-python-hint.js': f'{CODEMIRROR}/addon/hint/python-hint.js',
+}
+
+CSS_URL_PATTERN = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+
+def _asset_dir(app):
+    return os.path.join(app.root_path, ASSET_DIR)
+
+# --- Build ---
+# urllib.request and brotli are only needed by `flask build-assets`, so workers never import them
+def get_brotli():
+    try:
+        import brotli
+    except ImportError: # Brotli is optional; without it only .gz variants are built
+        return None
+    return brotli
+
+def _fetch(url):
+    import urllib.request
+    req = urllib.request.Request(url, headers={'User-Agent': FONT_USER_AGENT})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.read()
+
+def _fingerprinted_name(name, content):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+def _write(directory, name, content):
+    filename = _fingerprinted_name(name, content)
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(content)
+        if filename.endswith(COMPRESSIBLE):
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(content, compresslevel=9, mtime=0))
+            brotli = get_brotli()
+            if brotli is not None:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(content, quality=11))
+    return filename
+
+def _vendor_css(directory, name, url, content):
+    """Downloads everything a stylesheet points at (fonts, images) and rewrites it to local copies."""
+    css = content.decode('utf-8')
+    stem = os.path.splitext(name)[0]
+    def localize(match):
+        target = match.group(1)
+        if target.startswith('data:'):
+            return match.group(0)
+        absolute = urllib.parse.urljoin(url, target)
+        basename = os.path.basename(urllib.parse.urlparse(absolute).path) or 'resource'
+        return f'url({_write(directory, f"{stem}-{basename}", _fetch(absolute))})'
+    return CSS_URL_PATTERN.sub(localize, css).encode('utf-8')
+
+def build(app, sources=None):
+    """Vendors every source into static/assets/ and rewrites the manifest; returns (manifest, failures)."""
+    directory = _asset_dir(app)
+    os.makedirs(directory, exist_ok=True)
+    manifest, failures = {}, {}
+    for name, url in (sources or SOURCES).items():
+        try:
+            content = _fetch(url)
+            if name.endswith('.css'):
+                content = _vendor_css(directory, name, url, content)
+            manifest[name] = _write(directory, name, content)
+        except (OSError, ValueError) as e: # urllib errors are OSErrors
+            failures[name] = str(e)
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    _manifests.pop(app.root_path, None)
+    return manifest, failures
+
+# --- Lookup ---
+_manifests = {}
+
+def _load(app):
+    # (manifest, version), read once per process; the version changes whenever a rebuild changes any URL
+    loaded = _manifests.get(app.root_path)
+    if loaded is None:
+        try:
+            with open(os.path.join(_asset_dir(app), MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        version = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+        loaded = _manifests[app.root_path] = (manifest, version)
+    return loaded
+
+def get_manifest(app=None):
+    return _load(app or current_app)[0]
+
+def asset_url(name):
+    filename = get_manifest().get(name)
+    if filename is None:
+        return SOURCES[name]
+    return f'/assets/{filename}'
+
+def manifest_version():
+    return _load(current_app)[1]
+
+def send_asset(filename):
+    """Serves a fingerprinted asset, preferring a precompressed variant the client accepts."""
+    if '/' in filename or filename.startswith('.') or filename == MANIFEST_NAME:
+        abort(404)
+    path = os.path.join(_asset_dir(current_app), filename)
+    if not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[candidate] and os.path.isfile(path + suffix):
+            path, encoding = path + suffix, candidate
+            break
+    etag = filename.rsplit('.', 2)[-2] + (f'-{encoding}' if encoding else '')
+    response = send_file(path, mimetype=mimetype, etag=etag, max_age=ASSET_CACHE_SECONDS, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# --- Conditional Pages ---
+def page_etag(template_name, *parts):
+    """ETag for a rendered page: the data it shows, the template source and the asset build."""
+    template_path = os.path.join(current_app.root_path, current_app.template_folder, template_name)
+    digest = hashlib.sha256(json.dumps(parts, default=str, sort_keys=True).encode())
+    digest.update(f'{os.path.getmtime(template_path)}:{manifest_version()}'.encode())
+    return digest.hexdigest()[:32]
+
+def init_app(app):
+    app.jinja_env.globals['asset_url'] = asset_url
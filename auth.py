@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+# --- Password Hashing ---
+# bcrypt releases the GIL, so hashing runs on a small bounded thread pool: a login storm
+# queues behind AUTH_WORKERS hashes instead of occupying every request thread's CPU,
+# and once AUTH_MAX_QUEUE hashes are waiting new attempts are turned away immediately.
+
+BCRYPT_ROUNDS = 12 # Override with app.config['BCRYPT_ROUNDS']; older hashes are upgraded on login
+AUTH_WORKERS = 4
+AUTH_MAX_QUEUE = 64
+AUTH_TIMEOUT_SECONDS = 10
+
+# Token buckets: (capacity, tokens refilled per second). The IP bucket is generous
+# because a whole computer lab usually shares one NAT address.
+IP_RATE_LIMIT = (100, 2)
+USERNAME_RATE_LIMIT = (5, 1 / 30)
+
+class AuthBusy(Exception):
+    pass
+
+_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix='auth')
+_pending = 0
+_pending_lock = threading.Lock()
+
+def _reset_after_fork():
+    # A pre-fork server may hash in the master (init_db); its pool threads do not exist in the workers
+    global _executor, _pending, _pending_lock
+    _executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix='auth')
+    _pending = 0
+    _pending_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_queue_depth():
+    return _pending
+
+def _run(fn, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= AUTH_MAX_QUEUE:
+            raise AuthBusy('Too many sign-ins in progress')
+        _pending += 1
+    def done(_):
+        global _pending
+        with _pending_lock:
+            _pending -= 1
+    future = _executor.submit(fn, *args)
+    future.add_done_callback(done)
+    try:
+        return future.result(timeout=AUTH_TIMEOUT_SECONDS)
+    except TimeoutError:
+        raise AuthBusy('Password check timed out')
+
+def get_rounds():
+    return current_app.config.get('BCRYPT_ROUNDS', BCRYPT_ROUNDS)
+
+def hash_password(password):
+    return _run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(get_rounds()))
+
+def check_password(password, hashed):
+    if isinstance(hashed, str):
+        hashed = hashed.encode('utf-8')
+    return _run(bcrypt.checkpw, password.encode('utf-8'), hashed)
+
+def needs_rehash(hashed):
+    if isinstance(hashed, str):
+        hashed = hashed.encode('utf-8')
+    try:
+        return int(hashed.split(b'$')[2]) != get_rounds()
+    except (IndexError, ValueError):
+        return True
+
+# --- Rate Limiting ---
+class TokenBucket:
+    def __init__(self, capacity, refill_rate):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def consume(self, key):
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.tokens.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+            allowed = tokens >= 1
+            self.tokens[key] = (tokens - 1 if allowed else tokens, now)
+            if len(self.tokens) > 10000:
+                self._prune(now)
+            return allowed
+
+    def reset(self, key):
+        with self.lock:
+            self.tokens.pop(key, None)
+
+    def _prune(self, now):
+        # Forget keys that have refilled completely; they behave exactly like unseen keys
+        full_after = self.capacity / self.refill_rate
+        self.tokens = {key: value for key, value in self.tokens.items() if now - value[1] < full_after}
+
+ip_limiter = TokenBucket(*IP_RATE_LIMIT)
+username_limiter = TokenBucket(*USERNAME_RATE_LIMIT)
+
+def allow_attempt(ip, username=None):
+    """Spends one token from the caller's IP bucket and, for logins, the username's bucket."""
+    if not ip_limiter.consume(ip):
+        return False
+    return username is None or username_limiter.consume(username.lower())
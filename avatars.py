@@ -0,0 +1,122 @@
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from flask import current_app
+
+def _pillow():
+    # Imported on first upload rather than at startup: Pillow is slow to import and most requests never need it
+    try:
+        from PIL import Image
+    except ImportError: # Pillow is optional; without it uploads are stored as sent (the client already crops to 96px)
+        return None
+    return Image
+
+# --- Blob Store Settings ---
+THUMBNAIL_SIZE = 96
+MAX_AVATAR_BYTES = 2 * 1024 * 1024
+AVATAR_CACHE_SECONDS = 365 * 24 * 3600
+
+# Magic bytes -> (extension, mimetype)
+AVATAR_FORMATS = {
+    b'\x89PNG\r\n\x1a\n': ('png', 'image/png'),
+    b'\xff\xd8\xff': ('jpg', 'image/jpeg'),
+    b'GIF87a': ('gif', 'image/gif'),
+    b'GIF89a': ('gif', 'image/gif'),
+}
+MIMETYPES = {ext: mimetype for ext, mimetype in AVATAR_FORMATS.values()}
+MIMETYPES['webp'] = 'image/webp'
+
+def get_avatar_dir():
+    return current_app.config.setdefault('AVATAR_DIR', os.path.join(current_app.instance_path, 'avatars'))
+
+def _blob_path(avatar_hash, ext):
+    # Two-character fan-out keeps directories small once thousands of students have avatars
+    return os.path.join(get_avatar_dir(), avatar_hash[:2], f'{avatar_hash}.{ext}')
+
+def decode_data_url(data):
+    """Turns a `data:image/...;base64,` URL (or bare base64) into raw bytes."""
+    if ',' in data and data.startswith('data:'):
+        data = data.split(',', 1)[1]
+    if len(data) > MAX_AVATAR_BYTES * 4 // 3 + 4:
+        raise ValueError('Image is too large')
+    try:
+        return base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError('Image data is not valid base64')
+
+def sniff_format(raw):
+    for magic, fmt in AVATAR_FORMATS.items():
+        if raw.startswith(magic):
+            return fmt
+    if raw[:4] == b'RIFF' and raw[8:12] == b'WEBP':
+        return 'webp', 'image/webp'
+    return None
+
+def make_thumbnail(raw):
+    """Returns (bytes, extension) of a square THUMBNAIL_SIZE thumbnail."""
+    Image = _pillow()
+    if Image is None:
+        fmt = sniff_format(raw)
+        if fmt is None:
+            raise ValueError('Unsupported image format')
+        return raw, fmt[0]
+    try:
+        with Image.open(BytesIO(raw)) as img:
+            img = img.convert('RGBA')
+            side = min(img.size)
+            left, top = (img.width - side) // 2, (img.height - side) // 2
+            img = img.crop((left, top, left + side, top + side)).resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+            out = BytesIO()
+            img.save(out, format='PNG', optimize=True)
+            return out.getvalue(), 'png'
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ValueError('Unsupported image format')
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def store_avatar(data):
+    """Decodes an uploaded image, stores its thumbnail once per content hash and returns the hash."""
+    raw = decode_data_url(data)
+    if len(raw) > MAX_AVATAR_BYTES:
+        raise ValueError('Image is too large')
+    avatar_hash = hashlib.sha256(raw).hexdigest()
+    if find_avatar(avatar_hash) is None:
+        thumbnail, ext = make_thumbnail(raw)
+        _write_atomic(_blob_path(avatar_hash, ext), thumbnail)
+    return avatar_hash
+
+def find_avatar(avatar_hash):
+    """Returns (path, mimetype) for a stored thumbnail, or None."""
+    for ext, mimetype in MIMETYPES.items():
+        path = _blob_path(avatar_hash, ext)
+        if os.path.exists(path):
+            return path, mimetype
+    return None
+
+# --- Migration ---
+def move_profile_images_to_store(conn):
+    """Schema migration: replaces users.profile_image base64 payloads with blob-store hashes."""
+    conn.execute('ALTER TABLE users ADD COLUMN profile_image_hash TEXT')
+    rows = conn.execute('SELECT id, profile_image FROM users WHERE profile_image IS NOT NULL').fetchall()
+    for row in rows:
+        try:
+            avatar_hash = store_avatar(row['profile_image'])
+        except ValueError:
+            avatar_hash = None
+        conn.execute('UPDATE users SET profile_image_hash = ? WHERE id = ?', (avatar_hash, row['id']))
+    if tuple(map(int, conn.execute('SELECT sqlite_version()').fetchone()[0].split('.'))) >= (3, 35, 0):
+        conn.execute('ALTER TABLE users DROP COLUMN profile_image')
+    else:
+        conn.execute('UPDATE users SET profile_image = NULL')
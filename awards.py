@@ -0,0 +1,272 @@
+import os
+import threading
+from collections import namedtuple
+from datetime import date
+from flask import current_app
+import db
+
+# --- Achievement Rules Engine ---
+# Achievements are declared once in RULES as (metric, threshold) pairs. submit_quiz only
+# appends a quiz-submitted event to the achievement_events table inside its write
+# transaction; a background worker drains that queue in order and evaluates the rules
+# against the student's summary row plus a small per-student progress row (streaks and
+# perfect scores), never against their result history. Because the queue is a table,
+# events survive a restart and any worker process can drain them; every drain runs in
+# BEGIN IMMEDIATE so events are applied exactly once and in submission order.
+# `flask backfill-achievements` replays all existing results in one bulk pass; run it
+# after adding a rule so the new achievement exists and is awarded retroactively.
+# Like the leaderboard and rollups, achievements only ever count students, never admins.
+
+Rule = namedtuple('Rule', 'code name description icon metric threshold')
+
+TOPIC_MASTERY_XP = 100 # XP in one topic that counts it as mastered
+
+RULES = (
+    Rule('first-steps', 'First Steps', 'Complete your first quiz.', 'check-circle', 'quizzes', 1),
+    Rule('perfect-score', 'Perfect Score', 'Get 100% on any quiz.', 'shield-question', 'perfect_scores', 1),
+    Rule('quiz-regular', 'Quiz Regular', 'Complete 10 quizzes.', 'list-checks', 'quizzes', 10),
+    Rule('hot-streak', 'Hot Streak', 'Pass 3 quizzes in a row.', 'flame', 'pass_streak', 3),
+    Rule('unstoppable', 'Unstoppable', 'Pass 10 quizzes in a row.', 'zap', 'pass_streak', 10),
+    Rule('daily-habit', 'Daily Habit', 'Take a quiz on 3 days in a row.', 'calendar-check', 'day_streak', 3),
+    Rule('week-streak', 'Week Streak', 'Take a quiz on 7 days in a row.', 'calendar-days', 'day_streak', 7),
+    Rule('topic-master', 'Topic Master', f'Earn {TOPIC_MASTERY_XP} XP in a single topic.', 'book-open', 'topics_mastered', 1),
+    Rule('all-rounder', 'All-Rounder', f'Earn {TOPIC_MASTERY_XP} XP in five different topics.', 'graduation-cap', 'topics_mastered', 5),
+    Rule('rising-star', 'Rising Star', 'Reach level 5.', 'star', 'level', 5),
+    Rule('python-pro', 'Python Pro', 'Reach level 10.', 'trophy', 'level', 10),
+)
+
+DRAIN_BATCH_SIZE = 200
+POLL_SECONDS = 30 # Also pick up events queued by other processes or left over from a restart
+
+PROGRESS_QUERY = 'SELECT perfect_scores, pass_streak, day_streak, last_day FROM achievement_progress WHERE user_id = ?'
+EARNED_QUERY = 'SELECT achievement_id FROM student_achievements WHERE user_id = ?'
+STATE_QUERY = '''
+    SELECT u.level, COALESCE(s.result_count, 0) AS quizzes,
+           (SELECT COUNT(*) FROM student_topic_mastery m WHERE m.user_id = u.id AND m.xp >= ?) AS topics_mastered
+    FROM users u LEFT JOIN student_summary s ON s.user_id = u.id WHERE u.id = ?
+'''
+EVENTS_QUERY = 'SELECT * FROM achievement_events ORDER BY id LIMIT ?'
+CATALOGUE_QUERY = '''
+    SELECT a.code, sa.timestamp FROM student_achievements sa JOIN achievements a ON a.id = sa.achievement_id
+    WHERE sa.user_id = ?
+'''
+
+def create_award_tables(conn):
+    """Schema migration: keys achievements by rule code, adds the event queue and progress rows, backfills."""
+    conn.execute('ALTER TABLE achievements ADD COLUMN code TEXT')
+    conn.execute('CREATE UNIQUE INDEX idx_achievements_code ON achievements (code)')
+    conn.execute('''
+        CREATE TABLE achievement_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            result_id INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            total_questions INTEGER NOT NULL,
+            passed INTEGER NOT NULL,
+            timestamp DATETIME NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE achievement_progress (
+            user_id INTEGER PRIMARY KEY,
+            perfect_scores INTEGER NOT NULL DEFAULT 0,
+            pass_streak INTEGER NOT NULL DEFAULT 0,
+            day_streak INTEGER NOT NULL DEFAULT 0,
+            last_day TEXT, -- YYYY-MM-DD of the latest result
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    backfill(conn)
+
+def sync_rules(conn):
+    """Makes the achievements table match RULES; rows that predate rule codes are matched by name."""
+    conn.executemany('UPDATE achievements SET code = ? WHERE code IS NULL AND name = ?', [(r.code, r.name) for r in RULES])
+    conn.executemany('''
+        INSERT INTO achievements (code, name, description, icon) VALUES (?, ?, ?, ?)
+        ON CONFLICT(code) DO UPDATE SET name = excluded.name, description = excluded.description, icon = excluded.icon
+    ''', [(r.code, r.name, r.description, r.icon) for r in RULES])
+    return {row['code']: row['id'] for row in conn.execute('SELECT id, code FROM achievements WHERE code IS NOT NULL')}
+
+# --- Rule Evaluation ---
+def _next_day_streak(day_streak, last_day, day):
+    if last_day == day:
+        return day_streak
+    if last_day is not None and (date.fromisoformat(day) - date.fromisoformat(last_day)).days == 1:
+        return day_streak + 1
+    return 1
+
+def _advance(progress, score, total_questions, passed, day):
+    """Returns the progress dict after one more result."""
+    return {
+        'perfect_scores': progress['perfect_scores'] + (1 if total_questions and score == total_questions else 0),
+        'pass_streak': progress['pass_streak'] + 1 if passed else 0,
+        'day_streak': _next_day_streak(progress['day_streak'], progress['last_day'], day),
+        'last_day': day,
+    }
+
+def _satisfied(rules, metrics):
+    return [rule for rule in rules if metrics[rule.metric] >= rule.threshold]
+
+def _apply_event(conn, event, rule_ids):
+    user_id = event['user_id']
+    row = conn.execute(PROGRESS_QUERY, (user_id,)).fetchone()
+    progress = dict(row) if row else {'perfect_scores': 0, 'pass_streak': 0, 'day_streak': 0, 'last_day': None}
+    progress = _advance(progress, event['score'], event['total_questions'], event['passed'], str(event['timestamp'])[:10])
+    conn.execute('''
+        INSERT OR REPLACE INTO achievement_progress (user_id, perfect_scores, pass_streak, day_streak, last_day)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, progress['perfect_scores'], progress['pass_streak'], progress['day_streak'], progress['last_day']))
+
+    earned = {row['achievement_id'] for row in conn.execute(EARNED_QUERY, (user_id,))}
+    pending = [rule for rule in RULES if rule.code in rule_ids and rule_ids[rule.code] not in earned]
+    if not pending:
+        return 0
+    # Cumulative metrics come straight from the summary rows submit_quiz already maintains
+    state = conn.execute(STATE_QUERY, (TOPIC_MASTERY_XP, user_id)).fetchone()
+    if state is None:
+        return 0
+    metrics = dict(progress, quizzes=state['quizzes'], topics_mastered=state['topics_mastered'], level=state['level'])
+    awards = [(user_id, rule_ids[rule.code], event['timestamp']) for rule in _satisfied(pending, metrics)]
+    conn.executemany('INSERT OR IGNORE INTO student_achievements (user_id, achievement_id, timestamp) VALUES (?, ?, ?)', awards)
+    return len(awards)
+
+# --- Event Queue ---
+def publish(conn, user_id, result_id, score, total_questions, passed, timestamp):
+    """Queues a quiz-submitted event; call inside the transaction that writes the result."""
+    conn.execute('''
+        INSERT INTO achievement_events (user_id, result_id, score, total_questions, passed, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (user_id, result_id, score, total_questions, int(passed), timestamp))
+
+def drain(conn, limit=DRAIN_BATCH_SIZE):
+    """Applies up to `limit` queued events in order and deletes them; returns how many were applied."""
+    if conn.execute('SELECT 1 FROM achievement_events LIMIT 1').fetchone() is None:
+        return 0 # Checked before taking the write lock, so idle polls never block writers
+    with db.transaction(conn):
+        events = conn.execute(EVENTS_QUERY, (limit,)).fetchall()
+        if not events:
+            return 0
+        rule_ids = {row['code']: row['id'] for row in conn.execute('SELECT id, code FROM achievements WHERE code IS NOT NULL')}
+        for event in events:
+            _apply_event(conn, event, rule_ids)
+        conn.execute('DELETE FROM achievement_events WHERE id <= ?', (events[-1]['id'],))
+    return len(events)
+
+def get_queue_depth(path):
+    pool = db.get_pool(path)
+    conn = pool.acquire()
+    try:
+        return conn.execute('SELECT COUNT(*) FROM achievement_events').fetchone()[0]
+    finally:
+        pool.release(conn)
+
+class AwardWorker:
+    """Daemon thread draining one database's event queue whenever it is notified (or every POLL_SECONDS)."""
+
+    def __init__(self, path, logger):
+        self.path = path
+        self.logger = logger
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='awards', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(POLL_SECONDS)
+            self.wakeup.clear()
+            pool = db.get_pool(self.path)
+            conn = pool.acquire()
+            try:
+                while drain(conn):
+                    pass
+            except Exception:
+                # The events stay queued and are retried on the next wake-up
+                self.logger.exception('Achievement evaluation failed')
+            finally:
+                pool.release(conn)
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+def notify(app=None):
+    """Wakes the worker for the app's database, starting it in this process if needed."""
+    app = app or current_app._get_current_object()
+    if not app.config['ACHIEVEMENTS_ASYNC']:
+        with app.app_context():
+            conn = db.get_db()
+            while drain(conn):
+                pass
+        return
+    path = app.config['DATABASE']
+    key = (os.getpid(), path)
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            worker = _workers[key] = AwardWorker(path, app.logger)
+    worker.wakeup.set()
+
+# --- Backfill ---
+def backfill(conn, passing_threshold=60):
+    """Recomputes progress from every result and awards everything already earned, in one pass.
+
+    Achievements already held are kept; newly earned ones are dated to the result that
+    earned them. Queued events are covered by the replay and discarded.
+    """
+    rule_ids = sync_rules(conn)
+    conn.execute('DELETE FROM achievement_events')
+    conn.execute('DELETE FROM achievement_progress')
+
+    awards = []
+    progress_rows = []
+    def finish(user_id, progress):
+        if user_id is not None:
+            progress_rows.append((user_id, progress['perfect_scores'], progress['pass_streak'], progress['day_streak'], progress['last_day']))
+
+    sequence_rules = [rule for rule in RULES if rule.metric in ('quizzes', 'perfect_scores', 'pass_streak', 'day_streak')]
+    user_id, progress, quizzes, earned = None, None, 0, set()
+    for row in conn.execute('''
+        SELECT r.user_id, r.score, r.total_questions, r.timestamp
+        FROM results r JOIN users u ON u.id = r.user_id WHERE u.is_admin = 0
+        ORDER BY r.user_id, r.timestamp, r.id
+    '''):
+        if row['user_id'] != user_id:
+            finish(user_id, progress)
+            user_id, quizzes, earned = row['user_id'], 0, set()
+            progress = {'perfect_scores': 0, 'pass_streak': 0, 'day_streak': 0, 'last_day': None}
+        percentage = row['score'] * 100.0 / row['total_questions'] if row['total_questions'] else 0
+        progress = _advance(progress, row['score'], row['total_questions'], percentage >= passing_threshold, str(row['timestamp'])[:10])
+        quizzes += 1
+        for rule in _satisfied(sequence_rules, dict(progress, quizzes=quizzes)):
+            if rule.code not in earned:
+                earned.add(rule.code)
+                awards.append((user_id, rule_ids[rule.code], row['timestamp']))
+    finish(user_id, progress)
+
+    conn.executemany('''
+        INSERT INTO achievement_progress (user_id, perfect_scores, pass_streak, day_streak, last_day) VALUES (?, ?, ?, ?, ?)
+    ''', progress_rows)
+    before = conn.total_changes
+    conn.executemany('INSERT OR IGNORE INTO student_achievements (user_id, achievement_id, timestamp) VALUES (?, ?, ?)', awards)
+
+    # Level and topic mastery are current-state metrics, dated to the time of the backfill
+    for rule in RULES:
+        if rule.metric == 'level':
+            conn.execute('''
+                INSERT OR IGNORE INTO student_achievements (user_id, achievement_id)
+                SELECT id, ? FROM users WHERE is_admin = 0 AND level >= ?
+            ''', (rule_ids[rule.code], rule.threshold))
+        elif rule.metric == 'topics_mastered':
+            conn.execute('''
+                INSERT OR IGNORE INTO student_achievements (user_id, achievement_id)
+                SELECT m.user_id, ? FROM student_topic_mastery m JOIN users u ON u.id = m.user_id
+                WHERE u.is_admin = 0 AND m.xp >= ? GROUP BY m.user_id HAVING COUNT(*) >= ?
+            ''', (rule_ids[rule.code], TOPIC_MASTERY_XP, rule.threshold))
+    return conn.total_changes - before
+
+def get_catalogue(conn, user_id):
+    """Every achievement with the student's award time (None while still locked), in RULES order."""
+    earned = {row['code']: row['timestamp'] for row in conn.execute(CATALOGUE_QUERY, (user_id,))}
+    return [dict(rule._asdict(), earned_at=earned.get(rule.code)) for rule in RULES]
+
+def init_app(app):
+    app.config.setdefault('ACHIEVEMENTS_ASYNC', True)
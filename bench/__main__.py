@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as appmod
+from bench import cohort, runner
+
+# --- Benchmark Entry Point ---
+# python -m bench [--driver server] [--save baseline.json] [--compare baseline.json]
+
+DEFAULT_SCENARIOS = ('login_storm', 'quiz_open_burst', 'mass_submit', 'student_dashboard', 'leaderboard', 'admin')
+ADMIN_CREDENTIALS = {'username': 'admin', 'password': 'rockieOga'}
+REGRESSION_TOLERANCE = 0.25 # Allowed p95 growth over the baseline before a route counts as a regression
+REGRESSION_FLOOR_MS = 5 # Ignore p95 changes smaller than this; they are timer noise
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Load-test PyPath against a synthetic cohort.')
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--sets', type=int, default=5)
+    parser.add_argument('--results', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=200, help='virtual users per scenario')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--driver', choices=('client', 'server'), default='client')
+    parser.add_argument('--scenario', action='append', choices=sorted(runner.SCENARIOS), help='repeat to run several (default: all)')
+    parser.add_argument('--db', help='scratch database path (default: a temporary file)')
+    parser.add_argument('--bcrypt-rounds', type=int, default=appmod.auth.BCRYPT_ROUNDS)
+    parser.add_argument('--save', help='write the results to this JSON baseline')
+    parser.add_argument('--compare', help='compare p95 latencies against this JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    return parser.parse_args(argv)
+
+def lift_rate_limits():
+    # Every virtual user comes from 127.0.0.1; the limiters would otherwise measure themselves
+    unlimited = (10 ** 9, 10 ** 9)
+    appmod.auth.ip_limiter = appmod.auth.TokenBucket(*unlimited)
+    appmod.auth.username_limiter = appmod.auth.TokenBucket(*unlimited)
+
+def print_report(results):
+    print(f'{"scenario / route":<48}{"reqs":>7}{"errs":>6}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"req/s":>10}')
+    for scenario, routes in results['scenarios'].items():
+        for route, stats in sorted(routes.items()):
+            print(f'{scenario + " " + route:<48}{stats["requests"]:>7}{stats["errors"]:>6}'
+                  f'{stats["p50_ms"]:>10}{stats["p95_ms"]:>10}{stats["p99_ms"]:>10}{stats["throughput_rps"]:>10}')
+
+def compare(results, baseline, tolerance):
+    """Returns a list of human readable regressions between two result documents."""
+    regressions = []
+    for scenario, routes in results['scenarios'].items():
+        for route, stats in routes.items():
+            before = baseline.get('scenarios', {}).get(scenario, {}).get(route)
+            if not before: continue
+            if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance) and stats['p95_ms'] - before['p95_ms'] > REGRESSION_FLOOR_MS:
+                regressions.append(f'{scenario} {route}: p95 {before["p95_ms"]} ms -> {stats["p95_ms"]} ms')
+            if stats['errors'] > before['errors']:
+                regressions.append(f'{scenario} {route}: errors {before["errors"]} -> {stats["errors"]}')
+    return regressions
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = args.scenario or DEFAULT_SCENARIOS
+    app = appmod.create_app({'BCRYPT_ROUNDS': args.bcrypt_rounds, 'TESTING': True})
+
+    scratch_dir = None
+    path = args.db
+    if not path:
+        scratch_dir = tempfile.TemporaryDirectory(prefix='pypath-bench-')
+        path = os.path.join(scratch_dir.name, 'bench.db')
+
+    start = time.perf_counter()
+    summary = cohort.generate(appmod, app, path, students=args.students, sets=args.sets, results=args.results)
+    print(f'Generated {summary["students"]} students, {summary["sets"]} sets, {summary["results"]} results '
+          f'and {summary["answers"]} answers in {time.perf_counter() - start:.1f}s ({path})')
+    lift_rate_limits()
+
+    with app.app_context():
+        conn = appmod.get_db_connection()
+        context = {'answer_keys': {set_id: appmod.quiz_cache.get_answer_key(conn, set_id) for set_id in summary['set_ids']}}
+
+    driver = runner.ServerDriver(app) if args.driver == 'server' else runner.TestClientDriver(app)
+    results = {
+        'driver': driver.name,
+        'cohort': {key: summary[key] for key in ('students', 'sets', 'results', 'answers')},
+        'users': args.users,
+        'concurrency': args.concurrency,
+        'bcrypt_rounds': args.bcrypt_rounds,
+        'scenarios': {},
+    }
+    try:
+        for name in scenarios:
+            results['scenarios'][name] = runner.run_scenario(driver, name, summary, context, users=args.users,
+                                                             concurrency=args.concurrency, admin_credentials=ADMIN_CREDENTIALS)
+    finally:
+        driver.close()
+        appmod.db.get_pool(path).close_all()
+        if scratch_dir: scratch_dir.cleanup()
+
+    print_report(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Saved baseline to {args.save}')
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('driver') != results['driver'] or baseline.get('cohort') != results['cohort']:
+            print(f'Warning: baseline was recorded with driver {baseline.get("driver")} and cohort {baseline.get("cohort")}')
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            return 1
+        print('No regressions against the baseline.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
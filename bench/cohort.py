@@ -0,0 +1,110 @@
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+# --- Synthetic Cohort Generator ---
+# Builds a scratch database through the app's own init_db/migrations, then bulk-loads
+# students, question sets, results, answers and topic mastery, and finally rebuilds the
+# derived tables (leaderboard, rollups, summaries, item statistics, achievements) exactly as the rebuild commands would.
+
+TOPICS = ('Operators', 'Data Types', 'Syntax', 'Built-in Functions', 'Functions', 'Strings', 'Loops')
+BENCH_PASSWORD = 'bench-password'
+BATCH_SIZE = 5000
+
+def _batched(conn, sql, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.executemany(sql, rows[start:start + BATCH_SIZE])
+
+def generate(appmod, app, path, students=500, sets=5, results=5000, questions_per_set=14, seed=1):
+    """Creates a fresh database at `path` and returns a summary dict of what was generated."""
+    rng = random.Random(seed)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    app.config['DATABASE'] = path
+    appmod.init_db(app)
+
+    with app.app_context():
+        conn = appmod.get_db_connection()
+        password_hash = appmod.auth.hash_password(BENCH_PASSWORD)
+        with appmod.db.transaction(conn):
+            # Question bank: the seeded questions plus enough synthetic multiple choice items
+            bank_size = conn.execute('SELECT COUNT(*) FROM questions').fetchone()[0]
+            needed = max(0, sets * questions_per_set // 2 - bank_size)
+            _batched(conn, '''
+                INSERT INTO questions (question_text, question_type, topic, option_a, option_b, option_c, option_d, correct_answer)
+                VALUES (?, 'multiple_choice', ?, 'Option A', 'Option B', 'Option C', 'Option D', ?)
+            ''', [(f'Synthetic question {i}', rng.choice(TOPICS), rng.choice('ABCD')) for i in range(needed)])
+            question_rows = conn.execute('SELECT id, question_type, topic, correct_answer, correct_code_output FROM questions').fetchall()
+            multiple_choice = [q for q in question_rows if q['question_type'] == 'multiple_choice']
+
+            set_questions = {1: [q for q in question_rows if q['id'] <= 14]}
+            for n in range(2, sets + 1):
+                set_id = conn.execute('INSERT INTO question_sets (title, description) VALUES (?, ?)',
+                                      (f'Synthetic Quiz {n}', 'Generated for benchmarking.')).lastrowid
+                set_questions[set_id] = rng.sample(multiple_choice, min(questions_per_set, len(multiple_choice)))
+                conn.executemany('INSERT INTO set_questions (set_id, question_id) VALUES (?, ?)',
+                                 [(set_id, q['id']) for q in set_questions[set_id]])
+            appmod.quiz_cache.bump_versions(conn, list(set_questions))
+
+            _batched(conn, 'INSERT INTO users (username, password, student_code, first_name, last_name) VALUES (?, ?, ?, ?, ?)',
+                     [(f'student{i}', password_hash, str(uuid.uuid4()), f'Student{i}', rng.choice(('Reyes', 'Santos', 'Cruz', 'Garcia', 'Lim')))
+                      for i in range(students)])
+            user_ids = [row['id'] for row in conn.execute('SELECT id FROM users WHERE is_admin = 0 ORDER BY id')]
+            ability = {user_id: rng.uniform(0.25, 0.95) for user_id in user_ids}
+
+            now = datetime.now()
+            result_rows, answer_rows, attempts = [], [], {}
+            mastery, total_xp = {}, {}
+            next_result_id = (conn.execute('SELECT COALESCE(MAX(id), 0) FROM results').fetchone()[0] or 0) + 1
+            generated = sorted((now - timedelta(days=rng.uniform(0, 120)), rng.choice(user_ids), rng.choice(list(set_questions)))
+                               for _ in range(results))
+            for end_time, user_id, set_id in generated:
+                result_id = next_result_id
+                next_result_id += 1
+                duration = rng.randint(60, 1800)
+                score = 0
+                for q in set_questions[set_id]:
+                    is_correct = 1 if rng.random() < ability[user_id] else 0
+                    if q['question_type'] == 'coding':
+                        answer = 'print("Hello, World!")' if is_correct else ''
+                    else:
+                        answer = q['correct_answer'] if is_correct else rng.choice([c for c in 'ABCD' if c != q['correct_answer']])
+                    answer_rows.append((result_id, q['id'], answer, is_correct))
+                    if is_correct:
+                        score += 1
+                        key = (user_id, q['topic'])
+                        mastery[key] = mastery.get(key, 0) + appmod.XP_PER_CORRECT_ANSWER
+                attempts[user_id, set_id] = attempts.get((user_id, set_id), 0) + 1
+                total_xp[user_id] = total_xp.get(user_id, 0) + score * appmod.XP_PER_CORRECT_ANSWER
+                result_rows.append((result_id, user_id, set_id, score, len(set_questions[set_id]),
+                                    end_time - timedelta(seconds=duration), end_time, duration, attempts[user_id, set_id]))
+
+            _batched(conn, '''
+                INSERT INTO results (id, user_id, set_id, score, total_questions, time_start, timestamp, duration_seconds, attempt_number)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', result_rows)
+            _batched(conn, 'INSERT INTO student_answers (result_id, question_id, user_answer, is_correct) VALUES (?, ?, ?, ?)', answer_rows)
+            _batched(conn, 'INSERT INTO attempt_counts (user_id, set_id, attempts) VALUES (?, ?, ?)',
+                     [(user_id, set_id, count) for (user_id, set_id), count in attempts.items()])
+            _batched(conn, 'INSERT INTO student_topic_mastery (user_id, topic, xp) VALUES (?, ?, ?)',
+                     [(user_id, topic, xp) for (user_id, topic), xp in mastery.items()])
+            _batched(conn, 'UPDATE users SET level = 1 + ? / ?, xp = ? % ? WHERE id = ?',
+                     [(xp, appmod.XP_TO_LEVEL_UP, xp, appmod.XP_TO_LEVEL_UP, user_id) for user_id, xp in total_xp.items()])
+
+            appmod.rankings.rebuild_leaderboard(conn, appmod.XP_TO_LEVEL_UP)
+            appmod.rollups.rebuild_rollups(conn, appmod.PASSING_THRESHOLD)
+            appmod.summaries.rebuild_summaries(conn, appmod.XP_TO_LEVEL_UP)
+            appmod.item_analysis.rebuild_item_analysis(conn)
+            appmod.awards.backfill(conn, appmod.PASSING_THRESHOLD)
+
+    return {
+        'database': path,
+        'students': students,
+        'sets': len(set_questions),
+        'results': len(result_rows),
+        'answers': len(answer_rows),
+        'set_ids': sorted(set_questions),
+        'password': BENCH_PASSWORD,
+    }
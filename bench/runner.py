@@ -0,0 +1,183 @@
+import http.cookiejar
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+# --- Latency Recording ---
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, route, seconds, ok):
+        with self.lock:
+            self.samples.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+def percentile(sorted_values, pct):
+    if not sorted_values: return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(recorder, wall_seconds):
+    summary = {}
+    for route, values in recorder.samples.items():
+        values = sorted(values)
+        summary[route] = {
+            'requests': len(values),
+            'errors': recorder.errors.get(route, 0),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'throughput_rps': round(len(values) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        }
+    return summary
+
+# --- Drivers ---
+# A driver hands out per-virtual-user sessions; each session keeps its own cookies and
+# records every request under a route label such as 'POST /submit_quiz'.
+
+class _TestClientSession:
+    def __init__(self, app, recorder):
+        self.client = app.test_client()
+        self.recorder = recorder
+
+    def request(self, route, method, path, data=None):
+        start = time.perf_counter()
+        response = self.client.open(path, method=method, data=data)
+        elapsed = time.perf_counter() - start
+        response.close()
+        ok = response.status_code < 400
+        if self.recorder and route: self.recorder.record(route, elapsed, ok)
+        return response.status_code
+
+class TestClientDriver:
+    name = 'test-client'
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self, recorder):
+        return _TestClientSession(self.app, recorder)
+
+    def close(self):
+        pass
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class _ServerSession:
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, route, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        elapsed = time.perf_counter() - start
+        if self.recorder and route: self.recorder.record(route, elapsed, status < 400)
+        return status
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+class ServerDriver:
+    """Runs the app on a real threaded WSGI server on localhost for the duration of the benchmark."""
+    name = 'wsgi-server'
+
+    def __init__(self, app, host='127.0.0.1'):
+        self.server = make_server(host, 0, app, threaded=True, request_handler=_QuietHandler)
+        self.base_url = f'http://{host}:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def session(self, recorder):
+        return _ServerSession(self.base_url, recorder)
+
+    def close(self):
+        self.server.shutdown()
+
+# --- Scenarios ---
+def _student_credentials(index, cohort):
+    return {'username': f'student{index % cohort["students"]}', 'password': cohort['password']}
+
+def _login(session, index, cohort, route=None):
+    return session.request(route, 'POST', '/login', _student_credentials(index, cohort))
+
+def _quiz_answers(answer_key, rng_seed):
+    answers = {}
+    for n, q in enumerate(answer_key):
+        if q['question_type'] == 'coding':
+            answers[f'question_{q["id"]}'] = 'print("Hello, World!")'
+        else:
+            answers[f'question_{q["id"]}'] = 'ABCD'[(rng_seed + n) % 4]
+    return answers
+
+def login_storm(session, index, cohort, context):
+    _login(session, index, cohort, 'POST /login')
+
+def quiz_open_burst(session, index, cohort, context):
+    set_id = cohort['set_ids'][index % len(cohort['set_ids'])]
+    session.request('GET /quiz/<id>', 'GET', f'/quiz/{set_id}')
+
+def mass_submit(session, index, cohort, context):
+    set_id = cohort['set_ids'][index % len(cohort['set_ids'])]
+    session.request(None, 'GET', f'/quiz/{set_id}')
+    session.request('POST /submit_quiz/<id>', 'POST', f'/submit_quiz/{set_id}', _quiz_answers(context['answer_keys'][set_id], index))
+
+def leaderboard(session, index, cohort, context):
+    session.request('GET /leaderboard', 'GET', f'/leaderboard?page={index % 3 + 1}')
+    session.request('GET /leaderboard/me', 'GET', '/leaderboard/me')
+
+def student_dashboard(session, index, cohort, context):
+    session.request('GET /dashboard', 'GET', '/dashboard')
+    session.request('GET /history', 'GET', '/history')
+
+def admin_pages(session, index, cohort, context):
+    session.request('GET /dashboard (admin)', 'GET', '/dashboard')
+    session.request('GET /admin/history', 'GET', '/admin/history')
+    session.request('GET /admin/history?search', 'GET', f'/admin/history?search=Student{index % 50}')
+
+# name -> (scenario, needs a logged-in student session, needs an admin session)
+SCENARIOS = {
+    'login_storm': (login_storm, False, False),
+    'quiz_open_burst': (quiz_open_burst, True, False),
+    'mass_submit': (mass_submit, True, False),
+    'leaderboard': (leaderboard, True, False),
+    'student_dashboard': (student_dashboard, True, False),
+    'admin': (admin_pages, False, True),
+}
+
+def run_scenario(driver, name, cohort, context, users=200, concurrency=32, admin_credentials=None):
+    scenario, needs_student, needs_admin = SCENARIOS[name]
+    sessions = []
+    for index in range(users):
+        session = driver.session(None)
+        if needs_student: _login(session, index, cohort)
+        if needs_admin: session.request(None, 'POST', '/login', admin_credentials)
+        sessions.append(session)
+
+    recorder = Recorder()
+    for session in sessions:
+        session.recorder = recorder
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda index: scenario(sessions[index], index, cohort, context), range(users)))
+    return summarize(recorder, time.perf_counter() - start)
@@ -0,0 +1,125 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from flask import current_app, g
+
+# --- Connection Settings ---
+DATABASE = 'pypath.db'
+POOL_SIZE = 16 # Idle connections kept per database file
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 16 * 1024
+STATEMENT_CACHE_SIZE = 256 # Prepared statements kept per connection
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}',
+    f'PRAGMA mmap_size = {MMAP_SIZE_BYTES}',
+    f'PRAGMA cache_size = -{CACHE_SIZE_KIB}',
+    'PRAGMA temp_store = MEMORY',
+)
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=STATEMENT_CACHE_SIZE,
+                           detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def create_file(path):
+    """Starts a new database file with incremental auto-vacuum.
+
+    auto_vacuum only sticks if it is set before the file header is first written, and the
+    WAL pragma in connect() writes it, so this must run before anything else opens the file.
+    On an existing database it changes nothing.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('PRAGMA journal_mode = WAL')
+    finally:
+        conn.close()
+
+# --- Connection Pool ---
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _check_fork(self):
+        # Connections must never cross a fork; a forked worker starts with an empty pool
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = queue.LifoQueue(maxsize=self.size)
+
+    def acquire(self):
+        self._check_fork()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return connect(self.path)
+
+    def release(self, conn):
+        self._check_fork()
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+    def idle_count(self):
+        return self._idle.qsize()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None):
+    path = path or current_app.config['DATABASE']
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
+
+@contextmanager
+def transaction(conn):
+    # Take the write lock up front so concurrent writers queue on busy_timeout instead of failing mid-transaction
+    if conn.in_transaction:
+        # Committing here would silently make the caller's pending writes part of this unit of work
+        raise RuntimeError('transaction() needs a connection with no uncommitted changes')
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+# --- Flask Integration ---
+def get_db():
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+def close_db(exception=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+def init_app(app):
+    app.config.setdefault('DATABASE', DATABASE)
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,309 @@
+import atexit
+import builtins
+import ctypes
+import importlib
+import multiprocessing
+import os
+import pwd
+import resource
+import signal
+import tempfile
+import threading
+import time
+from io import StringIO
+from contextlib import redirect_stdout
+
+# --- Sandbox Limits ---
+GRADING_PROCESSES_PER_HOST = os.cpu_count() or 2 # Shared out between the web worker processes (see init_app)
+GRADING_JOBS_PER_WORKER = 100 # Recycle workers so a bad job cannot poison one forever
+CPU_SECONDS_PER_JOB = 2
+WALL_SECONDS_PER_JOB = 5
+MEMORY_BYTES_PER_JOB = 64 * 1024 * 1024
+MAX_OUTPUT_CHARS = 10000
+GRADING_TIMEOUT_SECONDS = 30 # Upper bound for one quiz submission, including time queued behind other students
+
+ALLOWED_MODULES = {'math', 'random', 'string', 'itertools', 'functools', 'collections', 'statistics', 're', 'json', 'datetime'}
+BLOCKED_BUILTINS = {'open', 'input', 'exec', 'eval', 'compile', 'breakpoint', 'help', 'exit', 'quit',
+                    'globals', 'locals', 'vars', 'memoryview', '__import__'}
+
+# Restricted builtins only keep honest mistakes out; object introspection still reaches `os`.
+# The real boundary is the worker process itself (see _isolate): it runs as SANDBOX_USER in
+# new user, mount, network and IPC namespaces, chrooted into an empty directory that has
+# already been deleted, with no capabilities and no descriptors beyond the pool's pipes.
+SANDBOX_USER = 'nobody'
+FILE_DESCRIPTOR_LIMIT = 64
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWIPC = 0x08000000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+PR_SET_DUMPABLE = 4
+PR_CAPBSET_DROP = 24
+PR_SET_NO_NEW_PRIVS = 38
+LINUX_CAPABILITY_VERSION_3 = 0x20080522
+
+class JobLimitExceeded(BaseException):
+    # BaseException so a student's bare `except Exception` cannot swallow it
+    pass
+
+class OutputLimitExceeded(Exception):
+    pass
+
+class GradingUnavailable(Exception):
+    # The sandbox could not be isolated: refuse the submission rather than score its code as wrong
+    pass
+
+class _CappedStringIO(StringIO):
+    def write(self, s):
+        if self.tell() + len(s) > MAX_OUTPUT_CHARS:
+            raise OutputLimitExceeded('Output limit exceeded')
+        return super().write(s)
+
+# --- Worker Side ---
+def _on_limit(signum, frame):
+    if signum == signal.SIGXCPU: raise JobLimitExceeded('CPU time limit exceeded')
+    raise JobLimitExceeded('Time limit exceeded')
+
+def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level != 0 or name.split('.')[0] not in ALLOWED_MODULES:
+        raise ImportError(f"Importing '{name}' is not allowed")
+    return __import__(name, globals, locals, fromlist, level)
+
+def _safe_builtins():
+    safe = {name: value for name, value in vars(builtins).items() if name not in BLOCKED_BUILTINS}
+    safe['__import__'] = _safe_import
+    return safe
+
+_statm_fd = None # Opened before the chroot; /proc is out of reach afterwards
+_isolation_error = None
+_allow_unisolated = False
+
+def _current_address_space():
+    try:
+        return int(os.pread(_statm_fd, 256, 0).split()[0]) * resource.getpagesize()
+    except (OSError, TypeError, ValueError):
+        return None
+
+class _CapHeader(ctypes.Structure):
+    _fields_ = [('version', ctypes.c_uint32), ('pid', ctypes.c_int)]
+
+class _CapData(ctypes.Structure):
+    _fields_ = [('effective', ctypes.c_uint32), ('permitted', ctypes.c_uint32), ('inheritable', ctypes.c_uint32)]
+
+def _check(result, what):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f'{what}: {os.strerror(errno)}')
+
+def _isolate():
+    """Confines this worker process before it runs any submission; raises OSError if it cannot."""
+    libc = ctypes.CDLL(None, use_errno=True)
+    # Everything a submission may import must be loaded while the filesystem is still visible
+    for name in ALLOWED_MODULES:
+        importlib.import_module(name)
+    time.localtime()
+
+    # Nothing inherited from the web worker: stdio points at /dev/null, and the environment is empty
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    os.environ.clear()
+
+    # An empty working directory, deleted at once so nothing can ever be created in it
+    root = tempfile.mkdtemp(prefix='pypath-grading-')
+    os.chmod(root, 0o555) # Still enterable once SANDBOX_USER no longer owns it
+    os.chdir(root)
+    os.rmdir(root)
+
+    sandbox = pwd.getpwnam(SANDBOX_USER)
+    if os.geteuid() == 0:
+        os.setgroups([])
+        os.setgid(sandbox.pw_gid)
+        os.setuid(sandbox.pw_uid)
+        _check(libc.prctl(PR_SET_DUMPABLE, 1, 0, 0, 0), 'prctl') # setuid() cleared it, and with it access to our own uid_map
+    uid, gid = os.getuid(), os.getgid()
+    _check(libc.unshare(CLONE_NEWUSER | CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWIPC), 'unshare')
+    with open('/proc/self/setgroups', 'w') as f:
+        f.write('deny')
+    with open('/proc/self/uid_map', 'w') as f:
+        f.write(f'{sandbox.pw_uid} {uid} 1')
+    with open('/proc/self/gid_map', 'w') as f:
+        f.write(f'{sandbox.pw_gid} {gid} 1')
+    os.chroot('.')
+    os.chdir('/')
+
+    # Give up the capabilities the new user namespace granted, for good
+    cap = 0
+    while libc.prctl(PR_CAPBSET_DROP, cap, 0, 0, 0) == 0:
+        cap += 1
+    _check(libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), 'prctl')
+    _check(libc.capset(ctypes.byref(_CapHeader(LINUX_CAPABILITY_VERSION_3, 0)), (_CapData * 2)()), 'capset')
+    resource.setrlimit(resource.RLIMIT_NOFILE, (FILE_DESCRIPTOR_LIMIT, FILE_DESCRIPTOR_LIMIT))
+
+def _init_worker(allow_unisolated):
+    global _statm_fd, _isolation_error, _allow_unisolated
+    signal.signal(signal.SIGXCPU, _on_limit)
+    signal.signal(signal.SIGALRM, _on_limit)
+    # Hard backstop for C code that never returns to the interpreter: the default action kills the worker
+    signal.signal(signal.SIGVTALRM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _allow_unisolated = allow_unisolated
+    _statm_fd = os.open('/proc/self/statm', os.O_RDONLY)
+    try:
+        _isolate()
+    except (OSError, KeyError) as e: # KeyError: SANDBOX_USER does not exist
+        _isolation_error = str(e)
+
+def _set_job_limits():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    cpu_soft = int(usage.ru_utime + usage.ru_stime) + CPU_SECONDS_PER_JOB + 1
+    if cpu_hard == resource.RLIM_INFINITY or cpu_soft < cpu_hard:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_soft, cpu_hard))
+
+    address_space = _current_address_space()
+    _, as_hard = resource.getrlimit(resource.RLIMIT_AS)
+    if address_space is not None:
+        as_soft = address_space + MEMORY_BYTES_PER_JOB
+        if as_hard == resource.RLIM_INFINITY or as_soft < as_hard:
+            resource.setrlimit(resource.RLIMIT_AS, (as_soft, as_hard))
+
+    signal.setitimer(signal.ITIMER_REAL, WALL_SECONDS_PER_JOB)
+    signal.setitimer(signal.ITIMER_VIRTUAL, CPU_SECONDS_PER_JOB * 2 + 1)
+
+def _clear_job_limits():
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+    for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS):
+        _, hard = resource.getrlimit(limit)
+        resource.setrlimit(limit, (hard, hard))
+
+def _isolation_status():
+    return _isolation_error
+
+def _run_job(code):
+    if _isolation_error is not None and not _allow_unisolated:
+        return {'output': '', 'error': f'Code grading is unavailable: the sandbox could not be isolated ({_isolation_error})',
+                'unavailable': True}
+    output = _CappedStringIO()
+    error = None
+    try:
+        compiled = compile(code, '<submission>', 'exec')
+        sandbox_globals = {'__builtins__': _safe_builtins(), '__name__': '__main__'}
+        try:
+            _set_job_limits()
+            with redirect_stdout(output):
+                exec(compiled, sandbox_globals)
+        finally:
+            _clear_job_limits()
+    except JobLimitExceeded as e:
+        error = str(e)
+    except MemoryError:
+        error = 'Memory limit exceeded'
+    except BaseException as e:
+        error = f'{type(e).__name__}: {e}'
+    return {'output': output.getvalue(), 'error': error}
+
+# --- Pool Management ---
+_pool = None
+_pool_lock = threading.Lock()
+_pool_size = GRADING_PROCESSES_PER_HOST
+_pool_allow_unisolated = False
+_refused = 0 # Submissions refused by this process because the sandbox was not isolated
+
+def _forget_pool_after_fork():
+    # The pool's worker processes and handler threads belong to the parent
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_forget_pool_after_fork)
+
+def start_grading_pool():
+    """Starts the sandbox workers if they are not running yet.
+
+    Workers come from a forkserver (spawn where unavailable), never from a fork of this
+    process: a web worker is multithreaded, and its locks, open database files and
+    sockets must not leak into a sandbox. Call it early, e.g. from gunicorn's post_fork;
+    the first submission starts the pool otherwise.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            if ctx.get_start_method() == 'forkserver':
+                ctx.set_forkserver_preload([__name__])
+            _pool = ctx.Pool(_pool_size, initializer=_init_worker, initargs=(_pool_allow_unisolated,),
+                             maxtasksperchild=GRADING_JOBS_PER_WORKER)
+    return _pool
+
+def get_grading_pool():
+    return _pool or start_grading_pool()
+
+def check_isolation():
+    """Isolates one throwaway sandbox worker; returns None if that worked here, else the reason.
+
+    Uses a spawned process rather than the forkserver, so it is safe to call from the
+    pre-fork master (see app.preload) without leaving a server behind for the workers.
+    """
+    with multiprocessing.get_context('spawn').Pool(1, initializer=_init_worker, initargs=(False,)) as pool:
+        return pool.apply(_isolation_status)
+
+def refused_count():
+    return _refused
+
+@atexit.register
+def shutdown_grading_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.terminate()
+            _pool.join()
+            _pool = None
+
+# --- Grading ---
+def normalize_output(text):
+    lines = [line.rstrip() for line in (text or '').replace('\r\n', '\n').split('\n')]
+    return '\n'.join(lines).strip('\n')
+
+def outputs_match(actual, expected):
+    return normalize_output(actual) == normalize_output(expected)
+
+def grade_code_answers(submissions):
+    """Grades (key, code, expected_output) tuples in parallel; returns {key: {'passed', 'output', 'error'}}.
+
+    Raises GradingUnavailable if a sandbox worker could not be isolated.
+    """
+    global _refused
+    results = {}
+    pending = []
+    for key, code, expected in submissions:
+        if not code or not code.strip() or expected is None:
+            results[key] = {'passed': False, 'output': '', 'error': 'No code submitted' if expected is not None else 'No expected output'}
+            continue
+        pending.append((key, expected, get_grading_pool().apply_async(_run_job, (code,))))
+
+    deadline = time.monotonic() + GRADING_TIMEOUT_SECONDS
+    for key, expected, async_result in pending:
+        try:
+            outcome = async_result.get(timeout=max(0.1, deadline - time.monotonic()))
+        except multiprocessing.TimeoutError:
+            outcome = {'output': '', 'error': 'Time limit exceeded'}
+        if outcome.pop('unavailable', False):
+            _refused += 1
+            raise GradingUnavailable(outcome['error'])
+        outcome['passed'] = outcome['error'] is None and outputs_match(outcome['output'], expected)
+        results[key] = outcome
+    return results
+
+def init_app(app):
+    # The host's sandbox budget is split between the web worker processes sharing it;
+    # gunicorn.conf.py exports their count as PYPATH_WORKERS
+    global _pool_size, _pool_allow_unisolated
+    app.config.setdefault('WORKERS', 1)
+    app.config.setdefault('GRADING_PROCESSES_PER_HOST', GRADING_PROCESSES_PER_HOST)
+    app.config.setdefault('GRADING_ALLOW_UNISOLATED', False) # Development only: run submissions even if _isolate() failed
+    _pool_size = max(1, app.config['GRADING_PROCESSES_PER_HOST'] // app.config['WORKERS'])
+    _pool_allow_unisolated = app.config['GRADING_ALLOW_UNISOLATED']
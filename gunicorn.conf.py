@@ -0,0 +1,19 @@
+import multiprocessing
+import os
+
+# --- Gunicorn Settings ---
+# gunicorn -c gunicorn.conf.py wsgi:application
+
+bind = os.environ.get('PYPATH_BIND', '127.0.0.1:8000')
+# Exported so create_app() can split the host's grading sandboxes between the workers
+workers = int(os.environ.setdefault('PYPATH_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.environ.get('PYPATH_THREADS', 4))
+preload_app = True # Import wsgi.py, and warm its caches, once in the master before forking
+max_requests = 2000
+max_requests_jitter = 200
+timeout = 60
+
+def post_fork(server, worker):
+    # Start this worker's grading sandboxes while it is still single threaded
+    import grading
+    grading.start_grading_pool()
@@ -0,0 +1,187 @@
+import csv
+import json
+import re
+import sqlite3
+from io import StringIO
+
+# --- Quiz History ---
+# attempt_number (counted in attempt_counts, which archiving never touches) and
+# duration_seconds are stored when a result is inserted, and every display column is
+# formatted by SQLite, so pages stream straight from the cursor.
+# The admin view pages with a (timestamp, id) keyset and searches names through FTS5.
+
+PAGE_SIZE = 50
+EXPORT_BATCH_SIZE = 500
+
+def _twelve_hour(column):
+    return f'''CASE WHEN {column} IS NULL THEN 'N/A' ELSE printf('%02d:%s %s',
+        (CAST(strftime('%H', {column}) AS INTEGER) + 11) % 12 + 1, strftime('%M:%S', {column}),
+        CASE WHEN CAST(strftime('%H', {column}) AS INTEGER) < 12 THEN 'AM' ELSE 'PM' END) END'''
+
+FORMATTED_COLUMNS = f'''
+    r.id AS result_id, r.score, r.total_questions, r.attempt_number,
+    r.time_start, r.timestamp AS time_end, qs.title,
+    COALESCE(date(r.timestamp), 'N/A') AS date_formatted,
+    {_twelve_hour('r.time_start')} AS time_start_formatted,
+    {_twelve_hour('r.timestamp')} AS time_end_formatted,
+    CASE WHEN r.duration_seconds IS NULL THEN 'N/A'
+         WHEN r.duration_seconds >= 3600 THEN printf('%dh %dm %ds', r.duration_seconds / 3600, r.duration_seconds % 3600 / 60, r.duration_seconds % 60)
+         WHEN r.duration_seconds >= 60 THEN printf('%dm %ds', r.duration_seconds / 60, r.duration_seconds % 60)
+         ELSE printf('%ds', r.duration_seconds) END AS duration
+'''
+
+# `results` is the table to read: archive.py passes an attached archive's results table
+def student_history_query(results='results'):
+    return f'''
+    SELECT {FORMATTED_COLUMNS}
+    FROM {results} r JOIN question_sets qs ON r.set_id = qs.id
+    WHERE r.user_id = ? ORDER BY r.timestamp DESC, r.id DESC
+'''
+
+def admin_history_query(results='results'):
+    # CROSS JOIN keeps results as the outer loop: pages walk idx_results_timestamp_id
+    # backwards from the cursor and stop after one page, instead of sorting every result
+    return f'''
+    SELECT u.username, u.student_code, u.first_name, u.last_name, {FORMATTED_COLUMNS}
+    FROM {results} r
+    CROSS JOIN users u ON u.id = r.user_id
+    JOIN question_sets qs ON qs.id = r.set_id
+    WHERE u.is_admin = 0
+'''
+
+STUDENT_HISTORY_QUERY = student_history_query()
+ADMIN_HISTORY_QUERY = admin_history_query()
+# Clauses get_admin_page appends to an admin history query
+FTS_FILTER = ' AND r.user_id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)'
+LIKE_FILTER = ' AND (u.username LIKE ? OR u.first_name LIKE ? OR u.last_name LIKE ?)'
+KEYSET_FILTER = ' AND (r.timestamp, r.id) < (?, ?)'
+HISTORY_ORDER = ' ORDER BY r.timestamp DESC, r.id DESC'
+PAGE_LIMIT = ' LIMIT ?'
+ATTEMPT_COUNT_QUERY = 'SELECT attempts FROM attempt_counts WHERE user_id = ? AND set_id = ?'
+
+EXPORT_COLUMNS = ('result_id', 'username', 'student_code', 'first_name', 'last_name', 'title', 'attempt_number',
+                  'score', 'total_questions', 'time_start', 'time_end', 'duration')
+
+# --- Schema ---
+USERS_FTS_STATEMENTS = (
+    "CREATE VIRTUAL TABLE users_fts USING fts5(username, first_name, last_name, content='users', content_rowid='id')",
+    '''CREATE TRIGGER users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts (rowid, username, first_name, last_name) VALUES (new.id, new.username, new.first_name, new.last_name);
+    END''',
+    '''CREATE TRIGGER users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, first_name, last_name) VALUES ('delete', old.id, old.username, old.first_name, old.last_name);
+    END''',
+    '''CREATE TRIGGER users_fts_update AFTER UPDATE OF username, first_name, last_name ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, first_name, last_name) VALUES ('delete', old.id, old.username, old.first_name, old.last_name);
+        INSERT INTO users_fts (rowid, username, first_name, last_name) VALUES (new.id, new.username, new.first_name, new.last_name);
+    END''',
+    "INSERT INTO users_fts (users_fts) VALUES ('rebuild')",
+)
+
+def add_history_columns(conn):
+    """Schema migration: stores attempt numbers and durations, and indexes student names for search."""
+    conn.execute('ALTER TABLE results ADD COLUMN attempt_number INTEGER')
+    conn.execute('ALTER TABLE results ADD COLUMN duration_seconds INTEGER')
+    conn.execute('CREATE INDEX idx_results_user_set_attempt ON results (user_id, set_id, attempt_number)')
+    conn.execute('''
+        UPDATE results SET attempt_number = (
+            SELECT COUNT(*) FROM results earlier
+            WHERE earlier.user_id = results.user_id AND earlier.set_id = results.set_id
+              AND (earlier.timestamp < results.timestamp OR (earlier.timestamp = results.timestamp AND earlier.id <= results.id))
+        ), duration_seconds = CAST(ROUND((julianday(timestamp) - julianday(time_start)) * 86400, 3) AS INTEGER)
+    ''')
+    try:
+        conn.execute('SAVEPOINT users_fts')
+        for statement in USERS_FTS_STATEMENTS:
+            conn.execute(statement)
+        conn.execute('RELEASE users_fts')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: search falls back to LIKE
+        conn.execute('ROLLBACK TO users_fts')
+        conn.execute('RELEASE users_fts')
+
+def create_attempt_counts(conn):
+    """Schema migration: counts attempts per student and set in a table that archiving never touches."""
+    conn.execute('''
+        CREATE TABLE attempt_counts (
+            user_id INTEGER NOT NULL,
+            set_id INTEGER NOT NULL,
+            attempts INTEGER NOT NULL,
+            PRIMARY KEY (user_id, set_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        INSERT INTO attempt_counts (user_id, set_id, attempts)
+        SELECT user_id, set_id, COALESCE(MAX(attempt_number), COUNT(*)) FROM results GROUP BY user_id, set_id
+    ''')
+
+def next_attempt_number(conn, user_id, set_id):
+    # Counted apart from results, so numbering carries on after old results are archived
+    conn.execute('''
+        INSERT INTO attempt_counts (user_id, set_id, attempts) VALUES (?, ?, 1)
+        ON CONFLICT(user_id, set_id) DO UPDATE SET attempts = attempts + 1
+    ''', (user_id, set_id))
+    return conn.execute(ATTEMPT_COUNT_QUERY, (user_id, set_id)).fetchone()[0]
+
+# --- Queries ---
+def has_fts(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_fts'").fetchone() is not None
+
+def fts_query(search):
+    # Every word must match the start of a username or name token
+    return ' '.join(f'"{token}"*' for token in re.findall(r'\w+', search))
+
+def _admin_history_filter(conn, search):
+    if not search:
+        return '', []
+    if has_fts(conn):
+        match = fts_query(search)
+        if not match:
+            return '', []
+        return FTS_FILTER, [match]
+    pattern = f'%{search}%'
+    return LIKE_FILTER, [pattern, pattern, pattern]
+
+def get_admin_page(conn, search='', before=None, page_size=PAGE_SIZE, results='results'):
+    """Returns (rows, next cursor) for the page of results older than the (timestamp, id) cursor `before`."""
+    query, params = _admin_history_filter(conn, search)
+    sql = admin_history_query(results) + query
+    if before:
+        sql += KEYSET_FILTER
+        params += list(before)
+    sql += HISTORY_ORDER + PAGE_LIMIT
+    rows = conn.execute(sql, params + [page_size + 1]).fetchall()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1]['time_end'], rows[-1]['result_id'])
+    return rows, next_cursor
+
+def iter_admin_history(conn, search='', results='results'):
+    query, params = _admin_history_filter(conn, search)
+    cursor = conn.execute(admin_history_query(results) + query + HISTORY_ORDER, params)
+    while True:
+        batch = cursor.fetchmany(EXPORT_BATCH_SIZE)
+        if not batch:
+            break
+        yield from batch
+
+def get_student_history(conn, user_id, results='results'):
+    return conn.execute(student_history_query(results), (user_id,)).fetchall()
+
+# --- Export ---
+def stream_csv(rows):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([row[column] for column in EXPORT_COLUMNS])
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_jsonl(rows):
+    for row in rows:
+        yield json.dumps({column: row[column] for column in EXPORT_COLUMNS}, default=str) + '\n'
@@ -0,0 +1,166 @@
+import math
+
+# --- Item Analysis ---
+# Classical test statistics for every question, kept as running sums that submit_quiz
+# folds each result into (inside its write transaction), so reading them costs one row
+# per question however many answers exist:
+#   difficulty     p = correct / responses
+#   discrimination point-biserial between the item and the result's overall score,
+#                  r = (M1 - M0) / s * sqrt(p * (1 - p))
+#   distractors    how often each option A-D (or nothing) was chosen
+# Per topic, KR-20 reliability is estimated from the topic sub-scores of each result.
+# Only non-admin results are counted. `flask rebuild-item-analysis` recomputes everything.
+
+LOW_DIFFICULTY = 0.2 # Fewer than 20% correct: probably mis-keyed or too hard
+HIGH_DIFFICULTY = 0.9 # More than 90% correct: tells students apart very little
+LOW_DISCRIMINATION = 0.2
+MIN_RESPONSES = 10 # Below this the statistics are too noisy to flag anything
+CHOICES = ('A', 'B', 'C', 'D')
+
+def create_item_tables(conn):
+    """Schema migration: creates and fills the item and topic statistics tables."""
+    conn.execute('''
+        CREATE TABLE item_stats (
+            question_id INTEGER PRIMARY KEY,
+            responses INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0, -- sums of the overall result score (0-1) of each response
+            score_sq_sum REAL NOT NULL DEFAULT 0,
+            correct_score_sum REAL NOT NULL DEFAULT 0,
+            choice_a INTEGER NOT NULL DEFAULT 0,
+            choice_b INTEGER NOT NULL DEFAULT 0,
+            choice_c INTEGER NOT NULL DEFAULT 0,
+            choice_d INTEGER NOT NULL DEFAULT 0,
+            omitted INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (question_id) REFERENCES questions (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE topic_stats (
+            topic TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            answered INTEGER NOT NULL DEFAULT 0,
+            correct_sum INTEGER NOT NULL DEFAULT 0,
+            correct_sq_sum INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    rebuild_item_analysis(conn)
+
+def rebuild_item_analysis(conn):
+    conn.execute('DELETE FROM item_stats')
+    conn.execute('DELETE FROM topic_stats')
+    conn.execute('''
+        INSERT INTO item_stats (question_id, responses, correct, score_sum, score_sq_sum, correct_score_sum,
+                                choice_a, choice_b, choice_c, choice_d, omitted)
+        SELECT sa.question_id, COUNT(*), COALESCE(SUM(sa.is_correct), 0), TOTAL(r.fraction), TOTAL(r.fraction * r.fraction),
+               TOTAL(sa.is_correct * r.fraction),
+               -- SUM() of only NULLs is NULL (every answer to a question left blank), hence the COALESCEs
+               COALESCE(SUM(sa.user_answer = 'A'), 0), COALESCE(SUM(sa.user_answer = 'B'), 0),
+               COALESCE(SUM(sa.user_answer = 'C'), 0), COALESCE(SUM(sa.user_answer = 'D'), 0),
+               COALESCE(SUM(sa.user_answer IS NULL OR sa.user_answer = ''), 0)
+        FROM student_answers sa
+        JOIN (SELECT r.id, COALESCE(r.score * 1.0 / NULLIF(r.total_questions, 0), 0) AS fraction
+              FROM results r JOIN users u ON u.id = r.user_id WHERE u.is_admin = 0) r ON r.id = sa.result_id
+        GROUP BY sa.question_id
+    ''')
+    conn.execute('''
+        INSERT INTO topic_stats (topic, attempts, answered, correct_sum, correct_sq_sum)
+        SELECT b.topic, COUNT(*), COALESCE(SUM(b.answered), 0), COALESCE(SUM(b.correct), 0), COALESCE(SUM(b.correct * b.correct), 0)
+        FROM result_topic_breakdown b
+        JOIN results r ON r.id = b.result_id JOIN users u ON u.id = r.user_id
+        WHERE u.is_admin = 0
+        GROUP BY b.topic
+    ''')
+
+# --- Incremental Maintenance ---
+def record_submission(conn, score, total_questions, answers, topic_answers):
+    """Folds one result into the running sums.
+
+    `answers` holds (question_id, user_answer, is_correct) and `topic_answers` maps
+    topic -> (answered, correct), exactly as submit_quiz grades them.
+    """
+    fraction = score / total_questions if total_questions else 0
+    conn.executemany('''
+        INSERT INTO item_stats (question_id, responses, correct, score_sum, score_sq_sum, correct_score_sum,
+                                choice_a, choice_b, choice_c, choice_d, omitted)
+        VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(question_id) DO UPDATE SET
+            responses = responses + 1, correct = correct + excluded.correct,
+            score_sum = score_sum + excluded.score_sum, score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+            correct_score_sum = correct_score_sum + excluded.correct_score_sum,
+            choice_a = choice_a + excluded.choice_a, choice_b = choice_b + excluded.choice_b,
+            choice_c = choice_c + excluded.choice_c, choice_d = choice_d + excluded.choice_d,
+            omitted = omitted + excluded.omitted
+    ''', [(question_id, is_correct, fraction, fraction * fraction, is_correct * fraction,
+           *(int(user_answer == choice) for choice in CHOICES), int(not user_answer))
+          for question_id, user_answer, is_correct in answers])
+    conn.executemany('''
+        INSERT INTO topic_stats (topic, attempts, answered, correct_sum, correct_sq_sum) VALUES (?, 1, ?, ?, ?)
+        ON CONFLICT(topic) DO UPDATE SET attempts = attempts + 1, answered = answered + excluded.answered,
+                                         correct_sum = correct_sum + excluded.correct_sum,
+                                         correct_sq_sum = correct_sq_sum + excluded.correct_sq_sum
+    ''', [(topic, answered, correct, correct * correct) for topic, (answered, correct) in topic_answers.items()])
+
+# --- Statistics ---
+def describe_item(row):
+    """Turns an item_stats row into difficulty, discrimination, distractor shares and review flags."""
+    n = row['responses']
+    if not n:
+        return None
+    p = row['correct'] / n
+    discrimination = None
+    variance = row['score_sq_sum'] / n - (row['score_sum'] / n) ** 2
+    if 0 < row['correct'] < n and variance > 1e-12:
+        mean_correct = row['correct_score_sum'] / row['correct']
+        mean_incorrect = (row['score_sum'] - row['correct_score_sum']) / (n - row['correct'])
+        discrimination = (mean_correct - mean_incorrect) / math.sqrt(variance) * math.sqrt(p * (1 - p))
+
+    flags = []
+    if n >= MIN_RESPONSES:
+        if p < LOW_DIFFICULTY: flags.append('Very hard')
+        elif p > HIGH_DIFFICULTY: flags.append('Very easy')
+        if discrimination is not None and discrimination < LOW_DISCRIMINATION: flags.append('Low discrimination')
+    return {
+        'responses': n,
+        'difficulty': p,
+        'discrimination': discrimination,
+        'distractors': {choice: row[f'choice_{choice.lower()}'] / n for choice in CHOICES},
+        'omitted': row['omitted'] / n,
+        'flags': flags,
+    }
+
+ITEM_STATS_QUERY = 'SELECT * FROM item_stats WHERE question_id IN ({placeholders})'
+
+def get_item_stats(conn, question_ids):
+    """Returns {question id: describe_item(...)} for the given questions (those with responses only)."""
+    if not question_ids:
+        return {}
+    placeholders = ', '.join('?' * len(question_ids))
+    rows = conn.execute(ITEM_STATS_QUERY.format(placeholders=placeholders), list(question_ids)).fetchall()
+    return {row['question_id']: describe_item(row) for row in rows if row['responses']}
+
+def get_topic_reliability(conn):
+    """KR-20 per topic from the variance of topic sub-scores and the items' p(1 - p).
+
+    Students see different quizzes, so k is the average number of topic items per
+    attempt and the summed item variance is scaled to k items (a KR-20 estimate for
+    a typical attempt rather than a fixed test form).
+    """
+    item_variance = {row['topic']: (row['items'], row['pq_sum']) for row in conn.execute('''
+        SELECT q.topic, COUNT(*) AS items,
+               SUM((i.correct * 1.0 / i.responses) * (1 - i.correct * 1.0 / i.responses)) AS pq_sum
+        FROM item_stats i JOIN questions q ON q.id = i.question_id
+        WHERE i.responses > 0 GROUP BY q.topic
+    ''')}
+    reliability = []
+    for row in conn.execute('SELECT * FROM topic_stats WHERE attempts > 0 ORDER BY topic'):
+        n = row['attempts']
+        k = row['answered'] / n
+        variance = row['correct_sq_sum'] / n - (row['correct_sum'] / n) ** 2
+        items, pq_sum = item_variance.get(row['topic'], (0, 0))
+        kr20 = None
+        if k > 1 and items and variance > 1e-12:
+            kr20 = k / (k - 1) * (1 - k * (pq_sum / items) / variance)
+        reliability.append({'topic': row['topic'], 'attempts': n, 'items_per_attempt': k,
+                            'mean_score': row['correct_sum'] / row['answered'] if row['answered'] else 0, 'kr20': kr20})
+    return reliability
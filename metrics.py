@@ -0,0 +1,302 @@
+import hmac
+import threading
+import time
+import types
+from flask import g, has_request_context, request, before_render_template, template_rendered
+
+# --- Request Instrumentation ---
+# The request connection is wrapped so every statement is counted and timed; the totals
+# are folded into process-wide histograms once per request, so the per-statement cost is
+# two perf_counter() calls and a dict increment. Metrics are per process: scrape each
+# worker, or sum them in Prometheus.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+N_PLUS_ONE_THRESHOLD = 10 # The same statement executed this many times in one request is flagged
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class RequestStats:
+    __slots__ = ('queries', 'sql_seconds', 'statements', 'slowest', 'template_seconds', 'template_starts')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = {}
+        self.slowest = (0.0, None, None)
+        self.template_seconds = 0.0
+        self.template_starts = []
+
+    def record(self, sql, seconds, params):
+        self.queries += 1
+        self.sql_seconds += seconds
+        self.statements[sql] = self.statements.get(sql, 0) + 1
+        if seconds > self.slowest[0]:
+            self.slowest = (seconds, sql, params)
+
+    def repeated_statements(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return [(sql, count) for sql, count in self.statements.items() if count >= threshold]
+
+class InstrumentedCursor:
+    __slots__ = ('_cursor', '_stats')
+
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(sql, params)
+            return self
+        finally:
+            self._stats.record(sql, time.perf_counter() - start, params)
+
+    def executemany(self, sql, seq_of_params):
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+            return self
+        finally:
+            self._stats.record(sql, time.perf_counter() - start, None)
+
+    def executescript(self, script):
+        start = time.perf_counter()
+        try:
+            self._cursor.executescript(script)
+            return self
+        finally:
+            self._stats.record(script, time.perf_counter() - start, None)
+
+class InstrumentedConnection:
+    """Wraps a sqlite3 connection, timing every statement into the request's RequestStats."""
+    __slots__ = ('_conn', '_stats')
+
+    def __init__(self, conn, stats):
+        self._conn = conn
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        try:
+            return self._conn.execute(sql, params)
+        finally:
+            self._stats.record(sql, time.perf_counter() - start, params)
+
+    def executemany(self, sql, seq_of_params):
+        start = time.perf_counter()
+        try:
+            return self._conn.executemany(sql, seq_of_params)
+        finally:
+            self._stats.record(sql, time.perf_counter() - start, None)
+
+    def executescript(self, script):
+        start = time.perf_counter()
+        try:
+            return self._conn.executescript(script)
+        finally:
+            self._stats.record(script, time.perf_counter() - start, None)
+
+    def cursor(self, *args):
+        return InstrumentedCursor(self._conn.cursor(*args), self._stats)
+
+def instrument(conn):
+    """Returns the request's instrumented wrapper for `conn`; outside a request `conn` is returned as is."""
+    if not has_request_context() or 'metrics' not in g:
+        return conn
+    wrapped = g.get('metrics_conn')
+    if wrapped is None or wrapped._conn is not conn:
+        wrapped = g.metrics_conn = InstrumentedConnection(conn, g.metrics)
+    return wrapped
+
+# --- Registry ---
+_lock = threading.Lock()
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help_text, self.labels = name, help_text, labels
+        self.values = {}
+
+    def inc(self, label_values=(), amount=1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} counter'
+        for label_values, value in sorted(self.values.items()):
+            yield f'{self.name}{_labels(self.labels, label_values)} {_number(value)}'
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help_text, self.labels, self.buckets = name, help_text, labels, buckets
+        self.values = {}
+
+    def observe(self, label_values, value):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        for label_values, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{_labels(self.labels + ("le",), label_values + (_number(bound),))} {cumulative}'
+            yield f'{self.name}_bucket{_labels(self.labels + ("le",), label_values + ("+Inf",))} {count}'
+            yield f'{self.name}_sum{_labels(self.labels, label_values)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labels, label_values)} {count}'
+
+class Gauge:
+    def __init__(self, name, help_text, read):
+        self.name, self.help_text, self.read = name, help_text, read
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} gauge'
+        yield f'{self.name} {_number(self.read())}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values):
+    if not names: return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+REQUESTS = Counter('pypath_http_requests_total', 'HTTP requests by endpoint, method and status.', ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram('pypath_http_request_duration_seconds', 'Request latency by endpoint.', ('endpoint',))
+SQL_QUERIES = Histogram('pypath_sql_queries_per_request', 'SQL statements issued per request.', ('endpoint',), QUERY_COUNT_BUCKETS)
+SQL_SECONDS = Histogram('pypath_sql_duration_seconds', 'Time spent executing SQL per request.', ('endpoint',))
+TEMPLATE_SECONDS = Histogram('pypath_template_render_seconds', 'Template render time by template.', ('template',))
+N_PLUS_ONE = Counter('pypath_sql_n_plus_one_total', f'Requests that ran one statement {N_PLUS_ONE_THRESHOLD}+ times.', ('endpoint',))
+SLOW_REQUESTS = Counter('pypath_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS.', ('endpoint',))
+
+METRICS = [REQUESTS, REQUEST_SECONDS, SQL_QUERIES, SQL_SECONDS, TEMPLATE_SECONDS, N_PLUS_ONE, SLOW_REQUESTS]
+
+def register_gauge(name, help_text, read):
+    # Re-registering a name replaces the gauge, so each app create_app() builds reads its own state
+    with _lock:
+        METRICS[:] = [metric for metric in METRICS if metric.name != name]
+        METRICS.append(Gauge(name, help_text, read))
+
+def render():
+    with _lock:
+        lines = [line for metric in METRICS for line in metric.render()]
+    return '\n'.join(lines) + '\n'
+
+# --- Flask Integration ---
+_warned_statements = set()
+
+def _before_request():
+    g.metrics = RequestStats()
+    g.metrics_start = time.perf_counter()
+
+def _after_request(response):
+    g.metrics_status = response.status_code
+    # stream_with_context tears the request down once when the view returns and again when
+    # the body is exhausted; generator bodies are recorded on the second pass, end to end
+    g.metrics_deferred = isinstance(response.response, types.GeneratorType)
+    return response
+
+def _teardown_request(app, exception):
+    if g.pop('metrics_deferred', False):
+        return
+    stats = g.pop('metrics', None)
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - g.pop('metrics_start')
+    endpoint = request.endpoint or 'unmatched'
+    status = 500 if exception is not None else g.pop('metrics_status', 500)
+    repeated = stats.repeated_statements()
+    slow_ms = app.config.get('SLOW_REQUEST_MS')
+    is_slow = slow_ms is not None and elapsed * 1000 >= slow_ms
+
+    with _lock:
+        REQUESTS.inc((endpoint, request.method, str(status)))
+        REQUEST_SECONDS.observe((endpoint,), elapsed)
+        SQL_QUERIES.observe((endpoint,), stats.queries)
+        SQL_SECONDS.observe((endpoint,), stats.sql_seconds)
+        if repeated: N_PLUS_ONE.inc((endpoint,))
+        if is_slow: SLOW_REQUESTS.inc((endpoint,))
+
+    for sql, count in repeated:
+        if (endpoint, sql) not in _warned_statements:
+            _warned_statements.add((endpoint, sql))
+            app.logger.warning('Possible N+1 in %s: statement ran %d times: %s', endpoint, count, ' '.join(sql.split()))
+    if is_slow:
+        _log_slow_request(app, endpoint, elapsed, stats)
+
+def _log_slow_request(app, endpoint, elapsed, stats):
+    seconds, sql, params = stats.slowest
+    message = (f'Slow request {request.method} {request.full_path.rstrip("?")} ({endpoint}): {elapsed * 1000:.1f} ms, '
+               f'{stats.queries} queries, {stats.sql_seconds * 1000:.1f} ms SQL, {stats.template_seconds * 1000:.1f} ms templates')
+    if sql is not None:
+        message += f'\n  slowest statement ({seconds * 1000:.1f} ms): {" ".join(sql.split())}\n  params: {params!r}'
+        conn = g.get('metrics_conn')
+        if conn is not None and params is not None:
+            try:
+                plan = conn._conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+                message += '\n  plan: ' + '; '.join(row[3] for row in plan)
+            except Exception as e:
+                message += f'\n  plan unavailable: {e}'
+    app.logger.warning(message)
+
+def _template_started(sender, template, context, **extra):
+    stats = g.get('metrics')
+    if stats is not None:
+        stats.template_starts.append(time.perf_counter())
+
+def _template_finished(sender, template, context, **extra):
+    stats = g.get('metrics')
+    if stats is None or not stats.template_starts:
+        return
+    elapsed = time.perf_counter() - stats.template_starts.pop()
+    if not stats.template_starts:
+        stats.template_seconds += elapsed
+    with _lock:
+        TEMPLATE_SECONDS.observe((template.name or 'string',), elapsed)
+
+def token_matches(app):
+    """True when the request carries the configured METRICS_TOKEN as a bearer token (for scrapers)."""
+    token = app.config.get('METRICS_TOKEN')
+    header = request.headers.get('Authorization', '')
+    # Bytes: compare_digest rejects non-ASCII str, and Werkzeug decodes headers as latin-1
+    return bool(token) and hmac.compare_digest(header.encode('utf-8'), f'Bearer {token}'.encode('utf-8'))
+
+def init_app(app):
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('SLOW_REQUEST_MS', None) # e.g. 500 to log slow requests with their worst statement and its plan
+    app.config.setdefault('METRICS_TOKEN', None)
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(lambda exception: _teardown_request(app, exception))
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
@@ -0,0 +1,134 @@
+import re
+from collections import namedtuple
+import avatars
+import rankings
+import rollups
+import quiz_cache
+import history
+import summaries
+import question_bank
+import item_analysis
+import awards
+
+# --- Versioned Migrations ---
+# Each migration runs once, in order, inside its own transaction; the applied
+# version is tracked in PRAGMA user_version so existing data is never dropped.
+MIGRATIONS = [
+    (1, 'Index hot query paths', (
+        'CREATE INDEX IF NOT EXISTS idx_results_user_timestamp ON results (user_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_results_set ON results (set_id)',
+        'CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_student_answers_result ON student_answers (result_id, question_id, is_correct)',
+        'CREATE INDEX IF NOT EXISTS idx_set_questions_question ON set_questions (question_id)',
+        'CREATE INDEX IF NOT EXISTS idx_users_leaderboard ON users (is_admin, level DESC, xp DESC)',
+    )),
+    (2, 'Move profile images into the avatar blob store', avatars.move_profile_images_to_store),
+    (3, 'Materialize leaderboard ranks', rankings.create_leaderboard_table),
+    (4, 'Create admin analytics rollups', rollups.create_rollup_tables),
+    (5, 'Version question sets for the quiz cache', quiz_cache.create_version_table),
+    (6, 'Store attempt numbers and durations, index student names for search', history.add_history_columns),
+    (7, 'Precompute result topic breakdowns and student summaries', summaries.create_summary_tables),
+    (8, 'Hash question content for bulk import deduplication', question_bank.add_content_hash),
+    (9, 'Track item analysis statistics', item_analysis.create_item_tables),
+    (10, 'Queue achievement events and track streak progress', awards.create_award_tables),
+    (11, 'Count attempts outside the archivable results table', history.create_attempt_counts),
+    (12, 'Index results in admin history keyset order', (
+        'CREATE INDEX IF NOT EXISTS idx_results_timestamp_id ON results (timestamp, id)',
+        'DROP INDEX IF EXISTS idx_results_timestamp',
+    )),
+    # Ranks are read from the leaderboard table since migration 3; only the offline
+    # rebuilds still order users by XP, and they sort every student anyway
+    (13, 'Drop the users XP index the materialized leaderboard replaced', (
+        'DROP INDEX IF EXISTS idx_users_leaderboard',
+    )),
+]
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn):
+    """Applies pending migrations and returns the list of (version, name) applied."""
+    applied = []
+    if conn.in_transaction:
+        conn.commit()
+    for version, name, step in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if callable(step):
+                step(conn)
+            else:
+                for statement in step:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, name))
+    return applied
+
+# --- Query Plan Check ---
+# Statements issued by the hot routes, taken from the constants the modules execute so
+# the check cannot drift from the code. None of them may scan a whole table or sort
+# through a temporary B-tree, except for the plan details listed in `allowed`.
+HotQuery = namedtuple('HotQuery', 'sql params allowed', defaults=((), ()))
+
+# One row per question set or topic: the admin dashboard reads the whole table on purpose
+SMALL_TABLE_SORT = ('USE TEMP B-TREE FOR ORDER BY',)
+
+HOT_QUERIES = {
+    'student summary: by id': HotQuery(summaries.STUDENT_BY_ID_QUERY, (1,)),
+    'student summary: by code': HotQuery(summaries.STUDENT_BY_CODE_QUERY, ('',)),
+    'submit_quiz: summary row': HotQuery(summaries.SUMMARY_ROW_QUERY, (1,)),
+    'results: result lookup': HotQuery(summaries.RESULT_QUERY, (1, 1)),
+    'history: student attempts': HotQuery(history.STUDENT_HISTORY_QUERY, (1,)),
+    'student_history: first page': HotQuery(history.ADMIN_HISTORY_QUERY + history.HISTORY_ORDER + history.PAGE_LIMIT, (51,)),
+    'student_history: next page': HotQuery(history.ADMIN_HISTORY_QUERY + history.KEYSET_FILTER + history.HISTORY_ORDER + history.PAGE_LIMIT,
+                                           ('', 0, 51)),
+    # Sorts only the matched students' results, which the FTS lookup has already narrowed down
+    'student_history: search': HotQuery(history.ADMIN_HISTORY_QUERY + history.FTS_FILTER + history.HISTORY_ORDER + history.PAGE_LIMIT,
+                                        ('"a"*', 51), ('USE TEMP B-TREE FOR ORDER BY',)),
+    'submit_quiz: next attempt number': HotQuery(history.ATTEMPT_COUNT_QUERY, (1, 1)),
+    'leaderboard: page': HotQuery(rankings.RANK_RANGE_QUERY, (1, 50)),
+    'leaderboard: my rank': HotQuery(rankings.RANK_QUERY, (1,)),
+    'leaderboard: last rank': HotQuery(rankings.LAST_RANK_QUERY),
+    'leaderboard: tie ahead': HotQuery(rankings.TIE_AHEAD_QUERY, (100, 1)),
+    'leaderboard: next total ahead': HotQuery(rankings.NEXT_TOTAL_AHEAD_QUERY, (100,)),
+    'leaderboard: shift ranks down': HotQuery(rankings.SHIFT_DOWN_QUERY, (1, 2)),
+    'leaderboard: shift ranks up': HotQuery(rankings.SHIFT_UP_QUERY, (1, 2)),
+    'leaderboard: move': HotQuery(rankings.MOVE_QUERY, (100, 1, 1)),
+    'quiz: set version': HotQuery(quiz_cache.VERSION_QUERY, (1,)),
+    'quiz: set info': HotQuery(quiz_cache.SET_INFO_QUERY, (1,)),
+    'quiz: set questions': HotQuery(quiz_cache.SET_QUESTIONS_QUERY, (1,)),
+    'question usage': HotQuery(quiz_cache.SETS_CONTAINING_QUERY, (1,)),
+    'dashboard: totals': HotQuery(rollups.TOTALS_QUERY),
+    'dashboard: topic popularity': HotQuery(rollups.TOPIC_POPULARITY_QUERY, (), ('SCAN topic_rollup',) + SMALL_TABLE_SORT),
+    'dashboard: set summaries': HotQuery(rollups.SET_SUMMARIES_QUERY, (), ('SCAN sr',) + SMALL_TABLE_SORT),
+    'submit_quiz: best score': HotQuery(rollups.BEST_SCORE_QUERY, (1,)),
+    'question bank: page': HotQuery(question_bank.PAGE_QUERY, (0, 51)),
+    'question bank: duplicate check': HotQuery(question_bank.DUPLICATE_QUERY.format(placeholders='?, ?'), ('', '')),
+    'question bank: item stats': HotQuery(item_analysis.ITEM_STATS_QUERY.format(placeholders='?, ?'), (1, 2)),
+    'achievements: progress row': HotQuery(awards.PROGRESS_QUERY, (1,)),
+    'achievements: earned': HotQuery(awards.EARNED_QUERY, (1,)),
+    'achievements: state': HotQuery(awards.STATE_QUERY, (100, 1)),
+    # Walks the queue in rowid order and stops after one batch
+    'achievements: event batch': HotQuery(awards.EVENTS_QUERY, (200,), ('SCAN achievement_events',)),
+    'achievements: catalogue': HotQuery(awards.CATALOGUE_QUERY, (1,)),
+}
+
+FULL_SCAN_PATTERN = re.compile(r'^SCAN (\w+)$')
+TEMP_SORT_PREFIX = 'USE TEMP B-TREE'
+
+def find_full_scans(conn, queries=None):
+    """Returns (query name, plan detail) pairs for every hot query that scans a whole table or sorts in a temp B-tree."""
+    offenders = []
+    for name, (sql, params, allowed) in (queries or HOT_QUERIES).items():
+        for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall():
+            detail = row['detail']
+            if detail in allowed:
+                continue
+            if FULL_SCAN_PATTERN.match(detail) or detail.startswith(TEMP_SORT_PREFIX):
+                offenders.append((name, detail))
+    return offenders
@@ -0,0 +1,188 @@
+import csv
+import hashlib
+import io
+import json
+
+# --- Question Bank Import / Export ---
+# Uploads are parsed row by row straight off the (spooled) upload stream, validated,
+# deduplicated on a content hash and inserted in executemany batches inside a single
+# transaction, so a 10k question bank imports in one pass without being held in memory.
+
+PAGE_SIZE = 50
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 5 # Flashed into the session, so only the first few are kept
+
+COLUMNS = ('question_type', 'topic', 'question_text', 'option_a', 'option_b', 'option_c', 'option_d',
+           'correct_answer', 'correct_code_output')
+QUESTION_TYPES = ('multiple_choice', 'coding')
+OPTION_COLUMNS = ('option_a', 'option_b', 'option_c', 'option_d')
+
+def content_hash(question):
+    """Hashes the fields that make two questions the same, ignoring case and spacing differences."""
+    parts = [' '.join(str(question.get(column) or '').split()).lower() for column in COLUMNS]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+# --- Schema ---
+def add_content_hash(conn):
+    """Schema migration: stores a content hash on every question for import deduplication."""
+    conn.execute('ALTER TABLE questions ADD COLUMN content_hash TEXT')
+    rows = conn.execute(f'SELECT id, {", ".join(COLUMNS)} FROM questions').fetchall()
+    conn.executemany('UPDATE questions SET content_hash = ? WHERE id = ?', [(content_hash(dict(row)), row['id']) for row in rows])
+    conn.execute('CREATE INDEX idx_questions_content_hash ON questions (content_hash)')
+
+def refresh_hash(conn, question_id):
+    row = conn.execute(f'SELECT {", ".join(COLUMNS)} FROM questions WHERE id = ?', (question_id,)).fetchone()
+    if row:
+        conn.execute('UPDATE questions SET content_hash = ? WHERE id = ?', (content_hash(dict(row)), question_id))
+
+# --- Parsing and Validation ---
+def _text_stream(file_storage):
+    # utf-8-sig drops the BOM spreadsheet programs put at the start of CSV exports
+    return io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+
+def iter_csv(file_storage):
+    rows = csv.DictReader(_text_stream(file_storage))
+    try:
+        rows.fieldnames
+    except csv.Error as e:
+        yield 1, ValueError(f'invalid CSV header ({e})')
+        return
+    while True:
+        line_number = rows.reader.line_num + 1 # Where the next record starts; quoted fields may span lines
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        except csv.Error as e: # e.g. a field over csv.field_size_limit(); the reader resumes on the next line
+            yield line_number, ValueError(f'invalid CSV ({e})')
+            continue
+        yield line_number, row
+
+def iter_jsonl(file_storage):
+    for line_number, line in enumerate(_text_stream(file_storage), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f'invalid JSON ({e.msg})')
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError('expected a JSON object')
+
+def validate(row):
+    """Returns (question dict, None) for a valid row or (None, error message)."""
+    if isinstance(row, ValueError):
+        return None, str(row)
+    question = {column: (str(row[column]).strip() if row.get(column) is not None else None) or None for column in COLUMNS}
+    question['question_type'] = (question['question_type'] or 'multiple_choice').lower()
+    if question['question_type'] not in QUESTION_TYPES:
+        return None, f"unknown question_type '{question['question_type']}'"
+    if not question['question_text'] or not question['topic']:
+        return None, 'question_text and topic are required'
+    if question['question_type'] == 'multiple_choice':
+        if not all(question[column] for column in OPTION_COLUMNS):
+            return None, 'multiple choice questions need option_a to option_d'
+        question['correct_answer'] = (question['correct_answer'] or '').upper()
+        if question['correct_answer'] not in ('A', 'B', 'C', 'D'):
+            return None, 'correct_answer must be A, B, C or D'
+        question['correct_code_output'] = None
+    else:
+        if not question['correct_code_output']:
+            return None, 'coding questions need correct_code_output'
+        question['correct_answer'] = None
+        for column in OPTION_COLUMNS:
+            question[column] = None
+    return question, None
+
+DUPLICATE_QUERY = 'SELECT content_hash FROM questions WHERE content_hash IN ({placeholders})'
+PAGE_QUERY = 'SELECT id, question_text, topic, question_type FROM questions WHERE id > ? ORDER BY id LIMIT ?'
+
+# --- Import ---
+def _import_batch(conn, batch, report, attach_set_id):
+    hashes = list(batch)
+    placeholders = ', '.join('?' * len(hashes))
+    existing = {row['content_hash'] for row in conn.execute(
+        DUPLICATE_QUERY.format(placeholders=placeholders), hashes)}
+    new_rows = [tuple(batch[h][column] for column in COLUMNS) + (h,) for h in hashes if h not in existing]
+    conn.executemany(f'''
+        INSERT INTO questions ({", ".join(COLUMNS)}, content_hash) VALUES ({", ".join("?" * (len(COLUMNS) + 1))})
+    ''', new_rows)
+    report['inserted'] += len(new_rows)
+    report['duplicates'] += len(existing)
+    if attach_set_id is not None:
+        before = conn.total_changes
+        conn.execute(f'''
+            INSERT OR IGNORE INTO set_questions (set_id, question_id)
+            SELECT ?, MIN(id) FROM questions WHERE content_hash IN ({placeholders}) GROUP BY content_hash
+        ''', [attach_set_id] + hashes)
+        report['attached'] += conn.total_changes - before
+
+def import_questions(conn, rows, attach_set_id=None):
+    """Imports (line number, row) pairs; the caller owns the transaction.
+
+    Invalid rows are skipped and reported; rows whose content hash is already in the
+    bank (or earlier in the upload) count as duplicates. With `attach_set_id` every valid
+    row's question, new or existing, is added to that question set.
+    """
+    report = {'read': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0, 'attached': 0, 'errors': []}
+    batch = {}
+    for line_number, row in rows:
+        report['read'] += 1
+        question, error = validate(row)
+        if error:
+            report['invalid'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append(f'line {line_number}: {error}')
+            continue
+        h = content_hash(question)
+        if h in batch:
+            report['duplicates'] += 1
+            continue
+        batch[h] = question
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            _import_batch(conn, batch, report, attach_set_id)
+            batch = {}
+    if batch:
+        _import_batch(conn, batch, report, attach_set_id)
+    return report
+
+# --- Listing and Export ---
+def get_page(conn, after_id=0, page_size=PAGE_SIZE):
+    """Returns (questions, next cursor) for the page of questions with ids above `after_id`."""
+    rows = conn.execute(PAGE_QUERY, (after_id, page_size + 1)).fetchall()
+    next_after = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_after = rows[-1]['id']
+    return rows, next_after
+
+def iter_questions(conn, set_id=None):
+    if set_id is None:
+        cursor = conn.execute(f'SELECT {", ".join(COLUMNS)} FROM questions ORDER BY id')
+    else:
+        cursor = conn.execute(f'''
+            SELECT {", ".join("q." + column for column in COLUMNS)} FROM questions q
+            JOIN set_questions sq ON sq.question_id = q.id WHERE sq.set_id = ? ORDER BY q.id
+        ''', (set_id,))
+    while True:
+        batch = cursor.fetchmany(EXPORT_BATCH_SIZE)
+        if not batch:
+            break
+        yield from batch
+
+def stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for row in rows:
+        writer.writerow([row[column] for column in COLUMNS])
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_jsonl(rows):
+    for row in rows:
+        yield json.dumps({column: row[column] for column in COLUMNS}) + '\n'
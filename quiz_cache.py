@@ -0,0 +1,158 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from flask import current_app, render_template
+from markupsafe import Markup
+
+# --- Question Set Cache ---
+# Each entry holds a set's display payload, its answer key and (once a student opens it)
+# the rendered question list, keyed by the set's version. Edits bump the version in the
+# same transaction, so every worker sees the change on its next version check: one
+# primary-key read instead of the set_questions join and a full template render.
+# When QUIZ_CACHE_DIR is configured, entries are also shared between worker processes
+# through JSON files in that directory. Entries and files are also keyed by the database
+# file, since versions restart at 1 in every database (and again when init_db rebuilds one).
+
+QUIZ_CACHE_SIZE = 64 # Question set versions kept in memory per worker
+DISPLAY_COLUMNS = ('id', 'question_text', 'question_type', 'topic', 'option_a', 'option_b', 'option_c', 'option_d')
+ANSWER_KEY_COLUMNS = ('id', 'question_type', 'topic', 'correct_answer', 'correct_code_output')
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+def create_version_table(conn):
+    """Schema migration: one version counter per question set."""
+    conn.execute('''
+        CREATE TABLE question_set_versions (
+            set_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 1,
+            FOREIGN KEY (set_id) REFERENCES question_sets (id) ON DELETE CASCADE
+        )
+    ''')
+    conn.execute('INSERT INTO question_set_versions (set_id) SELECT id FROM question_sets')
+
+VERSION_QUERY = 'SELECT version FROM question_set_versions WHERE set_id = ?'
+SET_INFO_QUERY = 'SELECT id, title, description FROM question_sets WHERE id = ?'
+# Ordered by the set_questions key so the questions come out of the index without a sort
+SET_QUESTIONS_QUERY = 'SELECT q.* FROM set_questions sq JOIN questions q ON q.id = sq.question_id WHERE sq.set_id = ? ORDER BY sq.question_id'
+SETS_CONTAINING_QUERY = 'SELECT set_id FROM set_questions WHERE question_id = ?'
+
+# --- Versioning ---
+def get_version(conn, set_id):
+    row = conn.execute(VERSION_QUERY, (set_id,)).fetchone()
+    return row['version'] if row else 0
+
+def bump_versions(conn, set_ids):
+    conn.executemany('''
+        INSERT INTO question_set_versions (set_id, version) VALUES (?, 1)
+        ON CONFLICT(set_id) DO UPDATE SET version = version + 1
+    ''', [(set_id,) for set_id in set_ids])
+
+def sets_containing(conn, question_id):
+    return [row['set_id'] for row in conn.execute(SETS_CONTAINING_QUERY, (question_id,))]
+
+def _database():
+    return os.path.abspath(current_app.config['DATABASE'])
+
+# --- Shared File Tier ---
+def _shared_dir():
+    return current_app.config.get('QUIZ_CACHE_DIR')
+
+def _shared_prefix(database):
+    return hashlib.sha256(database.encode('utf-8')).hexdigest()[:16]
+
+def _shared_path(set_id, version):
+    return os.path.join(_shared_dir(), f'{_shared_prefix(_database())}-set-{set_id}-v{version}.json')
+
+def _load_shared(set_id, version):
+    if not _shared_dir(): return None
+    try:
+        with open(_shared_path(set_id, version), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _store_shared(set_id, version, entry):
+    directory = _shared_dir()
+    if not directory: return
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, _shared_path(set_id, version))
+    for stale in glob.glob(os.path.join(directory, f'{_shared_prefix(_database())}-set-{set_id}-v*.json')):
+        if stale != _shared_path(set_id, version):
+            try: os.unlink(stale)
+            except OSError: pass
+
+# --- Lookups ---
+def _load_from_db(conn, set_id):
+    set_info = conn.execute(SET_INFO_QUERY, (set_id,)).fetchone()
+    if not set_info: return None
+    rows = conn.execute(SET_QUESTIONS_QUERY, (set_id,)).fetchall()
+    return {
+        'set_info': dict(set_info),
+        'questions': [{column: row[column] for column in DISPLAY_COLUMNS} for row in rows],
+        'answer_key': [{column: row[column] for column in ANSWER_KEY_COLUMNS} for row in rows],
+        'fragment': None,
+    }
+
+def get_quiz(conn, set_id):
+    """Returns the cached entry for a question set, or None if the set does not exist."""
+    version = get_version(conn, set_id)
+    key = (_database(), set_id, version)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            return entry
+
+    entry = _load_shared(set_id, version)
+    if entry is None:
+        entry = _load_from_db(conn, set_id)
+        if entry is None: return None
+        entry['version'] = version
+        _store_shared(set_id, version, entry)
+
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > QUIZ_CACHE_SIZE:
+            _entries.popitem(last=False)
+    return entry
+
+def get_answer_key(conn, set_id):
+    """Returns the answer key for a question set, or None if the set does not exist."""
+    entry = get_quiz(conn, set_id)
+    return entry['answer_key'] if entry else None
+
+def get_quiz_fragment(conn, set_id):
+    """Returns (set_info, rendered question list) for a question set, or (None, None)."""
+    entry = get_quiz(conn, set_id)
+    if entry is None: return None, None
+    if entry['fragment'] is None:
+        entry['fragment'] = render_template('student/_quiz_questions.html', questions=entry['questions'])
+        _store_shared(set_id, entry['version'], entry)
+    return entry['set_info'], Markup(entry['fragment'])
+
+def size():
+    return len(_entries)
+
+def clear(database=None):
+    """Forgets every cached entry, or only those of one database file (with its shared files)."""
+    with _lock:
+        if database is None:
+            _entries.clear()
+            return
+        database = os.path.abspath(database)
+        for key in [key for key in _entries if key[0] == database]:
+            del _entries[key]
+    directory = _shared_dir()
+    if directory:
+        for path in glob.glob(os.path.join(directory, f'{_shared_prefix(database)}-set-*.json')):
+            try: os.unlink(path)
+            except OSError: pass
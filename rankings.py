@@ -0,0 +1,96 @@
+# --- Materialized Leaderboard ---
+# Ranks are stored densely (1..n) ordered by total XP descending, then by user id
+# ascending, and are shifted incrementally when one student's XP changes. Page and
+# neighbourhood reads are then index range scans on `rank`.
+
+PAGE_SIZE = 50
+NEIGHBOURHOOD = 5 # Students shown above and below you on /leaderboard/me
+
+LEADERBOARD_COLUMNS = '''
+    SELECT l.rank, u.id, u.first_name, u.last_name, u.level, u.xp, u.profile_image_hash
+    FROM leaderboard l JOIN users u ON u.id = l.user_id
+'''
+
+# Every statement below is plan-checked by `flask check-query-plans` (migrations.HOT_QUERIES)
+RANK_RANGE_QUERY = LEADERBOARD_COLUMNS + ' WHERE l.rank BETWEEN ? AND ? ORDER BY l.rank'
+RANK_QUERY = 'SELECT rank FROM leaderboard WHERE user_id = ?'
+LAST_RANK_QUERY = 'SELECT COALESCE(MAX(rank), 0) FROM leaderboard'
+TIE_AHEAD_QUERY = '''
+    SELECT rank FROM leaderboard WHERE total_xp = ? AND user_id < ?
+    ORDER BY user_id DESC LIMIT 1
+'''
+NEXT_TOTAL_AHEAD_QUERY = '''
+    SELECT rank FROM leaderboard
+    WHERE total_xp = (SELECT MIN(total_xp) FROM leaderboard WHERE total_xp > ?)
+    ORDER BY user_id DESC LIMIT 1
+'''
+SHIFT_DOWN_QUERY = 'UPDATE leaderboard SET rank = rank + 1 WHERE rank >= ? AND rank < ?'
+SHIFT_UP_QUERY = 'UPDATE leaderboard SET rank = rank - 1 WHERE rank > ? AND rank <= ?'
+MOVE_QUERY = 'UPDATE leaderboard SET total_xp = ?, rank = ? WHERE user_id = ?'
+
+def create_leaderboard_table(conn):
+    """Schema migration: creates and fills the rank table."""
+    conn.execute('''
+        CREATE TABLE leaderboard (
+            user_id INTEGER PRIMARY KEY,
+            total_xp INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_leaderboard_total_xp ON leaderboard (total_xp, user_id)')
+    conn.execute('CREATE INDEX idx_leaderboard_rank ON leaderboard (rank)')
+    rebuild_leaderboard(conn)
+
+def rebuild_leaderboard(conn, xp_per_level=100):
+    conn.execute('DELETE FROM leaderboard')
+    conn.execute('''
+        INSERT INTO leaderboard (user_id, total_xp, rank)
+        SELECT id, level * ? + xp, ROW_NUMBER() OVER (ORDER BY level * ? + xp DESC, id ASC)
+        FROM users WHERE is_admin = 0
+    ''', (xp_per_level, xp_per_level))
+
+def _rank_of_last_ahead(conn, user_id, total_xp):
+    # Last student ahead on an XP tie (older accounts rank first)...
+    row = conn.execute(TIE_AHEAD_QUERY, (total_xp, user_id)).fetchone()
+    if row: return row['rank']
+    # ...otherwise the last student of the next-higher XP total
+    row = conn.execute(NEXT_TOTAL_AHEAD_QUERY, (total_xp,)).fetchone()
+    return row['rank'] if row else None
+
+def update_rank(conn, user_id, level, xp, xp_per_level=100):
+    """Moves one student to their new position; must run inside the transaction that changed their XP."""
+    total_xp = level * xp_per_level + xp
+    current = conn.execute(RANK_QUERY, (user_id,)).fetchone()
+    if current:
+        old_rank = current['rank']
+    else:
+        old_rank = conn.execute(LAST_RANK_QUERY).fetchone()[0] + 1
+        conn.execute('INSERT INTO leaderboard (user_id, total_xp, rank) VALUES (?, ?, ?)', (user_id, total_xp, old_rank))
+
+    ahead = _rank_of_last_ahead(conn, user_id, total_xp)
+    if ahead is None: new_rank = 1
+    elif ahead > old_rank: new_rank = ahead # Moving down: everyone in between shifts up into our old slot
+    else: new_rank = ahead + 1
+
+    if new_rank < old_rank:
+        conn.execute(SHIFT_DOWN_QUERY, (new_rank, old_rank))
+    elif new_rank > old_rank:
+        conn.execute(SHIFT_UP_QUERY, (old_rank, new_rank))
+    conn.execute(MOVE_QUERY, (total_xp, new_rank, user_id))
+    return new_rank
+
+def get_student_count(conn):
+    return conn.execute(LAST_RANK_QUERY).fetchone()[0]
+
+def get_page(conn, page, page_size=PAGE_SIZE):
+    first = (page - 1) * page_size + 1
+    return conn.execute(RANK_RANGE_QUERY, (first, first + page_size - 1)).fetchall()
+
+def get_neighbourhood(conn, user_id, radius=NEIGHBOURHOOD):
+    """Returns (your rank, rows around you), or (None, []) for users not on the board."""
+    row = conn.execute(RANK_QUERY, (user_id,)).fetchone()
+    if not row: return None, []
+    rank = row['rank']
+    rows = conn.execute(RANK_RANGE_QUERY, (max(1, rank - radius), rank + radius)).fetchall()
+    return rank, rows
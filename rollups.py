@@ -0,0 +1,159 @@
+# --- Admin Analytics Rollups ---
+# Aggregates behind the admin dashboard, updated by each quiz submission inside its
+# write transaction so the dashboard reads a handful of rows however many results exist.
+# Only non-admin users are counted. `flask rebuild-rollups` recomputes them from scratch.
+
+def create_rollup_tables(conn):
+    """Schema migration: creates and fills the rollup tables."""
+    conn.execute('''
+        CREATE TABLE student_score_rollup (
+            user_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL,
+            best_score REAL NOT NULL,
+            latest_score REAL NOT NULL,
+            latest_result_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE topic_rollup (
+            topic TEXT PRIMARY KEY,
+            student_count INTEGER NOT NULL DEFAULT 0,
+            answers_total INTEGER NOT NULL DEFAULT 0,
+            answers_correct INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE set_rollup (
+            set_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            pass_count INTEGER NOT NULL DEFAULT 0,
+            fail_count INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            best_score REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY (set_id) REFERENCES question_sets (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE analytics_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            student_count INTEGER NOT NULL DEFAULT 0,
+            scored_students INTEGER NOT NULL DEFAULT 0,
+            passed_students INTEGER NOT NULL DEFAULT 0,
+            best_score_sum REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    rebuild_rollups(conn)
+
+def rebuild_rollups(conn, passing_threshold=60):
+    for table in ('student_score_rollup', 'topic_rollup', 'set_rollup', 'analytics_totals'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute('''
+        CREATE TEMP VIEW IF NOT EXISTS student_result_scores AS
+        SELECT r.id, r.user_id, r.set_id, r.timestamp,
+               COALESCE(r.score * 100.0 / NULLIF(r.total_questions, 0), 0) AS percentage
+        FROM results r JOIN users u ON u.id = r.user_id
+        WHERE u.is_admin = 0
+    ''')
+    conn.execute('''
+        INSERT INTO student_score_rollup (user_id, attempts, best_score, latest_score, latest_result_id)
+        SELECT user_id, attempts, best_score, percentage, id FROM (
+            SELECT user_id, id, percentage,
+                   COUNT(*) OVER student AS attempts,
+                   MAX(percentage) OVER student AS best_score,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY timestamp DESC, id DESC) AS recency
+            FROM student_result_scores
+            WINDOW student AS (PARTITION BY user_id)
+        ) WHERE recency = 1
+    ''')
+    conn.execute('''
+        INSERT INTO set_rollup (set_id, attempts, pass_count, fail_count, score_sum, best_score)
+        SELECT set_id, COUNT(*), SUM(percentage >= ?), SUM(percentage < ?), SUM(percentage), MAX(percentage)
+        FROM student_result_scores GROUP BY set_id
+    ''', (passing_threshold, passing_threshold))
+    conn.execute('''
+        INSERT INTO topic_rollup (topic, answers_total, answers_correct)
+        SELECT q.topic, COUNT(*), SUM(sa.is_correct)
+        FROM student_answers sa
+        JOIN student_result_scores r ON r.id = sa.result_id
+        JOIN questions q ON q.id = sa.question_id
+        GROUP BY q.topic
+    ''')
+    conn.execute('''
+        INSERT INTO topic_rollup (topic, student_count)
+        SELECT m.topic, COUNT(*) FROM student_topic_mastery m JOIN users u ON u.id = m.user_id
+        WHERE u.is_admin = 0 GROUP BY m.topic
+        ON CONFLICT(topic) DO UPDATE SET student_count = excluded.student_count
+    ''')
+    conn.execute('''
+        INSERT INTO analytics_totals (id, student_count, scored_students, passed_students, best_score_sum)
+        SELECT 1, (SELECT COUNT(*) FROM users WHERE is_admin = 0),
+               COUNT(*), COALESCE(SUM(best_score >= ?), 0), COALESCE(SUM(best_score), 0)
+        FROM student_score_rollup
+    ''', (passing_threshold,))
+    conn.execute('DROP VIEW student_result_scores')
+
+BEST_SCORE_QUERY = 'SELECT best_score FROM student_score_rollup WHERE user_id = ?'
+TOTALS_QUERY = 'SELECT * FROM analytics_totals WHERE id = 1'
+TOPIC_POPULARITY_QUERY = 'SELECT topic, student_count FROM topic_rollup WHERE student_count > 0 ORDER BY student_count DESC'
+SET_SUMMARIES_QUERY = '''
+    SELECT qs.id, qs.title, sr.attempts, sr.pass_count, sr.fail_count, sr.best_score,
+           sr.score_sum / sr.attempts AS avg_score
+    FROM set_rollup sr JOIN question_sets qs ON qs.id = sr.set_id
+    ORDER BY sr.attempts DESC
+'''
+
+# --- Incremental Maintenance ---
+def record_student(conn):
+    conn.execute('UPDATE analytics_totals SET student_count = student_count + 1 WHERE id = 1')
+
+def record_submission(conn, user_id, set_id, result_id, score, total_questions, topic_answers, new_topics, passing_threshold=60):
+    """Folds one submitted result into every rollup.
+
+    `topic_answers` maps topic -> (answered, correct) for this result and `new_topics`
+    holds the topics this submission gave the student their first mastery XP in.
+    """
+    percentage = score * 100.0 / total_questions if total_questions else 0
+    passed = percentage >= passing_threshold
+
+    previous = conn.execute(BEST_SCORE_QUERY, (user_id,)).fetchone()
+    conn.execute('''
+        INSERT INTO student_score_rollup (user_id, attempts, best_score, latest_score, latest_result_id) VALUES (?, 1, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET attempts = attempts + 1, best_score = MAX(best_score, excluded.best_score),
+                                           latest_score = excluded.latest_score, latest_result_id = excluded.latest_result_id
+    ''', (user_id, percentage, percentage, result_id))
+
+    if previous is None:
+        conn.execute('''
+            UPDATE analytics_totals SET scored_students = scored_students + 1, passed_students = passed_students + ?,
+                                        best_score_sum = best_score_sum + ?
+            WHERE id = 1
+        ''', (int(passed), percentage))
+    elif percentage > previous['best_score']:
+        newly_passed = int(passed) - int(previous['best_score'] >= passing_threshold)
+        conn.execute('UPDATE analytics_totals SET passed_students = passed_students + ?, best_score_sum = best_score_sum + ? WHERE id = 1',
+                     (newly_passed, percentage - previous['best_score']))
+
+    conn.execute('''
+        INSERT INTO set_rollup (set_id, attempts, pass_count, fail_count, score_sum, best_score) VALUES (?, 1, ?, ?, ?, ?)
+        ON CONFLICT(set_id) DO UPDATE SET attempts = attempts + 1, pass_count = pass_count + excluded.pass_count,
+                                          fail_count = fail_count + excluded.fail_count, score_sum = score_sum + excluded.score_sum,
+                                          best_score = MAX(best_score, excluded.best_score)
+    ''', (set_id, int(passed), int(not passed), percentage, percentage))
+
+    conn.executemany('''
+        INSERT INTO topic_rollup (topic, student_count, answers_total, answers_correct) VALUES (?, ?, ?, ?)
+        ON CONFLICT(topic) DO UPDATE SET student_count = student_count + excluded.student_count,
+                                         answers_total = answers_total + excluded.answers_total,
+                                         answers_correct = answers_correct + excluded.answers_correct
+    ''', [(topic, int(topic in new_topics), answered, correct) for topic, (answered, correct) in topic_answers.items()])
+
+# --- Reads ---
+def get_totals(conn):
+    return conn.execute(TOTALS_QUERY).fetchone()
+
+def get_topic_popularity(conn):
+    return conn.execute(TOPIC_POPULARITY_QUERY).fetchall()
+
+def get_set_summaries(conn):
+    return conn.execute(SET_SUMMARIES_QUERY).fetchall()
@@ -1,6 +1,20 @@
 -- schema.sql
 
--- Drop tables in reverse order of dependency
+-- Drop tables in reverse order of dependency (including those created by migrations.py)
+DROP TABLE IF EXISTS attempt_counts;
+DROP TABLE IF EXISTS achievement_progress;
+DROP TABLE IF EXISTS achievement_events;
+DROP TABLE IF EXISTS topic_stats;
+DROP TABLE IF EXISTS item_stats;
+DROP TABLE IF EXISTS student_summary;
+DROP TABLE IF EXISTS result_topic_breakdown;
+DROP TABLE IF EXISTS users_fts;
+DROP TABLE IF EXISTS question_set_versions;
+DROP TABLE IF EXISTS analytics_totals;
+DROP TABLE IF EXISTS set_rollup;
+DROP TABLE IF EXISTS topic_rollup;
+DROP TABLE IF EXISTS student_score_rollup;
+DROP TABLE IF EXISTS leaderboard;
 DROP TABLE IF EXISTS recommendations;
 DROP TABLE IF EXISTS student_answers;
 DROP TABLE IF EXISTS results;
@@ -0,0 +1,231 @@
+import json
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+import db
+
+# --- Server-Side Sessions ---
+# The cookie carries only a signed random session id; the session dict lives in a store
+# every worker process on the box can read, so any worker can serve any request and a
+# restart logs nobody out. SESSION_BACKEND picks the store: 'sqlite' (default, a WAL
+# database next to the app's data), 'file' (one file per session in a local directory)
+# or 'cookie' (Flask's signed cookie, the old behaviour).
+
+SESSION_SALT = 'pypath-session'
+SWEEP_INTERVAL_SECONDS = 300
+SECRET_KEY_FILE = 'secret_key'
+
+serializer = TaggedJSONSerializer()
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires
+        self.initial_user_id = self.get('user_id')
+        self.modified = False
+
+# --- Stores ---
+class SQLiteSessionStore:
+    def __init__(self, path):
+        self.path = path
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        conn = db.connect(path)
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _run(self, fn):
+        pool = db.get_pool(self.path)
+        conn = pool.acquire()
+        try:
+            return fn(conn)
+        finally:
+            pool.release(conn)
+
+    def load(self, sid):
+        row = self._run(lambda conn: conn.execute('SELECT data, expires FROM sessions WHERE sid = ? AND expires > ?',
+                                                  (sid, time.time())).fetchone())
+        return (row['data'], row['expires']) if row else None
+
+    def save(self, sid, data, expires):
+        def write(conn):
+            conn.execute('INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)', (sid, data, expires))
+            conn.commit()
+        self._run(write)
+        self._maybe_sweep()
+
+    def delete(self, sid):
+        def write(conn):
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+            conn.commit()
+        self._run(write)
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            def sweep(conn):
+                conn.execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+                conn.commit()
+            try:
+                self._run(sweep)
+            except sqlite3.OperationalError:
+                pass # Another worker holds the write lock; sweep next time
+        finally:
+            self._sweep_lock.release()
+
+class FileSessionStore:
+    """One file per session, written atomically; suits a tmpfs such as /dev/shm."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._last_sweep = 0.0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def load(self, sid):
+        try:
+            with open(self._path(sid)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record['expires'] <= time.time():
+            return None
+        return record['data'], record['expires']
+
+    def save(self, sid, data, expires):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'data': data, 'expires': expires}, f)
+        os.replace(temp_path, self._path(sid))
+        self._maybe_sweep()
+
+    def delete(self, sid):
+        try:
+            os.unlink(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith('.tmp-') and now - entry.stat().st_mtime < SWEEP_INTERVAL_SECONDS:
+                continue # Another worker is mid-write
+            if entry.name.startswith('.tmp-') or self.load(entry.name) is None:
+                self.delete(entry.name)
+
+# --- Session Interface ---
+class ServerSideSessionInterface(SessionInterface):
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=SESSION_SALT)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            stored = self.store.load(sid) if sid else None
+            if stored is not None:
+                data, expires = stored
+                return ServerSideSession(serializer.loads(data), sid=sid, expires=expires)
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name, domain, path = self.get_cookie_name(app), self.get_cookie_domain(app), self.get_cookie_path(app)
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        response.vary.add('Cookie')
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        # Rewrite when the contents change, or once half the lifetime has passed to keep an active session alive
+        needs_touch = session.expires is not None and session.expires - now < lifetime / 2
+        if not (session.modified or needs_touch or session.sid is None):
+            return
+        if session.sid is None or session.get('user_id') != session.initial_user_id:
+            # A fresh id whenever the signed-in user changes, so a planted id never gets promoted
+            if session.sid is not None:
+                self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.initial_user_id = session.get('user_id')
+        session.expires = now + lifetime
+        self.store.save(session.sid, serializer.dumps(dict(session)), session.expires)
+        response.set_cookie(name, self._signer(app).sign(session.sid).decode('ascii'),
+                            expires=self.get_expiration_time(app, session), httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path, secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+# --- Secret Key ---
+def load_secret_key(app):
+    """SECRET_KEY from config (or $PYPATH_SECRET_KEY via create_app), else one generated once into the instance folder.
+
+    Every worker on the box reads the same file, so cookies signed by one are valid in all.
+    """
+    key = app.config.get('SECRET_KEY')
+    if key:
+        return key
+    os.makedirs(app.instance_path, exist_ok=True)
+    path = os.path.join(app.instance_path, SECRET_KEY_FILE)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+    for _ in range(50):
+        with open(path) as f:
+            key = f.read().strip()
+        if key:
+            return key
+        time.sleep(0.01) # Another worker created the file and is still writing it
+    raise RuntimeError(f'{path} is empty; delete it or set SECRET_KEY')
+
+def init_app(app):
+    app.secret_key = load_secret_key(app)
+    app.config.setdefault('SESSION_BACKEND', 'sqlite')
+    app.config.setdefault('SESSION_DATABASE', os.path.join(app.instance_path, 'sessions.db'))
+    app.config.setdefault('SESSION_DIRECTORY', os.path.join(app.instance_path, 'sessions'))
+    backend = app.config['SESSION_BACKEND']
+    if backend == 'sqlite':
+        os.makedirs(os.path.dirname(app.config['SESSION_DATABASE']), exist_ok=True)
+        app.session_interface = ServerSideSessionInterface(SQLiteSessionStore(app.config['SESSION_DATABASE']))
+    elif backend == 'file':
+        app.session_interface = ServerSideSessionInterface(FileSessionStore(app.config['SESSION_DIRECTORY']))
+    elif backend != 'cookie':
+        raise ValueError(f'Unknown SESSION_BACKEND {backend!r}')
@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+# --- Startup Timing ---
+# `flask startup-timing` starts the app in fresh interpreters, the way a newly forked or
+# restarted worker would, and reports how long the import, create_app() and preload()
+# take and how slow the first request to each route is next to the second. Run without
+# preloading, the first requests pay for template compilation and cold caches; run with
+# it, that cost moves into preload() and the first requests should match the second.
+
+STUDENT_ROUTES = ('/dashboard', '/leaderboard', '/history', '/achievements')
+ANONYMOUS_ROUTES = ('/login',)
+LAZY_MODULES = ('PIL', 'brotli', 'urllib.request') # Must stay out of a worker until a request needs them
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def _routes(app, appmod):
+    """The routes to time and the student to sign in as, if the database has one."""
+    with app.app_context():
+        conn = appmod.get_db_connection()
+        student = conn.execute('SELECT id, username, first_name FROM users WHERE is_admin = 0 ORDER BY id LIMIT 1').fetchone()
+        question_set = conn.execute('SELECT id FROM question_sets ORDER BY id LIMIT 1').fetchone()
+        student = dict(student) if student else None
+    routes = list(ANONYMOUS_ROUTES)
+    if student:
+        routes += STUDENT_ROUTES
+        if question_set:
+            routes.append(f"/quiz/{question_set['id']}")
+    # The lookup above must not leave warm connections behind for the measured requests
+    appmod.db.get_pool(app.config['DATABASE']).close_all()
+    return routes, student
+
+def measure(config, preload):
+    """Runs in the child interpreter; returns the timings as a dict."""
+    timings = {}
+    start = time.perf_counter()
+    import app as appmod
+    timings['import_ms'] = _elapsed_ms(start)
+
+    start = time.perf_counter()
+    app = appmod.create_app(config)
+    timings['create_app_ms'] = _elapsed_ms(start)
+
+    if preload:
+        start = time.perf_counter()
+        appmod.preload(app)
+        timings['preload_ms'] = _elapsed_ms(start)
+    else:
+        appmod.prepare_database(app)
+
+    routes, student = _routes(app, appmod)
+    client = app.test_client()
+    if student:
+        with client.session_transaction() as sess:
+            sess['user_id'], sess['username'], sess['is_admin'] = student['id'], student['username'], False
+            sess['first_name'] = student['first_name']
+    timings['requests'] = {}
+    for path in routes:
+        row = {}
+        for label in ('first_ms', 'second_ms'):
+            start = time.perf_counter()
+            response = client.get(path)
+            row[label] = _elapsed_ms(start)
+            row['status'] = response.status_code
+        timings['requests'][path] = row
+    timings['lazy_modules_loaded'] = [name for name in LAZY_MODULES if name in sys.modules]
+    return timings
+
+def run(config, preload):
+    """Measures one cold start in a fresh interpreter, so nothing is already imported or cached."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run([sys.executable, '-m', 'startup', json.dumps({'config': config, 'preload': preload})],
+                               cwd=root, capture_output=True, text=True, check=False)
+    if completed.returncode != 0:
+        raise RuntimeError(f'Startup timing run failed:\n{completed.stderr}')
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    options = json.loads(sys.argv[1])
+    timings = measure(options['config'], options['preload'])
+    print(json.dumps(timings))
@@ -0,0 +1,144 @@
+import json
+
+# --- Per-Result Topic Breakdown and Per-Student Summary ---
+# Written by submit_quiz inside its write transaction: one row per (result, topic) with
+# the answered/correct counts, and one summary row per student with their overall
+# mastery, last few scores and latest result. The student dashboard, results page,
+# profile and ID card each read them back with a single indexed statement.
+# `flask rebuild-summaries` recomputes both from results, answers and mastery.
+
+RECENT_SCORES = 5
+
+def create_summary_tables(conn):
+    """Schema migration: creates and fills the breakdown and summary tables."""
+    conn.execute('''
+        CREATE TABLE result_topic_breakdown (
+            result_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            answered INTEGER NOT NULL,
+            correct INTEGER NOT NULL,
+            PRIMARY KEY (result_id, topic),
+            FOREIGN KEY (result_id) REFERENCES results (id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE student_summary (
+            user_id INTEGER PRIMARY KEY,
+            mastery_xp INTEGER NOT NULL DEFAULT 0,
+            mastery_topics INTEGER NOT NULL DEFAULT 0,
+            mastery_percentage REAL NOT NULL DEFAULT 0,
+            result_count INTEGER NOT NULL DEFAULT 0,
+            recent_scores TEXT NOT NULL DEFAULT '[]', -- JSON list of percentages, oldest first
+            latest_result_id INTEGER,
+            latest_score INTEGER,
+            latest_total INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    rebuild_summaries(conn)
+
+def _percentage(score, total_questions):
+    return score * 100.0 / total_questions if total_questions else 0
+
+def _mastery_percentage(xp, topics, xp_per_level):
+    return xp * 100.0 / (topics * xp_per_level) if topics else 0
+
+def rebuild_summaries(conn, xp_per_level=100):
+    conn.execute('DELETE FROM result_topic_breakdown')
+    conn.execute('DELETE FROM student_summary')
+    conn.execute('''
+        INSERT INTO result_topic_breakdown (result_id, topic, answered, correct)
+        SELECT sa.result_id, q.topic, COUNT(*), SUM(sa.is_correct)
+        FROM student_answers sa JOIN questions q ON q.id = sa.question_id
+        GROUP BY sa.result_id, q.topic
+    ''')
+
+    summaries = {}
+    for row in conn.execute('SELECT user_id, SUM(xp) AS xp, COUNT(*) AS topics FROM student_topic_mastery GROUP BY user_id'):
+        summaries[row['user_id']] = {'xp': row['xp'], 'topics': row['topics'], 'count': 0, 'recent': [], 'latest': None}
+    for row in conn.execute('SELECT id, user_id, score, total_questions FROM results ORDER BY user_id, timestamp, id'):
+        summary = summaries.setdefault(row['user_id'], {'xp': 0, 'topics': 0, 'count': 0, 'recent': [], 'latest': None})
+        summary['count'] += 1
+        summary['recent'] = (summary['recent'] + [_percentage(row['score'], row['total_questions'])])[-RECENT_SCORES:]
+        summary['latest'] = row
+
+    conn.executemany('''
+        INSERT INTO student_summary (user_id, mastery_xp, mastery_topics, mastery_percentage, result_count, recent_scores,
+                                     latest_result_id, latest_score, latest_total)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(user_id, s['xp'], s['topics'], _mastery_percentage(s['xp'], s['topics'], xp_per_level), s['count'], json.dumps(s['recent']),
+           s['latest']['id'] if s['latest'] else None, s['latest']['score'] if s['latest'] else None,
+           s['latest']['total_questions'] if s['latest'] else None)
+          for user_id, s in summaries.items()])
+
+# --- Incremental Maintenance ---
+def record_submission(conn, user_id, result_id, score, total_questions, topic_answers, xp_gained, new_topic_count, xp_per_level=100):
+    """Writes one result's topic breakdown and folds it into the student's summary row.
+
+    `topic_answers` maps topic -> (answered, correct); `new_topic_count` is the number of
+    topics this submission gave the student their first mastery XP in.
+    """
+    conn.executemany('INSERT INTO result_topic_breakdown (result_id, topic, answered, correct) VALUES (?, ?, ?, ?)',
+                     [(result_id, topic, answered, correct) for topic, (answered, correct) in topic_answers.items()])
+
+    previous = conn.execute(SUMMARY_ROW_QUERY, (user_id,)).fetchone()
+    xp, topics, count, recent = (previous['mastery_xp'], previous['mastery_topics'], previous['result_count'],
+                                 json.loads(previous['recent_scores'])) if previous else (0, 0, 0, [])
+    xp += xp_gained
+    topics += new_topic_count
+    recent = (recent + [_percentage(score, total_questions)])[-RECENT_SCORES:]
+    conn.execute('''
+        INSERT OR REPLACE INTO student_summary (user_id, mastery_xp, mastery_topics, mastery_percentage, result_count, recent_scores,
+                                                latest_result_id, latest_score, latest_total)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, xp, topics, _mastery_percentage(xp, topics, xp_per_level), count + 1, json.dumps(recent),
+          result_id, score, total_questions))
+
+# --- Reads ---
+_BREAKDOWN_JSON = '''(SELECT json_group_array(json_object('topic', topic, 'answered', answered, 'correct', correct))
+                      FROM result_topic_breakdown WHERE result_id = {result_id})'''
+
+_ACHIEVEMENTS_JSON = '''(SELECT json_group_array(json_object('name', a.name, 'icon', a.icon))
+                         FROM student_achievements sa JOIN achievements a ON a.id = sa.achievement_id
+                         WHERE sa.user_id = u.id)'''
+
+STUDENT_QUERY = f'''
+    SELECT u.*, COALESCE(s.mastery_percentage, 0) AS mastery_percentage, COALESCE(s.result_count, 0) AS result_count,
+           COALESCE(s.recent_scores, '[]') AS recent_scores, s.latest_result_id, s.latest_score, s.latest_total,
+           {_BREAKDOWN_JSON.format(result_id='s.latest_result_id')} AS latest_breakdown,
+           {_ACHIEVEMENTS_JSON} AS achievements
+    FROM users u LEFT JOIN student_summary s ON s.user_id = u.id
+'''
+STUDENT_BY_ID_QUERY = STUDENT_QUERY + ' WHERE u.id = ?'
+STUDENT_BY_CODE_QUERY = STUDENT_QUERY + ' WHERE u.student_code = ?'
+SUMMARY_ROW_QUERY = 'SELECT mastery_xp, mastery_topics, result_count, recent_scores FROM student_summary WHERE user_id = ?'
+
+# `results` is the table to read: archive.py passes an attached archive's results table
+def result_query(results='results'):
+    return f'SELECT r.*, {_BREAKDOWN_JSON.format(result_id="r.id")} AS breakdown FROM {results} r WHERE r.id = ? AND r.user_id = ?'
+
+RESULT_QUERY = result_query()
+
+def _decode_student(row):
+    if row is None: return None
+    student = dict(row)
+    student['recent_scores'] = json.loads(student['recent_scores'])
+    student['latest_breakdown'] = json.loads(student['latest_breakdown'] or '[]')
+    student['achievements'] = json.loads(student['achievements'] or '[]')
+    return student
+
+def get_student(conn, user_id):
+    """Returns the user row merged with their summary, latest breakdown and achievements."""
+    return _decode_student(conn.execute(STUDENT_BY_ID_QUERY, (user_id,)).fetchone())
+
+def get_student_by_code(conn, student_code):
+    return _decode_student(conn.execute(STUDENT_BY_CODE_QUERY, (student_code,)).fetchone())
+
+def get_result(conn, result_id, user_id, results='results'):
+    """Returns (result row, topic breakdown) for one of the user's results, or (None, None).
+
+    Breakdowns are never archived, so `results` may name an attached archive's table.
+    """
+    row = conn.execute(result_query(results), (result_id, user_id)).fetchone()
+    if row is None: return None, None
+    return row, json.loads(row['breakdown'] or '[]')
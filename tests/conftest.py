@@ -0,0 +1,60 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as appmod
+import db
+
+@pytest.fixture
+def app(tmp_path):
+    app = appmod.create_app({
+        'TESTING': True,
+        'DATABASE': str(tmp_path / 'pypath.db'),
+        'SECRET_KEY': 'test',
+        'SESSION_BACKEND': 'cookie',
+        'BCRYPT_ROUNDS': 4,
+        'ACHIEVEMENTS_ASYNC': False,
+        'JINJA_CACHE_DIR': str(tmp_path / 'jinja_cache'),
+        'ARCHIVE_DIRECTORY': str(tmp_path / 'archive'),
+    })
+    appmod.init_db(app)
+    yield app
+    db.get_pool(app.config['DATABASE']).close_all()
+
+@pytest.fixture
+def conn(app):
+    with app.app_context():
+        yield appmod.get_db_connection()
+
+@pytest.fixture
+def make_student(app):
+    """Creates a student the way /register does and returns (signed-in test client, user id)."""
+    def make(username):
+        with app.app_context():
+            conn = appmod.get_db_connection()
+            with db.transaction(conn):
+                user_id = conn.execute('INSERT INTO users (username, password, student_code, first_name, last_name) VALUES (?, ?, ?, ?, ?)',
+                                       (username, 'unused', f'{username}-code', username.title(), 'Student')).lastrowid
+                appmod.rankings.update_rank(conn, user_id, 1, 0, appmod.XP_TO_LEVEL_UP)
+                appmod.rollups.record_student(conn)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'], sess['username'], sess['is_admin'], sess['first_name'] = user_id, username, False, username.title()
+        return client, user_id
+    return make
+
+def submit(app, client, set_id, correct=None):
+    """Submits a quiz, answering the first `correct` multiple choice questions right (all by default)."""
+    with app.app_context():
+        answer_key = appmod.quiz_cache.get_answer_key(appmod.get_db_connection(), set_id)
+    choices = [q for q in answer_key if q['question_type'] == 'multiple_choice']
+    form = {}
+    for i, q in enumerate(choices):
+        right = correct is None or i < correct
+        form[f'question_{q["id"]}'] = q['correct_answer'] if right else next(c for c in 'ABCD' if c != q['correct_answer'])
+    client.get(f'/quiz/{set_id}')
+    response = client.post(f'/submit_quiz/{set_id}', data=form)
+    assert response.status_code == 302, response.data
+    return int(response.headers['Location'].rsplit('/', 1)[1])
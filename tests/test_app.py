@@ -0,0 +1,72 @@
+import flask
+import app as appmod
+import db
+import grading
+import quiz_cache
+
+def _build(tmp_path, name, first_question):
+    """A fully initialised app with its own database and secret key; set 1 opens with `first_question`."""
+    app = appmod.create_app({
+        'TESTING': True,
+        'DATABASE': str(tmp_path / f'{name}.db'),
+        'SECRET_KEY': f'{name}-secret',
+        'SESSION_BACKEND': 'cookie',
+        'JINJA_CACHE_DIR': str(tmp_path / 'jinja_cache'),
+        'QUIZ_CACHE_DIR': str(tmp_path / 'quiz_cache'), # Shared, as workers of different sites on one host might
+    })
+    appmod.init_db(app)
+    with app.app_context():
+        conn = appmod.get_db_connection()
+        conn.execute('UPDATE questions SET question_text = ? WHERE id = 1', (first_question,))
+        conn.commit()
+    return app
+
+def _signed_in(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'], sess['username'], sess['is_admin'], sess['first_name'] = 1, 'admin', False, 'Admin'
+    return client
+
+def test_two_apps_in_one_process_stay_independent(tmp_path):
+    north, south = _build(tmp_path, 'north', 'Asked only in the north'), _build(tmp_path, 'south', 'Asked only in the south')
+    try:
+        north_client, south_client = _signed_in(north), _signed_in(south)
+        for _ in range(2): # The second round is served from the quiz cache
+            north_page, south_page = north_client.get('/quiz/1'), south_client.get('/quiz/1')
+            assert b'Asked only in the north' in north_page.data and b'Asked only in the south' not in north_page.data
+            assert b'Asked only in the south' in south_page.data and b'Asked only in the north' not in south_page.data
+
+        # A session signed by one app is not accepted by the other
+        stranger = south.test_client()
+        stranger.set_cookie(north.config['SESSION_COOKIE_NAME'], north_client.get_cookie(north.config['SESSION_COOKIE_NAME']).value)
+        assert stranger.get('/quiz/1').status_code == 302
+    finally:
+        for app in (north, south):
+            db.get_pool(app.config['DATABASE']).close_all()
+
+def test_preload_warms_the_quiz_cache_outside_a_request(tmp_path, monkeypatch):
+    monkeypatch.setattr(grading, 'check_isolation', lambda: None) # Covered by test_grading
+    app = appmod.create_app({
+        'TESTING': True,
+        'DATABASE': str(tmp_path / 'pypath.db'),
+        'SECRET_KEY': 'test',
+        'SESSION_BACKEND': 'cookie',
+        'JINJA_CACHE_DIR': str(tmp_path / 'jinja_cache'),
+    })
+    quiz_cache.clear()
+    assert not flask.has_request_context()
+    appmod.preload(app)
+    assert db.get_pool(app.config['DATABASE']).idle_count() == 0
+
+    with app.app_context():
+        conn = appmod.get_db_connection()
+        set_ids = [row['id'] for row in conn.execute('SELECT id FROM question_sets')]
+        assert set_ids and quiz_cache.size() == len(set_ids)
+        # Already rendered, so the first student to open each set skips the template
+        monkeypatch.setattr(quiz_cache, 'render_template', None)
+        for set_id in set_ids:
+            set_info, fragment = quiz_cache.get_quiz_fragment(conn, set_id)
+            assert set_info['id'] == set_id and fragment
+    response = _signed_in(app).get(f'/quiz/{set_ids[0]}')
+    assert response.status_code == 200 and quiz_cache.size() == len(set_ids)
+    db.get_pool(app.config['DATABASE']).close_all()
@@ -0,0 +1,6 @@
+import archive
+
+def test_new_database_uses_incremental_auto_vacuum(conn):
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert archive.maintain(conn)['converted'] is False
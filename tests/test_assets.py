@@ -0,0 +1,61 @@
+import gzip
+import hashlib
+import pytest
+import assets
+
+SCRIPT = b'console.log("pypath");\n' * 50
+
+@pytest.fixture
+def built(app, tmp_path, monkeypatch):
+    """Builds one script into a temporary asset directory; returns its fingerprinted filename."""
+    monkeypatch.setattr(assets, '_asset_dir', lambda app: str(tmp_path))
+    monkeypatch.setattr(assets, '_fetch', lambda url: SCRIPT)
+    manifest, failures = assets.build(app, {'app.js': 'https://cdn.example/app.js'})
+    assert failures == {}
+    yield manifest['app.js']
+    assets._manifests.pop(app.root_path, None)
+
+def test_build_fingerprints_and_precompresses(app, built, tmp_path):
+    assert built == f'app.{hashlib.sha256(SCRIPT).hexdigest()[:12]}.js'
+    assert gzip.decompress((tmp_path / (built + '.gz')).read_bytes()) == SCRIPT
+    with app.test_request_context():
+        assert assets.asset_url('app.js') == f'/assets/{built}'
+        assert assets.asset_url('chart.js') == assets.SOURCES['chart.js'] # Not built: still the CDN
+
+def test_asset_encoding_follows_accept_encoding(app, built, tmp_path):
+    (tmp_path / (built + '.br')).write_bytes(b'brotli bytes')
+    client = app.test_client()
+    fingerprint = built.split('.')[1]
+    for accept, encoding, body in (('br, gzip', 'br', b'brotli bytes'), ('gzip', 'gzip', None), ('identity', None, SCRIPT)):
+        response = client.get(f'/assets/{built}', headers={'Accept-Encoding': accept})
+        assert response.status_code == 200
+        assert response.headers.get('Content-Encoding') == encoding
+        assert response.get_etag()[0] == fingerprint + (f'-{encoding}' if encoding else '')
+        assert 'immutable' in response.headers['Cache-Control'] and 'Accept-Encoding' in response.headers['Vary']
+        if body is not None:
+            assert response.data == body
+        else:
+            assert gzip.decompress(response.data) == SCRIPT
+
+def test_matching_asset_etag_is_not_modified(app, built):
+    client = app.test_client()
+    etag = client.get(f'/assets/{built}', headers={'Accept-Encoding': 'gzip'}).get_etag()[0]
+    response = client.get(f'/assets/{built}', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304 and response.data == b''
+
+def test_manifest_and_unknown_files_are_not_served(app, built):
+    client = app.test_client()
+    assert client.get(f'/assets/{assets.MANIFEST_NAME}').status_code == 404
+    assert client.get('/assets/missing.js').status_code == 404
+
+def test_matching_id_card_etag_is_not_modified(app, conn):
+    client = app.test_client()
+    code = conn.execute('SELECT student_code FROM users WHERE id = 1').fetchone()[0]
+    first = client.get(f'/id_card/{code}')
+    assert first.status_code == 200
+    etag = first.get_etag()[0]
+    response = client.get(f'/id_card/{code}', headers={'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304 and response.data == b''
+    conn.execute('UPDATE users SET first_name = ? WHERE id = 1', ('Changed',))
+    conn.commit()
+    assert client.get(f'/id_card/{code}', headers={'If-None-Match': f'"{etag}"'}).status_code == 200
@@ -0,0 +1,75 @@
+import time
+import types
+import bcrypt
+import pytest
+import auth
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fresh rate limit buckets on a clock the test advances by hand."""
+    now = [1000.0]
+    monkeypatch.setattr(auth, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    monkeypatch.setattr(auth, 'ip_limiter', auth.TokenBucket(*auth.IP_RATE_LIMIT))
+    monkeypatch.setattr(auth, 'username_limiter', auth.TokenBucket(*auth.USERNAME_RATE_LIMIT))
+    return now
+
+@pytest.fixture
+def student(conn):
+    # Hashed below the app's BCRYPT_ROUNDS, as if stored before the cost was raised
+    hashed = bcrypt.hashpw(b'correct horse', bcrypt.gensalt(4)).decode('utf-8')
+    conn.execute('INSERT INTO users (username, password, student_code, first_name, last_name) VALUES (?, ?, ?, ?, ?)',
+                 ('ada', hashed, 'ada-code', 'Ada', 'Student'))
+    conn.commit()
+    return hashed
+
+def _login(client, password, username='ada', ip='10.0.0.1'):
+    return client.post('/login', data={'username': username, 'password': password}, environ_base={'REMOTE_ADDR': ip})
+
+def test_username_bucket_limits_guessing_one_account(app, student, clock):
+    client = app.test_client()
+    capacity = auth.USERNAME_RATE_LIMIT[0]
+    for i in range(capacity):
+        assert _login(client, 'wrong', ip=f'10.0.1.{i}').status_code == 200
+    assert _login(client, 'wrong', ip='10.0.2.1').status_code == 429
+    assert _login(client, 'wrong', username='ADA', ip='10.0.2.2').status_code == 429
+    assert _login(client, 'wrong', username='grace', ip='10.0.2.3').status_code == 200
+
+def test_ip_bucket_limits_one_address(app, student, clock):
+    client = app.test_client()
+    for i in range(auth.IP_RATE_LIMIT[0]):
+        assert auth.allow_attempt('10.0.0.9')
+    assert _login(client, 'correct horse', ip='10.0.0.9').status_code == 429
+    assert _login(client, 'correct horse', ip='10.0.0.10').status_code == 302
+
+def test_buckets_refill_over_time(clock):
+    bucket = auth.TokenBucket(2, 0.5)
+    assert bucket.consume('key') and bucket.consume('key')
+    assert not bucket.consume('key')
+    clock[0] += 1.9
+    assert not bucket.consume('key')
+    clock[0] += 0.1
+    assert bucket.consume('key')
+    clock[0] += 3600
+    assert bucket.consume('key') and bucket.consume('key') and not bucket.consume('key')
+
+def test_full_hash_queue_turns_logins_away(app, student, clock, monkeypatch):
+    monkeypatch.setattr(auth, '_pending', auth.AUTH_MAX_QUEUE)
+    assert _login(app.test_client(), 'correct horse').status_code == 503
+    with app.app_context(), pytest.raises(auth.AuthBusy):
+        auth.hash_password('anything')
+
+def test_queue_depth_returns_to_zero(app):
+    with app.app_context():
+        auth.check_password('x', auth.hash_password('x'))
+    # The pool thread releases its slot just after handing back the result
+    deadline = time.monotonic() + 1
+    while auth.get_queue_depth() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert auth.get_queue_depth() == 0
+
+def test_login_upgrades_a_weaker_hash(app, conn, student, clock):
+    app.config['BCRYPT_ROUNDS'] = 5
+    assert _login(app.test_client(), 'correct horse').status_code == 302
+    stored = conn.execute('SELECT password FROM users WHERE username = ?', ('ada',)).fetchone()[0]
+    stored = stored.encode('utf-8') if isinstance(stored, str) else stored
+    assert stored.startswith(b'$2b$05$') and bcrypt.checkpw(b'correct horse', stored)
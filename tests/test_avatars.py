@@ -0,0 +1,70 @@
+import base64
+import hashlib
+import os
+import sqlite3
+import struct
+import zlib
+import pytest
+import avatars
+
+def _png(rgb):
+    """A valid 1x1 PNG of one colour."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(b'\x00' + bytes(rgb))) + chunk(b'IEND', b''))
+
+def _data_url(raw):
+    return 'data:image/png;base64,' + base64.b64encode(raw).decode('ascii')
+
+@pytest.fixture
+def avatar_dir(app, tmp_path):
+    app.config['AVATAR_DIR'] = str(tmp_path / 'avatars')
+    return tmp_path / 'avatars'
+
+def _stored_files(avatar_dir):
+    return sorted(os.path.relpath(os.path.join(root, name), avatar_dir) for root, _, names in os.walk(avatar_dir) for name in names)
+
+def test_identical_uploads_share_one_blob(app, conn, make_student, avatar_dir):
+    red, blue = _data_url(_png((255, 0, 0))), _data_url(_png((0, 0, 255)))
+    urls = []
+    for name, image in (('ada', red), ('grace', red), ('linus', blue)):
+        client, _ = make_student(name)
+        response = client.post('/update_profile_image', json={'image': image})
+        assert response.get_json()['success']
+        urls.append(response.get_json()['url'])
+    assert urls[0] == urls[1] != urls[2]
+    hashes = [row[0] for row in conn.execute('SELECT profile_image_hash FROM users WHERE profile_image_hash IS NOT NULL ORDER BY id')]
+    assert hashes[0] == hashes[1] and len(set(hashes)) == 2
+    assert len(_stored_files(avatar_dir)) == 2
+
+def test_blobs_fan_out_by_hash_prefix(app, avatar_dir):
+    raw = _png((0, 128, 0))
+    with app.app_context():
+        avatar_hash = avatars.store_avatar(_data_url(raw))
+    assert avatar_hash == hashlib.sha256(raw).hexdigest()
+    assert _stored_files(avatar_dir) == [os.path.join(avatar_hash[:2], f'{avatar_hash}.png')]
+
+    response = app.test_client().get(f'/avatar/{avatar_hash}')
+    assert response.status_code == 200 and response.mimetype == 'image/png'
+    assert 'immutable' in response.headers['Cache-Control'] and response.get_etag()[0] == avatar_hash
+    assert app.test_client().get(f'/avatar/{"0" * 64}').status_code == 404
+
+def test_migration_moves_inline_images_into_the_store(app, avatar_dir, tmp_path):
+    conn = sqlite3.connect(tmp_path / 'legacy.db')
+    conn.row_factory = sqlite3.Row
+    with app.open_resource('schema.sql', mode='r') as f:
+        conn.executescript(f.read())
+    raw = _png((10, 20, 30))
+    users = [('ada', _data_url(raw)), ('grace', base64.b64encode(raw).decode('ascii')), ('linus', 'not an image'), ('alan', None)]
+    conn.executemany("INSERT INTO users (username, password, student_code, first_name, last_name, profile_image) VALUES (?, 'x', ?, 'A', 'B', ?)",
+                     [(name, f'{name}-code', image) for name, image in users])
+    with app.app_context():
+        avatars.move_profile_images_to_store(conn)
+    stored = dict(conn.execute('SELECT username, profile_image_hash FROM users WHERE username IN (?, ?, ?, ?)', [u for u, _ in users]).fetchall())
+    expected = hashlib.sha256(raw).hexdigest()
+    assert stored == {'ada': expected, 'grace': expected, 'linus': None, 'alan': None}
+    assert _stored_files(avatar_dir) == [os.path.join(expected[:2], f'{expected}.png')]
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(users)')}
+    assert 'profile_image' not in columns or conn.execute('SELECT COUNT(profile_image) FROM users').fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,15 @@
+import app as appmod
+import awards
+from conftest import submit
+
+def test_admins_earn_no_achievements(app, conn):
+    admin = app.test_client()
+    with admin.session_transaction() as sess:
+        sess['user_id'], sess['username'], sess['is_admin'], sess['first_name'] = 1, 'admin', True, 'Admin'
+    submit(app, admin, 1)
+    conn.execute('UPDATE users SET level = 10 WHERE id = 1')
+    conn.execute('INSERT OR REPLACE INTO student_topic_mastery (user_id, topic, xp) VALUES (1, ?, 500)', ('Loops',))
+    assert conn.execute('SELECT COUNT(*) FROM achievement_events').fetchone()[0] == 0
+    awards.backfill(conn, appmod.PASSING_THRESHOLD)
+    assert conn.execute('SELECT COUNT(*) FROM student_achievements WHERE user_id = 1').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM achievement_progress WHERE user_id = 1').fetchone()[0] == 0
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import pytest
+import db
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = db.ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+    yield pool
+    pool.close_all()
+
+def test_most_recently_released_connection_is_reused_first(pool):
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.acquire() is second
+    assert pool.acquire() is first
+    assert pool.idle_count() == 0
+
+def test_release_beyond_size_closes_the_extra_connection(pool):
+    conns = [pool.acquire() for _ in range(3)]
+    for conn in conns:
+        pool.release(conn)
+    assert pool.idle_count() == 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        conns[2].execute('SELECT 1')
+
+def test_release_rolls_back_an_open_transaction(pool):
+    conn = pool.acquire()
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.execute('INSERT INTO t VALUES (1)')
+    assert conn.in_transaction
+    pool.release(conn)
+    reused = pool.acquire()
+    assert reused is conn and not reused.in_transaction
+    assert reused.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+
+def test_forked_process_starts_with_an_empty_pool(pool):
+    inherited = pool.acquire()
+    pool.release(inherited)
+    pool._pid = os.getpid() + 1 # As if this process had been forked after the pool filled
+    conn = pool.acquire()
+    assert conn is not inherited and pool.idle_count() == 0
+    assert pool._pid == os.getpid()
+    pool.release(conn)
+    inherited.close()
+
+def test_close_all_empties_and_closes_idle_connections(pool):
+    conns = [pool.acquire() for _ in range(2)]
+    for conn in conns:
+        pool.release(conn)
+    pool.close_all()
+    assert pool.idle_count() == 0
+    for conn in conns:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+def test_transaction_commits_or_rolls_back(pool):
+    conn = pool.acquire()
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    with db.transaction(conn):
+        conn.execute('INSERT INTO t VALUES (1)')
+    with pytest.raises(ZeroDivisionError), db.transaction(conn):
+        conn.execute('INSERT INTO t VALUES (2)')
+        1 / 0
+    assert [row[0] for row in conn.execute('SELECT x FROM t')] == [1]
+    pool.release(conn)
+
+def test_transaction_refuses_pending_changes(pool):
+    conn = pool.acquire()
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.execute('INSERT INTO t VALUES (1)')
+    with pytest.raises(RuntimeError):
+        with db.transaction(conn):
+            pass
+    assert conn.in_transaction # The caller's pending insert is left for it to commit or roll back
+    conn.rollback()
+    assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    pool.release(conn)
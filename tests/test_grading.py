@@ -0,0 +1,61 @@
+import os
+import pytest
+import app as appmod
+import grading
+
+ESCAPE = '''
+for cls in ().__class__.__base__.__subclasses__():
+    if cls.__name__ == '_wrap_close':
+        os = cls.__init__.__globals__['sys'].modules['os']
+print(os.getuid() != 0)
+try:
+    os.open({path!r}, os.O_RDONLY)
+    print('readable')
+except OSError:
+    print('unreachable')
+'''
+
+@pytest.fixture(scope='module')
+def isolated():
+    error = grading.check_isolation()
+    if error is not None:
+        pytest.skip(f'The grading sandbox cannot be isolated on this host: {error}')
+
+def test_grades_stdout_against_expected_output(isolated):
+    results = grading.grade_code_answers([('ok', 'import math\nprint(math.sqrt(16))', '4.0'), ('wrong', 'print(5)', '4')])
+    assert results['ok']['passed'] and results['ok']['error'] is None
+    assert not results['wrong']['passed']
+
+def test_escaped_submission_cannot_reach_the_app_files(isolated):
+    path = os.path.abspath(grading.__file__)
+    outcome = grading.grade_code_answers([(1, ESCAPE.format(path=path), 'True\nunreachable')])[1]
+    assert outcome['passed'], outcome
+
+def test_runaway_submission_is_stopped(isolated):
+    outcome = grading.grade_code_answers([(1, 'while True:\n    pass', '')])[1]
+    assert not outcome['passed']
+    assert 'limit exceeded' in outcome['error']
+
+class _UnisolatedPool:
+    def apply_async(self, func, args):
+        return self
+
+    def get(self, timeout=None):
+        return {'output': '', 'error': 'Code grading is unavailable: the sandbox could not be isolated (EPERM)', 'unavailable': True}
+
+def test_unisolated_sandbox_refuses_the_submission(app, conn, make_student, monkeypatch):
+    monkeypatch.setattr(grading, 'get_grading_pool', _UnisolatedPool)
+    client, user_id = make_student('ada')
+    refused = grading.refused_count()
+    client.get('/quiz/1')
+    response = client.post('/submit_quiz/1', data={'question_13': 'print("Hello, World!")'})
+    assert response.status_code == 503
+    assert grading.refused_count() == refused + 1
+    assert conn.execute('SELECT COUNT(*) FROM results WHERE user_id = ?', (user_id,)).fetchone()[0] == 0
+
+def test_preload_refuses_to_start_without_isolation(app, monkeypatch):
+    monkeypatch.setattr(grading, 'check_isolation', lambda: 'unshare: Operation not permitted')
+    with pytest.raises(RuntimeError, match='cannot be isolated'):
+        appmod.preload(app)
+    app.config['GRADING_ALLOW_UNISOLATED'] = True
+    appmod.preload(app)
@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+import archive
+import history
+from conftest import submit
+
+def test_attempt_numbers_continue_after_archiving(app, conn, make_student):
+    client, user_id = make_student('ada')
+    submit(app, client, 1)
+    submit(app, client, 1)
+    moved = archive.archive_results(conn, app.config['ARCHIVE_DIRECTORY'], date.today() + timedelta(days=1))
+    assert sum(moved.values()) == 2
+    result_id = submit(app, client, 1)
+    attempt = conn.execute('SELECT attempt_number FROM results WHERE id = ?', (result_id,)).fetchone()[0]
+    assert attempt == 3
+
+def _plan(conn, sql, params):
+    return ' / '.join(row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+
+def test_admin_history_pages_walk_the_timestamp_index(conn):
+    first = history.ADMIN_HISTORY_QUERY + history.HISTORY_ORDER + history.PAGE_LIMIT
+    later = history.ADMIN_HISTORY_QUERY + history.KEYSET_FILTER + history.HISTORY_ORDER + history.PAGE_LIMIT
+    for sql, params in ((first, (51,)), (later, ('2024-01-01', 1, 51))):
+        plan = _plan(conn, sql, params)
+        assert 'idx_results_timestamp_id' in plan and 'TEMP B-TREE' not in plan, plan
+
+def test_admin_history_pages_match_a_full_sort(app, conn, make_student):
+    for name in ('ada', 'grace', 'linus'):
+        client, _ = make_student(name)
+        for _ in range(3):
+            submit(app, client, 1)
+    expected = [row['result_id'] for row in history.iter_admin_history(conn)]
+    paged, cursor = [], None
+    while True:
+        rows, cursor = history.get_admin_page(conn, before=cursor, page_size=4)
+        paged += [row['result_id'] for row in rows]
+        if cursor is None:
+            break
+    assert paged == expected and len(paged) == 9
@@ -0,0 +1,26 @@
+import item_analysis
+import migrations
+
+def _blank_answers(conn, question_id=1):
+    user_id = conn.execute("INSERT INTO users (username, password, student_code, first_name, last_name) "
+                           "VALUES ('blank', 'x', 'blank-code', 'Blank', 'Student')").lastrowid
+    result_id = conn.execute("INSERT INTO results (user_id, set_id, score, total_questions, time_start, timestamp) "
+                             "VALUES (?, 1, 0, 1, '2024-01-01 10:00:00', '2024-01-01 10:05:00')", (user_id,)).lastrowid
+    conn.execute('INSERT INTO student_answers (result_id, question_id, user_answer, is_correct) VALUES (?, ?, NULL, 0)',
+                 (result_id, question_id))
+    conn.commit()
+
+def test_rebuild_counts_a_question_whose_answers_are_all_blank(conn):
+    _blank_answers(conn)
+    item_analysis.rebuild_item_analysis(conn)
+    row = conn.execute('SELECT * FROM item_stats WHERE question_id = 1').fetchone()
+    assert (row['responses'], row['correct'], row['omitted']) == (1, 0, 1)
+    assert (row['choice_a'], row['choice_b'], row['choice_c'], row['choice_d']) == (0, 0, 0, 0)
+
+def test_item_analysis_migration_applies_over_blank_answers(conn):
+    _blank_answers(conn)
+    conn.execute('DROP TABLE item_stats')
+    conn.execute('DROP TABLE topic_stats')
+    step = dict((version, step) for version, _, step in migrations.MIGRATIONS)[9]
+    step(conn)
+    assert conn.execute('SELECT omitted FROM item_stats WHERE question_id = 1').fetchone()[0] == 1
@@ -0,0 +1,73 @@
+import io
+import json
+import pytest
+import app as appmod
+import awards
+import item_analysis
+import question_bank
+import rankings
+import rollups
+import summaries
+from conftest import submit
+
+# Tables submit_quiz maintains incrementally must hold exactly what their rebuild computes
+
+def snapshot(conn, sql):
+    return sorted(tuple(round(v, 9) if isinstance(v, float) else v for v in row) for row in conn.execute(sql))
+
+def assert_rebuild_matches(conn, rebuild, queries):
+    before = [snapshot(conn, sql) for sql in queries]
+    rebuild(conn)
+    assert [snapshot(conn, sql) for sql in queries] == before
+
+@pytest.fixture
+def cohort(app, make_student):
+    """Students with tied, rising, failing and no scores; coding questions are always left blank."""
+    for name, scores in (('ada', (12, 12, 3)), ('grace', (12, 12)), ('linus', (0, 7, 12, 12, 12)), ('alan', (12, 12)),
+                         ('barbara', (0,)), ('edsger', ())):
+        client, _ = make_student(name)
+        for correct in scores:
+            submit(app, client, 1, correct)
+
+def test_leaderboard_matches_rebuild(conn, cohort):
+    assert_rebuild_matches(conn, lambda c: rankings.rebuild_leaderboard(c, appmod.XP_TO_LEVEL_UP), ['SELECT * FROM leaderboard'])
+
+def test_rollups_match_rebuild(conn, cohort):
+    tables = ('student_score_rollup', 'set_rollup', 'topic_rollup', 'analytics_totals')
+    assert_rebuild_matches(conn, lambda c: rollups.rebuild_rollups(c, appmod.PASSING_THRESHOLD), [f'SELECT * FROM {t}' for t in tables])
+
+def test_summaries_match_rebuild(conn, cohort):
+    assert_rebuild_matches(conn, lambda c: summaries.rebuild_summaries(c, appmod.XP_TO_LEVEL_UP),
+                           ['SELECT * FROM student_summary', 'SELECT * FROM result_topic_breakdown'])
+
+def test_content_hashes_match_recomputed(app, conn):
+    admin = app.test_client()
+    with admin.session_transaction() as sess:
+        sess['user_id'], sess['username'], sess['is_admin'], sess['first_name'] = 1, 'admin', True, 'Admin'
+    rows = [
+        {'question_type': 'multiple_choice', 'topic': 'Loops', 'question_text': 'Which keyword exits a loop early?',
+         'option_a': 'break', 'option_b': 'stop', 'option_c': 'exit', 'option_d': 'return', 'correct_answer': 'A'},
+        {'question_type': 'multiple_choice', 'topic': 'loops', 'question_text': '  which keyword  exits a loop early? ',
+         'option_a': 'break', 'option_b': 'stop', 'option_c': 'exit', 'option_d': 'return', 'correct_answer': 'A'},
+    ]
+    upload = io.BytesIO('\n'.join(json.dumps(row) for row in rows).encode('utf-8'))
+    response = admin.post('/admin/questions/import', data={'file': (upload, 'questions.jsonl'), 'new_set_title': 'Imported'})
+    assert response.status_code == 302
+    admin.post('/admin/questions/add', data=dict(rows[0], question_text='Which keyword skips to the next iteration?'))
+    admin.post('/admin/questions/edit/1', data={'question_text': 'What does `print(2 ** 4)` output?', 'topic': 'Operators'})
+
+    stored = conn.execute(f'SELECT id, content_hash, {", ".join(question_bank.COLUMNS)} FROM questions').fetchall()
+    assert len(stored) == 16
+    assert [row['content_hash'] for row in stored] == [question_bank.content_hash(dict(row)) for row in stored]
+
+def test_item_analysis_matches_rebuild(conn, cohort):
+    assert_rebuild_matches(conn, item_analysis.rebuild_item_analysis, ['SELECT * FROM item_stats', 'SELECT * FROM topic_stats'])
+
+def test_achievements_match_backfill(conn, cohort):
+    earned = 'SELECT user_id, achievement_id FROM student_achievements'
+    def backfill(c):
+        c.execute('DELETE FROM student_achievements')
+        awards.backfill(c, appmod.PASSING_THRESHOLD)
+    assert_rebuild_matches(conn, backfill, [earned, 'SELECT * FROM achievement_progress'])
+    codes = snapshot(conn, 'SELECT a.code FROM student_achievements sa JOIN achievements a ON a.id = sa.achievement_id')
+    assert ('rising-star',) in codes and ('hot-streak',) in codes
@@ -0,0 +1,7 @@
+def test_metrics_token(app):
+    app.config['METRICS_TOKEN'] = 's3cret'
+    client = app.test_client()
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 302
+    # Werkzeug decodes header bytes as latin-1, so any client can send non-ASCII here
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3crét'.encode('utf-8').decode('latin-1')}).status_code == 302
@@ -0,0 +1,15 @@
+import app as appmod
+import migrations
+
+def test_hot_queries_use_indexes(conn):
+    assert migrations.find_full_scans(conn, {**migrations.HOT_QUERIES, **appmod.ROUTE_QUERIES}) == []
+
+def test_temp_b_tree_sorts_are_flagged(conn):
+    sorted_by_question = migrations.HotQuery(
+        'SELECT q.* FROM questions q JOIN set_questions sq ON q.id = sq.question_id WHERE sq.set_id = ? ORDER BY q.id', (1,))
+    offenders = migrations.find_full_scans(conn, {'sort': sorted_by_question})
+    assert [detail for _, detail in offenders if detail.startswith('USE TEMP B-TREE')]
+
+def test_unused_leaderboard_index_is_dropped(conn):
+    indexes = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'users'")}
+    assert 'idx_users_leaderboard' not in indexes
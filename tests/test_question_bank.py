@@ -0,0 +1,35 @@
+import io
+import question_bank
+
+HEADER = ','.join(question_bank.COLUMNS)
+VALID = 'multiple_choice,Loops,Which keyword exits a loop early?,break,stop,exit,return,A,'
+
+def _admin(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'], sess['username'], sess['is_admin'], sess['first_name'] = 1, 'admin', True, 'Admin'
+    return client
+
+def _import(client, text):
+    return client.post('/admin/questions/import', data={'file': (io.BytesIO(text.encode('utf-8')), 'questions.csv')})
+
+def _flashes(client):
+    with client.session_transaction() as sess:
+        return [message for _, message in sess.get('_flashes', [])]
+
+def test_oversized_csv_field_is_reported_per_line(app, conn):
+    client = _admin(app)
+    huge = 'multiple_choice,Loops,' + 'x' * 200000 + ',a,b,c,d,A,'
+    response = _import(client, '\n'.join((HEADER, huge, VALID)) + '\n')
+    assert response.status_code == 302
+    flashes = _flashes(client)
+    assert flashes[0].startswith('Imported 1 new questions from 2 rows') and '1 invalid' in flashes[0]
+    assert flashes[1].startswith('line 2: invalid CSV (field larger than field limit')
+    assert conn.execute('SELECT COUNT(*) FROM questions WHERE question_text = ?', ('Which keyword exits a loop early?',)).fetchone()[0] == 1
+
+def test_flashed_import_errors_are_capped(app):
+    client = _admin(app)
+    _import(client, '\n'.join([HEADER] + ['bogus,Loops,text,a,b,c,d,A,'] * 200) + '\n')
+    flashes = _flashes(client)
+    assert len(flashes) == 1 + question_bank.MAX_REPORTED_ERRORS + 1
+    assert flashes[-1] == f'...and {200 - question_bank.MAX_REPORTED_ERRORS} more invalid rows.'
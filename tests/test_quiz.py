@@ -0,0 +1,38 @@
+import app as appmod
+
+def test_submitting_an_unknown_set_is_not_found(conn, make_student):
+    client, user_id = make_student('ada')
+    response = client.post('/submit_quiz/999', data={})
+    assert response.status_code == 404
+    assert conn.execute('SELECT COUNT(*) FROM results WHERE user_id = ?', (user_id,)).fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM attempt_counts WHERE user_id = ?', (user_id,)).fetchone()[0] == 0
+
+def _first_question(app):
+    with app.app_context():
+        return appmod.quiz_cache.get_quiz(appmod.get_db_connection(), 1)['questions'][0]['question_text']
+
+def _rewrite_first_question(app, text):
+    # Changed behind the cache's back, so the set keeps version 1
+    with app.app_context():
+        conn = appmod.get_db_connection()
+        conn.execute('UPDATE questions SET question_text = ? WHERE id = 1', (text,))
+        conn.commit()
+
+def test_quiz_cache_keeps_databases_apart(app, tmp_path):
+    other = appmod.create_app(dict(app.config, DATABASE=str(tmp_path / 'other.db'), QUIZ_CACHE_DIR=str(tmp_path / 'quiz_cache')))
+    app.config['QUIZ_CACHE_DIR'] = other.config['QUIZ_CACHE_DIR']
+    appmod.init_db(other)
+    _rewrite_first_question(other, 'Only in the other database')
+    try:
+        assert _first_question(other) == 'Only in the other database'
+        assert _first_question(app) != 'Only in the other database'
+        appmod.quiz_cache.clear()
+        assert _first_question(app) != 'Only in the other database'
+    finally:
+        appmod.db.get_pool(other.config['DATABASE']).close_all()
+
+def test_init_db_drops_cached_sets(app):
+    _rewrite_first_question(app, 'Before the rebuild')
+    assert _first_question(app) == 'Before the rebuild'
+    appmod.init_db(app)
+    assert _first_question(app) != 'Before the rebuild'
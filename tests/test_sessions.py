@@ -0,0 +1,72 @@
+import time
+import bcrypt
+import pytest
+import app as appmod
+import db
+import sessions
+
+@pytest.fixture(params=['sqlite', 'file'])
+def server_app(request, app, tmp_path):
+    """The test app's database behind a server-side session store."""
+    server_app = appmod.create_app(dict(app.config, SESSION_BACKEND=request.param,
+                                        SESSION_DATABASE=str(tmp_path / 'sessions.db'),
+                                        SESSION_DIRECTORY=str(tmp_path / 'sessions')))
+    with server_app.app_context():
+        conn = appmod.get_db_connection()
+        conn.execute('INSERT INTO users (username, password, student_code, first_name, last_name) VALUES (?, ?, ?, ?, ?)',
+                     ('ada', bcrypt.hashpw(b'correct horse', bcrypt.gensalt(4)), 'ada-code', 'Ada', 'Student'))
+        conn.commit()
+    yield server_app
+    db.get_pool(server_app.config['SESSION_DATABASE']).close_all()
+
+def _store(app):
+    return app.session_interface.store
+
+def _sid(app, client):
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    return sessions.Signer(app.secret_key, salt=sessions.SESSION_SALT).unsign(cookie.value).decode('ascii') if cookie else None
+
+def _login(client):
+    return client.post('/login', data={'username': 'ada', 'password': 'correct horse'}, environ_base={'REMOTE_ADDR': '10.9.0.1'})
+
+def test_login_and_logout_round_trip(server_app):
+    client = server_app.test_client()
+    client.get('/login')
+    assert _login(client).status_code == 302
+    sid = _sid(server_app, client)
+    data, _ = _store(server_app).load(sid)
+    assert sessions.serializer.loads(data)['username'] == 'ada'
+    assert 'ada' not in client.get_cookie(server_app.config['SESSION_COOKIE_NAME']).value
+    assert client.get('/dashboard').status_code == 200
+
+    assert client.get('/logout').status_code == 302
+    assert _store(server_app).load(sid) is None
+    assert _sid(server_app, client) is None
+    assert client.get('/dashboard').status_code == 302
+
+def test_signing_in_issues_a_fresh_session_id(server_app):
+    client = server_app.test_client()
+    with client.session_transaction() as sess:
+        sess['quiz_start_time'] = 'planted'
+    planted = _sid(server_app, client)
+    _login(client)
+    assert _sid(server_app, client) not in (None, planted)
+    assert _store(server_app).load(planted) is None
+
+def test_expired_session_is_signed_out(server_app):
+    client = server_app.test_client()
+    _login(client)
+    sid = _sid(server_app, client)
+    data, _ = _store(server_app).load(sid)
+    _store(server_app).save(sid, data, time.time() - 1)
+    assert _store(server_app).load(sid) is None
+    assert client.get('/dashboard').status_code == 302
+
+def test_deleting_a_session_signs_it_out_everywhere(server_app):
+    first, second = server_app.test_client(), server_app.test_client()
+    _login(first)
+    second.set_cookie(server_app.config['SESSION_COOKIE_NAME'], first.get_cookie(server_app.config['SESSION_COOKIE_NAME']).value)
+    assert second.get('/dashboard').status_code == 200
+    _store(server_app).delete(_sid(server_app, first))
+    assert first.get('/dashboard').status_code == 302
+    assert second.get('/dashboard').status_code == 302
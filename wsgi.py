@@ -0,0 +1,10 @@
+from app import create_app, preload
+
+# --- WSGI Entry Point ---
+# For a pre-fork server, e.g. `gunicorn -c gunicorn.conf.py wsgi:application`. With
+# preload_app the master imports this module once: the database is created or migrated
+# and the caches are warmed before any worker forks, so every worker starts warm and
+# shares that memory copy-on-write. Configure with PYPATH_* environment variables.
+
+application = create_app()
+preload(application)